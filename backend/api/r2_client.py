@@ -6,17 +6,24 @@ S3-compatible API pour upload/download assets
 
 import boto3
 import os
+from concurrent.futures import ThreadPoolExecutor
 from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Téléchargement par plages parallèles (vidéos de capture)
+R2_DOWNLOAD_PART_SIZE = int(os.getenv('R2_DOWNLOAD_PART_SIZE', str(16 * 1024 * 1024)))  # 16MB
+R2_DOWNLOAD_WORKERS = int(os.getenv('R2_DOWNLOAD_WORKERS', 8))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 # Configuration S3-compatible pour R2
 r2_config = Config(
     signature_version='s3v4',
-    region_name='auto'
+    region_name='auto',
+    max_pool_connections=max(10, R2_DOWNLOAD_WORKERS)
 )
 
 # Client R2
@@ -72,6 +79,46 @@ def upload_file(
         logger.error(f"R2 upload error: {e}")
         raise
 
+def upload_local_file(
+    file_path: str,
+    key: str,
+    content_type: str,
+    metadata: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Upload a file from disk to R2 (streamed, multipart for large files)
+    
+    Args:
+        file_path: Local file path
+        key: S3 key (path)
+        content_type: MIME type
+        metadata: Optional metadata dict
+        
+    Returns:
+        Public URL of uploaded file
+    """
+    try:
+        extra_args = {
+            'ContentType': content_type,
+            'ACL': 'public-read'
+        }
+        
+        if metadata:
+            extra_args['Metadata'] = metadata
+        
+        r2_client.upload_file(
+            file_path,
+            BUCKET_NAME,
+            key,
+            ExtraArgs=extra_args
+        )
+        
+        return f"{PUBLIC_URL}/{key}"
+    
+    except ClientError as e:
+        logger.error(f"R2 upload error: {e}")
+        raise
+
 def download_file(key: str) -> Optional[bytes]:
     """
     Download file from R2
@@ -147,6 +194,267 @@ def generate_presigned_url(
         logger.error(f"R2 presigned URL error: {e}")
         raise
 
+def create_multipart_upload(
+    key: str,
+    content_type: str,
+    metadata: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Start a multipart upload (parts uploaded by the client with presigned URLs)
+    
+    Args:
+        key: S3 key (path)
+        content_type: MIME type
+        metadata: Optional metadata dict
+        
+    Returns:
+        Multipart upload ID
+    """
+    try:
+        response = r2_client.create_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            ContentType=content_type,
+            Metadata=metadata or {}
+        )
+        return response['UploadId']
+    
+    except ClientError as e:
+        logger.error(f"R2 multipart create error: {e}")
+        raise
+
+def generate_presigned_part_urls(
+    key: str,
+    upload_id: str,
+    part_numbers: List[int],
+    expiration: int = 3600
+) -> Dict[int, str]:
+    """
+    Generate presigned URLs for parts of a multipart upload
+    
+    Args:
+        key: S3 key (path)
+        upload_id: Multipart upload ID
+        part_numbers: Part numbers (1-based)
+        expiration: URL expiration in seconds
+        
+    Returns:
+        Dict part number -> presigned PUT URL
+    """
+    try:
+        return {
+            number: r2_client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': BUCKET_NAME,
+                    'Key': key,
+                    'UploadId': upload_id,
+                    'PartNumber': number
+                },
+                ExpiresIn=expiration
+            )
+            for number in part_numbers
+        }
+    
+    except ClientError as e:
+        logger.error(f"R2 presigned part URL error: {e}")
+        raise
+
+def list_uploaded_parts(key: str, upload_id: str) -> List[Dict[str, Any]]:
+    """
+    Parts already received for a multipart upload (resume, completion)
+    
+    Returns:
+        List of {'PartNumber', 'ETag', 'Size'} sorted by part number
+    """
+    parts = []
+    kwargs = {'Bucket': BUCKET_NAME, 'Key': key, 'UploadId': upload_id}
+    try:
+        while True:
+            response = r2_client.list_parts(**kwargs)
+            parts.extend(
+                {'PartNumber': part['PartNumber'], 'ETag': part['ETag'], 'Size': part['Size']}
+                for part in response.get('Parts', [])
+            )
+            if not response.get('IsTruncated'):
+                return parts
+            kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
+    
+    except ClientError as e:
+        logger.error(f"R2 list parts error: {e}")
+        raise
+
+def complete_multipart_upload(
+    key: str,
+    upload_id: str,
+    parts: Optional[List[Dict[str, Any]]] = None
+):
+    """
+    Assemble a multipart upload (server-side, no data transfer)
+    
+    Args:
+        key: S3 key (path)
+        upload_id: Multipart upload ID
+        parts: [{'PartNumber', 'ETag'}] reported by the client
+            (default: parts listed by R2)
+    """
+    if parts is None:
+        parts = list_uploaded_parts(key, upload_id)
+    
+    try:
+        r2_client.complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                'Parts': [
+                    {'PartNumber': part['PartNumber'], 'ETag': part['ETag']}
+                    for part in sorted(parts, key=lambda part: part['PartNumber'])
+                ]
+            }
+        )
+    
+    except ClientError as e:
+        logger.error(f"R2 multipart complete error: {e}")
+        raise
+
+def abort_multipart_upload(key: str, upload_id: str) -> bool:
+    """
+    Abort a multipart upload (uploaded parts are discarded)
+    
+    Returns:
+        True if successful
+    """
+    try:
+        r2_client.abort_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id
+        )
+        return True
+    
+    except ClientError as e:
+        logger.error(f"R2 multipart abort error: {e}")
+        return False
+
+def get_file_info(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Size, content type, ETag and metadata of a file
+    
+    Returns:
+        Dict or None if not found
+    """
+    try:
+        response = r2_client.head_object(
+            Bucket=BUCKET_NAME,
+            Key=key
+        )
+        return {
+            'size': response['ContentLength'],
+            'content_type': response.get('ContentType'),
+            'etag': response.get('ETag'),
+            'metadata': response.get('Metadata', {})
+        }
+    
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        logger.error(f"R2 head error: {e}")
+        raise
+
+def download_range(key: str, start: int, end: int) -> bytes:
+    """
+    Download bytes start..end (inclusive) of a file
+    
+    Args:
+        key: S3 key (path)
+        start: First byte offset
+        end: Last byte offset (inclusive)
+        
+    Returns:
+        File bytes (shorter if the file ends before end)
+    """
+    try:
+        response = r2_client.get_object(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            Range=f"bytes={start}-{end}"
+        )
+        return response['Body'].read()
+    
+    except ClientError as e:
+        logger.error(f"R2 range download error: {e}")
+        raise
+
+def download_to_file(
+    key: str,
+    dest_path: str,
+    size: Optional[int] = None,
+    etag: Optional[str] = None,
+    part_size: int = R2_DOWNLOAD_PART_SIZE,
+    max_workers: int = R2_DOWNLOAD_WORKERS
+) -> int:
+    """
+    Download a large file to disk with parallel ranged GETs
+    
+    Each range is streamed into its offset of <dest_path>.part (no buffering
+    of the whole object in memory), then the file is renamed to dest_path.
+    
+    Args:
+        key: S3 key (path)
+        dest_path: Local destination
+        size: Object size (default: HEAD request)
+        etag: Expected ETag; a range of a replaced object fails (If-Match)
+        part_size: Bytes per ranged GET
+        max_workers: Concurrent ranged GETs
+        
+    Returns:
+        Bytes downloaded
+    """
+    if size is None or etag is None:
+        info = get_file_info(key)
+        if info is None:
+            raise FileNotFoundError(f"R2 object not found: {key}")
+        size, etag = info['size'], info['etag']
+    
+    part_path = f"{dest_path}.part"
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    
+    def fetch(offset: int):
+        end = min(offset + part_size, size) - 1
+        response = r2_client.get_object(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            Range=f"bytes={offset}-{end}",
+            IfMatch=etag
+        )
+        position = offset
+        for chunk in response['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE):
+            os.pwrite(fd, chunk, position)
+            position += len(chunk)
+        if position != end + 1:
+            raise IOError(f"Incomplete range {offset}-{end} for {key}: {position - offset} bytes")
+    
+    try:
+        os.ftruncate(fd, size)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # list() re-raises the first failed range
+            list(pool.map(fetch, range(0, size, part_size)))
+        os.close(fd)
+        fd = None
+        os.replace(part_path, dest_path)
+        return size
+    
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.unlink(part_path)
+        except OSError:
+            pass
+        logger.error(f"R2 ranged download failed for {key}")
+        raise
+
 def file_exists(key: str) -> bool:
     """
     Check if file exists in R2
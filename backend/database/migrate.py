@@ -5,6 +5,7 @@ Automated migrations for PostgreSQL
 """
 
 import os
+import re
 import sys
 import psycopg2
 import argparse
@@ -14,6 +15,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Tokens in which a semicolon does not end a statement: line comments,
+# string literals and dollar-quoted bodies (DO blocks, functions)
+SQL_TOKEN = re.compile(r"--[^\n]*|'(?:[^']|'')*'|(\$\w*\$).*?\1|;", re.S)
+SQL_COMMENT = re.compile(r"--[^\n]*")
+
 def get_db_connection(env: str = 'staging'):
     """Get PostgreSQL connection based on environment"""
     if env == 'production':
@@ -53,6 +59,18 @@ def get_applied_migrations(conn) -> List[str]:
     cursor.close()
     return versions
 
+def split_statements(sql: str) -> List[str]:
+    """Split a migration into statements on top-level semicolons"""
+    statements = []
+    start = 0
+    for match in SQL_TOKEN.finditer(sql):
+        if match.group(0) == ';':
+            statements.append(sql[start:match.start()])
+            start = match.end()
+    statements.append(sql[start:])
+    # Comment-only chunks (file headers, trailing notes) are not statements
+    return [s.strip() for s in statements if SQL_COMMENT.sub('', s).strip()]
+
 def apply_migration(conn, migration_file: Path):
     """Apply a single migration"""
     version = migration_file.stem
@@ -65,8 +83,7 @@ def apply_migration(conn, migration_file: Path):
     cursor = conn.cursor()
     try:
         # Execute migration (handle multiple statements)
-        # Split by semicolon and execute each statement
-        statements = [s.strip() for s in sql.split(';') if s.strip()]
+        statements = split_statements(sql)
         for statement in statements:
             if statement:
                 cursor.execute(statement)
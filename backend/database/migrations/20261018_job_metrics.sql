@@ -0,0 +1,25 @@
+-- Migration: Per-stage job resource metrics
+-- Date: 2026-10-18
+-- One row per job stage run by a worker (wall time, CPU incl. child
+-- processes, peak RSS, scratch disk, uploaded bytes). Retries and staged
+-- photogrammetry jobs add rows, totals are aggregated per job_id.
+
+CREATE TABLE IF NOT EXISTS job_metrics (
+    id BIGSERIAL PRIMARY KEY,
+    job_id UUID NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    job_type VARCHAR(50) NOT NULL,
+    stage VARCHAR(50) NOT NULL,
+    worker VARCHAR(255),
+    status VARCHAR(20) NOT NULL,
+    wall_seconds DOUBLE PRECISION NOT NULL,
+    cpu_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    child_cpu_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    peak_rss_bytes BIGINT NOT NULL DEFAULT 0,
+    child_peak_rss_bytes BIGINT NOT NULL DEFAULT 0,
+    scratch_bytes BIGINT NOT NULL DEFAULT 0,
+    uploaded_bytes BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_metrics_job_id ON job_metrics(job_id);
+CREATE INDEX IF NOT EXISTS idx_job_metrics_type_created_at ON job_metrics(job_type, created_at DESC);
@@ -0,0 +1,20 @@
+-- Migration: Webhook batching (opt-in per webhook)
+-- Date: 2026-10-18
+-- Events are buffered and delivered as one gzip-compressed, signed array
+-- every batch_interval_seconds or at batch_max_events events.
+
+ALTER TABLE webhooks ADD COLUMN IF NOT EXISTS batch_interval_seconds INTEGER;
+ALTER TABLE webhooks ADD COLUMN IF NOT EXISTS batch_max_events INTEGER;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'webhooks_batch_settings_check'
+    ) THEN
+        ALTER TABLE webhooks ADD CONSTRAINT webhooks_batch_settings_check CHECK (
+            (batch_interval_seconds IS NULL OR batch_interval_seconds >= 0)
+            AND (batch_max_events IS NULL OR batch_max_events > 0)
+        );
+    END IF;
+END
+$$;
@@ -0,0 +1,9 @@
+-- Migration: GIN index on webhooks.events
+-- Date: 2026-10-18
+-- Subscription index cold loads (events @> ARRAY['ar_code.scanned']).
+-- An ANY(events) predicate cannot use the btree indexes.
+-- Not CONCURRENTLY: migrate.py runs each migration in one transaction.
+
+CREATE INDEX IF NOT EXISTS idx_webhooks_events
+    ON webhooks USING GIN(events)
+    WHERE is_active = TRUE;
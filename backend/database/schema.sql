@@ -109,8 +109,14 @@ CREATE TABLE webhooks (
     events TEXT[] NOT NULL, -- ['ar_code.created', 'scanned', etc.]
     secret TEXT NOT NULL, -- pour signature validation
     is_active BOOLEAN DEFAULT TRUE,
+    batch_interval_seconds INTEGER, -- NULL: un POST par événement
+    batch_max_events INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT webhooks_batch_settings_check CHECK (
+        (batch_interval_seconds IS NULL OR batch_interval_seconds >= 0)
+        AND (batch_max_events IS NULL OR batch_max_events > 0)
+    )
 );
 
 -- Webhook deliveries table
@@ -127,6 +133,24 @@ CREATE TABLE webhook_deliveries (
     delivered_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Job resource metrics table (one row per job stage)
+CREATE TABLE job_metrics (
+    id BIGSERIAL PRIMARY KEY,
+    job_id UUID NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    job_type VARCHAR(50) NOT NULL,
+    stage VARCHAR(50) NOT NULL,
+    worker VARCHAR(255),
+    status VARCHAR(20) NOT NULL,
+    wall_seconds DOUBLE PRECISION NOT NULL,
+    cpu_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    child_cpu_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    peak_rss_bytes BIGINT NOT NULL DEFAULT 0,
+    child_peak_rss_bytes BIGINT NOT NULL DEFAULT 0,
+    scratch_bytes BIGINT NOT NULL DEFAULT 0,
+    uploaded_bytes BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Indexes
 CREATE INDEX idx_ar_codes_user_id ON ar_codes(user_id);
 CREATE INDEX idx_ar_codes_type ON ar_codes(type);
@@ -167,11 +191,15 @@ CREATE INDEX idx_processing_jobs_job_type ON processing_jobs(job_type);
 CREATE INDEX idx_webhooks_user_id ON webhooks(user_id);
 CREATE INDEX idx_webhooks_ar_code_id ON webhooks(ar_code_id);
 CREATE INDEX idx_webhooks_active ON webhooks(is_active) WHERE is_active = TRUE;
+CREATE INDEX idx_webhooks_events ON webhooks USING GIN(events) WHERE is_active = TRUE;
 
 CREATE INDEX idx_webhook_deliveries_webhook_id ON webhook_deliveries(webhook_id);
 CREATE INDEX idx_webhook_deliveries_status ON webhook_deliveries(status);
 CREATE INDEX idx_webhook_deliveries_created_at ON webhook_deliveries(created_at DESC);
 
+CREATE INDEX idx_job_metrics_job_id ON job_metrics(job_id);
+CREATE INDEX idx_job_metrics_type_created_at ON job_metrics(job_type, created_at DESC);
+
 -- JSONB indexes
 CREATE INDEX idx_ar_codes_metadata ON ar_codes USING GIN(metadata);
 CREATE INDEX idx_analytics_event_data ON analytics_events USING GIN(event_data);
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Gaussian Splatting Checkpoints
+Détection des checkpoints Nerfstudio pour reprise du training (retries RQ, préemption)
+"""
+
+import json
+import re
+import zipfile
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PATTERN = re.compile(r'step-(\d+)\.ckpt$')
+
+# Fichier d'état écrit dans le workspace quand le training est terminé
+TRAINING_STATE_FILE = 'training_state.json'
+
+
+def find_checkpoints(output_dir: str) -> List[Tuple[int, Path]]:
+    """
+    Liste les checkpoints Nerfstudio (step-XXXXXXXXX.ckpt) triés par step
+
+    Args:
+        output_dir: Dossier de sortie ns-train
+
+    Returns:
+        Liste (step, chemin)
+    """
+    checkpoints = []
+    for path in Path(output_dir).glob('**/*.ckpt'):
+        match = CHECKPOINT_PATTERN.search(path.name)
+        if match:
+            checkpoints.append((int(match.group(1)), path))
+    return sorted(checkpoints)
+
+
+def is_valid_checkpoint(checkpoint_path: Path) -> bool:
+    """
+    Vérifie qu'un checkpoint est utilisable
+
+    torch.save écrit une archive zip: un fichier tronqué (job tué pendant
+    l'écriture) n'a pas de central directory et est rejeté. Le config.yml
+    du run doit aussi exister pour reprendre/exporter.
+
+    Args:
+        checkpoint_path: Chemin du .ckpt
+
+    Returns:
+        True si le checkpoint peut être chargé
+    """
+    try:
+        if checkpoint_path.stat().st_size == 0:
+            return False
+        if not zipfile.is_zipfile(checkpoint_path):
+            return False
+    except OSError:
+        return False
+
+    return run_config_path(checkpoint_path).exists()
+
+
+def run_config_path(checkpoint_path: Path) -> Path:
+    """config.yml du run Nerfstudio (<run>/nerfstudio_models/step-N.ckpt)"""
+    return checkpoint_path.parent.parent / 'config.yml'
+
+
+def find_resume_checkpoint(output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Trouve le dernier checkpoint valide pour reprendre le training
+
+    Args:
+        output_dir: Dossier de sortie ns-train
+
+    Returns:
+        Dict (step, checkpoint, load_dir, config) ou None
+    """
+    for step, path in reversed(find_checkpoints(output_dir)):
+        if is_valid_checkpoint(path):
+            return {
+                'step': step,
+                'checkpoint': str(path),
+                'load_dir': str(path.parent),
+                'config': str(run_config_path(path))
+            }
+        logger.warning(f"Ignoring invalid checkpoint {path}")
+    return None
+
+
+def load_training_state(output_dir: str) -> Optional[Dict[str, Any]]:
+    """Lit l'état de fin de training (None si training non terminé)"""
+    state_path = Path(output_dir) / TRAINING_STATE_FILE
+    if not state_path.exists():
+        return None
+    try:
+        return json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def save_training_state(output_dir: str, state: Dict[str, Any]):
+    """Écrit l'état de fin de training (écriture atomique)"""
+    state_path = Path(output_dir) / TRAINING_STATE_FILE
+    tmp_path = state_path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(state, indent=2))
+    tmp_path.replace(state_path)
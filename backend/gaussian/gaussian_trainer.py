@@ -14,6 +14,8 @@ from typing import Dict, Optional
 import argparse
 from datetime import datetime
 
+from training_metrics import TrainingMetricsReader
+
 class GaussianSplattingTrainer:
     def __init__(self, dataset_path: str, output_dir: str):
         """
@@ -156,23 +158,28 @@ class GaussianSplattingTrainer:
         Lit logs de training
         
         Returns:
-            Dict avec métriques training
+            Dict avec métriques training (loss, PSNR, série temporelle)
         """
+        reader = TrainingMetricsReader(str(self.output_dir))
+        
         # Chercher fichier logs
         log_files = list(self.output_dir.glob("**/*.log"))
+        latest_log = max(log_files, key=lambda p: p.stat().st_mtime) if log_files else None
         
-        if not log_files:
-            return {'error': 'Aucun log trouvé'}
+        if latest_log:
+            with open(latest_log, 'r', errors='replace') as f:
+                reader.parse_log(f.read())
         
-        latest_log = max(log_files, key=lambda p: p.stat().st_mtime)
+        # Event files TensorBoard (loss/PSNR par step)
+        reader.poll_event_files()
         
-        # TODO: Parser logs pour extraire métriques (loss, PSNR, etc.)
-        with open(latest_log, 'r') as f:
-            log_content = f.read()
+        if not latest_log and not len(reader.series):
+            return {'error': 'Aucun log trouvé'}
         
         return {
-            'log_file': str(latest_log),
-            'content': log_content[:1000]  # Premiers 1000 chars
+            'log_file': str(latest_log) if latest_log else None,
+            'metrics': reader.series.to_meta(),
+            'best_psnr': reader.series.best('psnr')
         }
 
 def main():
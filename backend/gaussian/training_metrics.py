@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Gaussian Splatting Training Metrics
+Lecture structurée des métriques Nerfstudio (stdout + event files) et early stopping
+"""
+
+import re
+import signal
+import struct
+import subprocess
+import time
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from gaussian.checkpoints import find_checkpoints
+except ImportError:
+    from checkpoints import find_checkpoints
+
+logger = logging.getLogger(__name__)
+
+# Tags TensorBoard écrits par Nerfstudio → noms de métriques
+EVENT_TAGS = {
+    'Train Loss': 'loss',
+    'Train Metrics Dict/psnr': 'psnr',
+    'Eval Loss': 'eval_loss',
+    'Eval Images Metrics/psnr': 'eval_psnr',
+    'Eval Images Metrics Dict (all images)/psnr': 'eval_psnr',
+}
+
+# Ligne de stats Nerfstudio: "1200 (4.00%)   45.123 ms   22 m, 3 s   1.2 M"
+STEP_ROW_PATTERN = re.compile(r'^\s*(\d+)\s+\(\s*(\d+(?:\.\d+)?)%\)')
+# Formats génériques: "[ITER 7000] ... PSNR 27.1", "step: 1200", "iteration 1200"
+STEP_PATTERN = re.compile(r'\b(?:step|iter(?:ation)?)\b\s*[:=]?\s*(\d+)', re.IGNORECASE)
+VALUE_PATTERN = re.compile(
+    r'\b(loss|psnr)\b\s*[:=]?\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)',
+    re.IGNORECASE
+)
+
+
+@dataclass
+class EarlyStoppingConfig:
+    """Configuration early stopping sur plateau PSNR"""
+    enabled: bool = True
+    metric: str = 'psnr'
+    min_steps: int = 10000
+    patience_steps: int = 3000
+    min_delta: float = 0.05  # dB
+    smoothing: float = 0.1  # Facteur EMA
+
+    @classmethod
+    def from_config(cls, value: Any) -> 'EarlyStoppingConfig':
+        """Construit la config depuis `config['early_stopping']` (bool ou dict)"""
+        if value is None or value is True:
+            return cls()
+        if value is False:
+            return cls(enabled=False)
+        known = {k: v for k, v in dict(value).items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+
+class TrainingSeries:
+    """Série temporelle step → métriques (loss, PSNR, ...)"""
+
+    def __init__(self):
+        self._points: Dict[int, Dict[str, float]] = {}
+        self.latest_step: int = 0
+
+    def add(self, step: int, **metrics: float) -> Dict[str, Any]:
+        """Ajoute (ou fusionne) des métriques pour un step"""
+        point = self._points.setdefault(step, {})
+        point.update(metrics)
+        self.latest_step = max(self.latest_step, step)
+        return {'step': step, **metrics}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def points(self) -> List[Dict[str, Any]]:
+        """Points triés par step"""
+        return [{'step': step, **self._points[step]} for step in sorted(self._points)]
+
+    def best(self, metric: str) -> Optional[Dict[str, Any]]:
+        """Point avec la meilleure valeur (max pour PSNR, min pour loss)"""
+        candidates = [p for p in self.points() if metric in p]
+        if not candidates:
+            return None
+        if 'loss' in metric:
+            return min(candidates, key=lambda p: p[metric])
+        return max(candidates, key=lambda p: p[metric])
+
+    def latest(self, metric: str) -> Optional[float]:
+        """Dernière valeur connue d'une métrique"""
+        for step in sorted(self._points, reverse=True):
+            if metric in self._points[step]:
+                return self._points[step][metric]
+        return None
+
+    def to_meta(self, max_points: int = 200) -> Dict[str, Any]:
+        """
+        Sérialise la série pour job.meta (sous-échantillonnée)
+
+        Args:
+            max_points: Nombre max de points conservés
+
+        Returns:
+            Dict JSON-serializable
+        """
+        points = self.points()
+        if len(points) > max_points:
+            stride = -(-len(points) // max_points)
+            # Toujours garder le dernier point
+            points = points[::stride] + ([points[-1]] if (len(points) - 1) % stride else [])
+
+        return {
+            'latest_step': self.latest_step,
+            'loss': self.latest('loss'),
+            'psnr': self.latest('psnr'),
+            'eval_psnr': self.latest('eval_psnr'),
+            'series': points
+        }
+
+
+class TrainingMetricsReader:
+    def __init__(self, output_dir: str, max_iterations: Optional[int] = None):
+        """
+        Initialise le lecteur de métriques
+
+        Args:
+            output_dir: Dossier de sortie ns-train (contient les event files)
+            max_iterations: Nombre total d'itérations (pour la progression)
+        """
+        self.output_dir = Path(output_dir)
+        self.max_iterations = max_iterations
+        self.series = TrainingSeries()
+        self._event_offsets: Dict[Path, int] = {}
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Progression 0-1 d'après le dernier step vu"""
+        if not self.max_iterations or not self.series.latest_step:
+            return None
+        return min(1.0, self.series.latest_step / self.max_iterations)
+
+    def parse_line(self, line: str) -> List[Dict[str, Any]]:
+        """
+        Parse une ligne stdout Nerfstudio
+
+        Args:
+            line: Ligne de log
+
+        Returns:
+            Liste des nouveaux points (vide si rien reconnu)
+        """
+        match = STEP_ROW_PATTERN.match(line) or STEP_PATTERN.search(line)
+        if not match:
+            return []
+
+        step = int(match.group(1))
+        metrics = {
+            name.lower(): float(value)
+            for name, value in VALUE_PATTERN.findall(line)
+        }
+        return [self.series.add(step, **metrics)]
+
+    def parse_log(self, text: str) -> List[Dict[str, Any]]:
+        """Parse un log complet"""
+        points = []
+        for line in text.splitlines():
+            points.extend(self.parse_line(line))
+        return points
+
+    def poll_event_files(self) -> List[Dict[str, Any]]:
+        """
+        Lit les nouveaux records des event files TensorBoard (incrémental)
+
+        Returns:
+            Liste des nouveaux points
+        """
+        points = []
+        for event_file in sorted(self.output_dir.glob('**/events.out.tfevents.*')):
+            offset = self._event_offsets.get(event_file, 0)
+            try:
+                with open(event_file, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+            except OSError as e:
+                logger.warning(f"Cannot read event file {event_file}: {e}")
+                continue
+
+            consumed = 0
+            for record, end in _iter_tfrecords(data):
+                consumed = end
+                event = _decode_event(record)
+                if event is None:
+                    continue
+                step, scalars = event
+                metrics = {
+                    EVENT_TAGS[tag]: value
+                    for tag, value in scalars.items()
+                    if tag in EVENT_TAGS
+                }
+                if metrics:
+                    points.append(self.series.add(step, **metrics))
+
+            self._event_offsets[event_file] = offset + consumed
+        return points
+
+
+class PSNRPlateauDetector:
+    def __init__(self, config: EarlyStoppingConfig):
+        """
+        Détecte un plateau de PSNR (EMA) pour arrêter le training
+
+        Args:
+            config: Configuration early stopping
+        """
+        self.config = config
+        self.smoothed: Optional[float] = None
+        self.best_value: Optional[float] = None
+        self.best_step: int = 0
+        self.plateau_step: Optional[int] = None
+
+    def update(self, step: int, value: float) -> bool:
+        """
+        Ajoute une mesure
+
+        Args:
+            step: Step de training
+            value: Valeur PSNR
+
+        Returns:
+            True si le plateau est atteint
+        """
+        if not self.config.enabled:
+            return False
+
+        alpha = self.config.smoothing
+        self.smoothed = value if self.smoothed is None else alpha * value + (1 - alpha) * self.smoothed
+
+        if self.best_value is None or self.smoothed > self.best_value + self.config.min_delta:
+            self.best_value = self.smoothed
+            self.best_step = step
+            return False
+
+        if step >= self.config.min_steps and step - self.best_step >= self.config.patience_steps:
+            self.plateau_step = step
+            return True
+        return False
+
+
+# Arrêt de ns-train quand le suivi échoue (SIGINT: checkpoint pour la reprise)
+ABORT_GRACE_PERIOD = 30.0
+
+
+def stop_training(process: subprocess.Popen, grace_period: float = 120.0):
+    """Arrête ns-train proprement (SIGINT, puis SIGTERM/SIGKILL)"""
+    if process.poll() is not None:
+        return
+
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def monitor_training(
+    process: subprocess.Popen,
+    reader: TrainingMetricsReader,
+    early_stopping: Optional[EarlyStoppingConfig] = None,
+    on_update: Optional[Callable[[TrainingMetricsReader, str], None]] = None,
+    update_interval: float = 5.0,
+    event_poll_interval: float = 30.0
+) -> Dict[str, Any]:
+    """
+    Suit un process ns-train: parse stdout, lit les event files, early stopping
+
+    Le process doit être lancé avec stdout=PIPE, stderr=STDOUT, text=True.
+    Sur plateau, le training est arrêté dès qu'un checkpoint couvrant le
+    plateau existe, pour que l'export parte d'un état sauvegardé.
+
+    Args:
+        process: Process ns-train
+        reader: Lecteur de métriques
+        early_stopping: Config early stopping (None = désactivé)
+        on_update: Callback (reader, dernière ligne), au plus 1x par update_interval
+        update_interval: Intervalle min entre callbacks (secondes)
+        event_poll_interval: Intervalle de lecture des event files (secondes)
+
+    Returns:
+        Dict avec return_code, early_stopped, stop_step, best
+    """
+    detector = PSNRPlateauDetector(early_stopping) if early_stopping and early_stopping.enabled else None
+    metric = early_stopping.metric if early_stopping else 'psnr'
+
+    stop_step: Optional[int] = None
+    early_stopped = False
+    last_update = 0.0
+    last_poll = time.monotonic()
+    line = ''
+
+    try:
+        for line in process.stdout:
+            points = reader.parse_line(line)
+
+            now = time.monotonic()
+            if now - last_poll >= event_poll_interval:
+                points.extend(reader.poll_event_files())
+                last_poll = now
+
+            if detector and stop_step is None:
+                for point in sorted(points, key=lambda p: p['step']):
+                    if metric in point and detector.update(point['step'], point[metric]):
+                        stop_step = point['step']
+                        logger.info(
+                            f"PSNR plateau at step {stop_step} "
+                            f"(best {detector.best_value:.2f} dB at step {detector.best_step})"
+                        )
+                        break
+
+            if on_update and points and now - last_update >= update_interval:
+                on_update(reader, line)
+                last_update = now
+
+            if stop_step is not None:
+                checkpoints = find_checkpoints(str(reader.output_dir))
+                if checkpoints and checkpoints[-1][0] >= detector.best_step:
+                    logger.info(f"Early stopping: checkpoint step {checkpoints[-1][0]} available")
+                    stop_training(process)
+                    early_stopped = True
+                    break
+
+        process.wait()
+        reader.poll_event_files()
+        if on_update:
+            on_update(reader, line)
+    except BaseException:
+        # Timeout RQ, erreur du callback...: ns-train ne doit pas survivre au
+        # job (le retry relancerait un second training sur le même output_dir)
+        stop_training(process, grace_period=ABORT_GRACE_PERIOD)
+        raise
+
+    return {
+        'return_code': process.returncode,
+        'early_stopped': early_stopped,
+        'stop_step': stop_step,
+        'best': reader.series.best(metric)
+    }
+
+
+def _iter_tfrecords(data: bytes) -> Iterator[Tuple[bytes, int]]:
+    """Itère les records TFRecord complets (record, offset de fin)"""
+    pos = 0
+    while pos + 12 <= len(data):
+        (length,) = struct.unpack_from('<Q', data, pos)
+        end = pos + 12 + length + 4
+        if end > len(data):
+            break  # Record incomplet, relu au prochain poll
+        yield data[pos + 12:pos + 12 + length], end
+        pos = end
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(buf: bytes) -> Iterator[Tuple[int, Any]]:
+    """Décodeur protobuf minimal (field_number, valeur brute)"""
+    pos = 0
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value, pos = buf[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        yield field, value
+
+
+def _decode_event(record: bytes) -> Optional[Tuple[int, Dict[str, float]]]:
+    """Décode un Event TensorBoard → (step, {tag: simple_value})"""
+    try:
+        step = 0
+        scalars = {}
+        for field, value in _iter_fields(record):
+            if field == 2:  # Event.step
+                step = value
+            elif field == 5:  # Event.summary
+                for summary_field, summary_value in _iter_fields(value):
+                    if summary_field != 1:  # Summary.value
+                        continue
+                    tag = None
+                    simple_value = None
+                    for value_field, raw in _iter_fields(summary_value):
+                        if value_field == 1:
+                            tag = raw.decode('utf-8', errors='replace')
+                        elif value_field == 2:
+                            (simple_value,) = struct.unpack('<f', raw)
+                    if tag is not None and simple_value is not None:
+                        scalars[tag] = simple_value
+        return (step, scalars) if scalars else None
+    except (IndexError, ValueError, struct.error):
+        return None
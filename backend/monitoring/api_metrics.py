@@ -4,9 +4,14 @@ Flask API Metrics for Prometheus
 Custom metrics endpoint for application monitoring
 """
 
-from flask import Flask, Response
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from flask import Flask, Response, request
+from prometheus_client import (
+    Counter, Histogram, Gauge, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client import multiprocess
+import os
 import time
+from typing import Optional
 from functools import wraps
 
 # Metrics definitions
@@ -45,6 +50,49 @@ processing_job_duration_seconds = Histogram(
     ['job_type']
 )
 
+# Ressources par job (queue/job_metrics.py, table job_metrics)
+processing_job_cpu_seconds = Histogram(
+    'processing_job_cpu_seconds',
+    'Processing job CPU time, child processes included',
+    ['job_type'],
+    buckets=(1, 10, 30, 60, 300, 900, 1800, 3600, 7200, 14400, 28800)
+)
+
+processing_job_peak_rss_bytes = Histogram(
+    'processing_job_peak_rss_bytes',
+    'Processing job peak resident memory',
+    ['job_type'],
+    buckets=tuple(2 ** i * 1024 ** 2 for i in range(6, 17))  # 64 MiB - 64 GiB
+)
+
+processing_job_scratch_bytes = Histogram(
+    'processing_job_scratch_bytes',
+    'Processing job peak scratch disk usage',
+    ['job_type'],
+    buckets=tuple(2 ** i * 1024 ** 2 for i in range(4, 18))  # 16 MiB - 128 GiB
+)
+
+processing_job_uploaded_bytes = Histogram(
+    'processing_job_uploaded_bytes',
+    'Processing job bytes uploaded to storage',
+    ['job_type'],
+    buckets=tuple(2 ** i * 1024 ** 2 for i in range(0, 14))  # 1 MiB - 8 GiB
+)
+
+processing_stage_duration_seconds = Histogram(
+    'processing_stage_duration_seconds',
+    'Processing job stage duration',
+    ['job_type', 'stage'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+)
+
+processing_stage_cpu_seconds = Histogram(
+    'processing_stage_cpu_seconds',
+    'Processing job stage CPU time, child processes included',
+    ['job_type', 'stage'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+)
+
 def metrics_middleware(app: Flask):
     """Add metrics middleware to Flask app"""
     
@@ -79,12 +127,29 @@ def metrics_middleware(app: Flask):
     @app.route('/metrics')
     def metrics():
         """Prometheus metrics endpoint"""
+        # Workers RQ (work horses forkés): agrégation via PROMETHEUS_MULTIPROC_DIR
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return Response(
+                generate_latest(registry),
+                mimetype=CONTENT_TYPE_LATEST
+            )
+        
         return Response(
             generate_latest(),
             mimetype=CONTENT_TYPE_LATEST
         )
 
-def track_processing_job(job_type: str, status: str, duration: float):
+def track_processing_job(
+    job_type: str,
+    status: str,
+    duration: float,
+    cpu_seconds: Optional[float] = None,
+    peak_rss_bytes: Optional[int] = None,
+    scratch_bytes: Optional[int] = None,
+    uploaded_bytes: Optional[int] = None
+):
     """Track processing job metrics"""
     processing_jobs_total.labels(
         job_type=job_type,
@@ -94,6 +159,27 @@ def track_processing_job(job_type: str, status: str, duration: float):
     processing_job_duration_seconds.labels(
         job_type=job_type
     ).observe(duration)
+    
+    if cpu_seconds is not None:
+        processing_job_cpu_seconds.labels(job_type=job_type).observe(cpu_seconds)
+    if peak_rss_bytes is not None:
+        processing_job_peak_rss_bytes.labels(job_type=job_type).observe(peak_rss_bytes)
+    if scratch_bytes is not None:
+        processing_job_scratch_bytes.labels(job_type=job_type).observe(scratch_bytes)
+    if uploaded_bytes is not None:
+        processing_job_uploaded_bytes.labels(job_type=job_type).observe(uploaded_bytes)
+
+def track_job_stage(job_type: str, stage: str, duration: float, cpu_seconds: float):
+    """Track processing job stage metrics"""
+    processing_stage_duration_seconds.labels(
+        job_type=job_type,
+        stage=stage
+    ).observe(duration)
+    
+    processing_stage_cpu_seconds.labels(
+        job_type=job_type,
+        stage=stage
+    ).observe(cpu_seconds)
 
 
 
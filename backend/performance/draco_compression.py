@@ -129,7 +129,8 @@ bpy.ops.export_scene.gltf(
 )
 """
         
-        script_path = Path('/tmp/draco_compress.py')
+        # Script next to the output: parallel compressions do not share it
+        script_path = Path(output_path).with_suffix('.draco.py')
         script_path.write_text(script)
         
         cmd = [
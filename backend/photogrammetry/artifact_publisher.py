@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Artifact Publisher
+Publication des résultats photogrammétrie: GLB, Draco, USDZ, miniature, upload
+
+Les branches sont indépendantes par LOD et par format; elles forment un
+graphe de tâches exécuté sur un pool de threads (les conversions lourdes
+sont des sous-processus gltf-pipeline / Blender, du numpy trimesh ou
+usd-core qui relâchent le GIL). Chaque tâche démarre dès que ses dépendances
+sont terminées: la publication dure le temps de la branche la plus longue.
+
+    glb_<lod> → draco_<lod> → upload_glb_<lod>
+    usdz      → upload_usdz
+    thumbnail → upload_thumbnail
+    (toutes)  → manifest.json
+
+Seul le GLB du LOD principal est obligatoire; un échec Draco publie le GLB
+non compressé, un échec USDZ ou miniature est noté dans le manifest.
+"""
+
+import os
+import json
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+try:
+    from photogrammetry.format_converter import FormatConverter
+except ImportError:
+    from format_converter import FormatConverter
+
+from performance.draco_compression import compress_glb_with_draco
+from security.upload_ingest import hash_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PUBLISH_WORKERS = int(os.getenv('ARTIFACT_PUBLISH_WORKERS', 4))
+ARTIFACT_DRACO_ENABLED = os.getenv('ARTIFACT_DRACO_ENABLED', 'true').lower() == 'true'
+THUMBNAIL_SIZE = int(os.getenv('ARTIFACT_THUMBNAIL_SIZE', 512))
+THUMBNAIL_TIMEOUT = int(os.getenv('ARTIFACT_THUMBNAIL_TIMEOUT', 300))
+
+# LOD publié comme modèle principal (model.glb / model.usdz)
+PRIMARY_LOD = 'high'
+
+MANIFEST_VERSION = 1
+
+CONTENT_TYPES = {
+    '.glb': 'model/gltf-binary',
+    '.usdz': 'model/vnd.usdz+zip',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.json': 'application/json'
+}
+
+# Rendu Workbench (sans GPU) du mesh cadré par une caméra orthographique
+BLENDER_THUMBNAIL_SCRIPT = """
+import bpy
+import sys
+from mathutils import Vector
+
+mesh_path, output_path, size = sys.argv[sys.argv.index('--') + 1:]
+
+bpy.ops.wm.read_factory_settings(use_empty=True)
+if mesh_path.endswith('.glb'):
+    bpy.ops.import_scene.gltf(filepath=mesh_path)
+else:
+    bpy.ops.import_mesh.ply(filepath=mesh_path)
+
+objects = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+corners = [obj.matrix_world @ Vector(corner) for obj in objects for corner in obj.bound_box]
+center = sum(corners, Vector()) / len(corners)
+extent = max((corner - center).length for corner in corners)
+
+camera = bpy.data.objects.new('camera', bpy.data.cameras.new('camera'))
+camera.data.type = 'ORTHO'
+camera.data.ortho_scale = extent * 2.2
+camera.location = center + Vector((1.0, -1.0, 0.8)).normalized() * extent * 3
+camera.rotation_euler = (center - camera.location).to_track_quat('-Z', 'Y').to_euler()
+bpy.context.scene.collection.objects.link(camera)
+
+scene = bpy.context.scene
+scene.camera = camera
+scene.render.engine = 'BLENDER_WORKBENCH'
+scene.render.film_transparent = True
+scene.render.resolution_x = scene.render.resolution_y = int(size)
+scene.render.image_settings.file_format = 'PNG'
+scene.render.filepath = output_path
+bpy.ops.render.render(write_still=True)
+"""
+
+
+@dataclass
+class Task:
+    """Tâche du graphe de publication (reçoit les résultats de ses dépendances)"""
+    name: str
+    func: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+
+
+def run_task_graph(tasks: List[Task], max_workers: int = ARTIFACT_PUBLISH_WORKERS) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Exécute un graphe de tâches: chaque tâche est soumise dès que ses
+    dépendances ont réussi, sautée si l'une a échoué
+
+    Args:
+        tasks: Tâches (noms uniques, dépendances présentes dans la liste)
+        max_workers: Taille du pool
+
+    Returns:
+        (résultats par tâche, erreurs par tâche)
+    """
+    pending = {task.name: task for task in tasks}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='publish') as pool:
+        def submit_ready():
+            changed = True
+            while changed:
+                changed = False
+                for name, task in list(pending.items()):
+                    failed = next((dep for dep in task.deps if dep in errors), None)
+                    if failed:
+                        errors[name] = f"skipped ({failed} failed)"
+                    elif all(dep in results for dep in task.deps):
+                        running[pool.submit(task.func, *[results[dep] for dep in task.deps])] = name
+                    else:
+                        continue
+                    del pending[name]
+                    changed = True
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = str(e)
+                    logger.warning(f"Publish task {name} failed: {e}")
+            submit_ready()
+
+    return results, errors
+
+
+def lod_meshes(results: Dict[str, Any]) -> Dict[str, str]:
+    """Meshes à publier par LOD (mesh Poisson complet si la décimation a échoué)"""
+    stages = results['stages']
+    meshes = {
+        name: lod['mesh_path']
+        for name, lod in stages.get('mesh_lod', {}).items()
+        if lod.get('success') and lod.get('mesh_path')
+    }
+    if PRIMARY_LOD not in meshes:
+        meshes[PRIMARY_LOD] = stages['mesh_generation']['mesh_path']
+    return meshes
+
+
+def export_glb(mesh_path: str, output_dir: Path) -> str:
+    result = FormatConverter(mesh_path, str(output_dir)).convert_to_glb(draco=False)
+    if not result.get('success'):
+        raise RuntimeError(f"GLB export failed: {result.get('error')}")
+    return result['path']
+
+
+def compress_glb(glb_path: str) -> Dict[str, Any]:
+    """GLB compressé Draco, ou le GLB d'origine si la compression échoue"""
+    if not ARTIFACT_DRACO_ENABLED:
+        return {'path': glb_path, 'draco': False}
+
+    output_path = str(Path(glb_path).with_suffix('.draco.glb'))
+    result = compress_glb_with_draco(glb_path, output_path)
+    if result.get('success') and Path(output_path).exists():
+        return {'path': output_path, 'draco': True}
+
+    logger.warning(f"Draco compression failed for {glb_path}, publishing uncompressed: {result.get('error')}")
+    return {'path': glb_path, 'draco': False}
+
+
+def export_usdz(mesh_path: str, output_dir: Path) -> str:
+    result = FormatConverter(mesh_path, str(output_dir)).convert_to_usdz()
+    if not result.get('success'):
+        raise RuntimeError(f"USDZ export failed: {result.get('error')}")
+    return result['path']
+
+
+def render_thumbnail(mesh_path: str, output_dir: Path, frames_dir: Optional[str] = None) -> str:
+    """
+    Miniature du modèle: rendu Blender si disponible, sinon frame centrale
+    de la capture
+
+    Returns:
+        Chemin de l'image (PNG ou JPEG)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if shutil.which('blender'):
+        script = output_dir / 'render_thumbnail.py'
+        script.write_text(BLENDER_THUMBNAIL_SCRIPT)
+        output_path = output_dir / 'thumbnail.png'
+        try:
+            subprocess.run(
+                ['blender', '--background', '--python', str(script), '--', mesh_path, str(output_path), str(THUMBNAIL_SIZE)],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=THUMBNAIL_TIMEOUT
+            )
+            if output_path.exists():
+                return str(output_path)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"Blender thumbnail render failed: {e}")
+        finally:
+            script.unlink(missing_ok=True)
+
+    frames = sorted(Path(frames_dir).glob('*.jpg')) if frames_dir else []
+    if not frames or Image is None:
+        raise RuntimeError("No thumbnail renderer available (Blender or capture frames + Pillow)")
+
+    output_path = output_dir / 'thumbnail.jpg'
+    with Image.open(frames[len(frames) // 2]) as image:
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        image.convert('RGB').save(output_path, 'JPEG', quality=85)
+    return str(output_path)
+
+
+def upload_artifact(path: str, key: str) -> Dict[str, Any]:
+    """Upload d'un fichier et entrée de manifest (url, taille, SHA-256)"""
+    from api.r2_client import upload_local_file
+
+    content_type = CONTENT_TYPES.get(Path(path).suffix, 'application/octet-stream')
+    file_hash = hash_file(path)
+    url = upload_local_file(path, key, content_type, metadata={'sha256': file_hash})
+    return {
+        'key': key,
+        'url': url,
+        'content_type': content_type,
+        'size': os.path.getsize(path),
+        'sha256': file_hash
+    }
+
+
+def publish_artifacts(
+    job_id: str,
+    user_id: str,
+    results: Dict[str, Any],
+    output_dir: str,
+    max_workers: int = ARTIFACT_PUBLISH_WORKERS
+) -> Dict[str, Any]:
+    """
+    Convertit et publie les résultats d'un job (graphe de tâches parallèle)
+
+    Args:
+        job_id: Job ID
+        user_id: User ID
+        results: Résultats du pipeline (stages mesh_generation, mesh_lod)
+        output_dir: Dossier de travail des exports (workspace du job)
+        max_workers: Tâches simultanées
+
+    Returns:
+        Manifest: artifacts {nom: {key, url, content_type, size, sha256}},
+        errors {tâche: message}, manifest_url
+
+    Raises:
+        RuntimeError si le GLB principal n'a pas pu être publié
+    """
+    export_dir = Path(output_dir)
+    prefix = f"models/{user_id}/{job_id}"
+    meshes = lod_meshes(results)
+    frames_dir = results['stages'].get('frame_extraction', {}).get('frames_dir')
+
+    tasks: List[Task] = []
+    for lod, mesh_path in meshes.items():
+        name = 'model' if lod == PRIMARY_LOD else f"model_{lod}"
+        lod_dir = export_dir / lod
+        tasks += [
+            Task(f"glb_{lod}", lambda mesh_path=mesh_path, lod_dir=lod_dir: export_glb(mesh_path, lod_dir)),
+            Task(f"draco_{lod}", compress_glb, (f"glb_{lod}",)),
+            Task(f"upload_glb_{lod}", lambda glb, name=name: upload_artifact(glb['path'], f"{prefix}/{name}.glb"),
+                 (f"draco_{lod}",))
+        ]
+
+    primary_mesh = meshes[PRIMARY_LOD]
+    tasks += [
+        Task('usdz', lambda: export_usdz(primary_mesh, export_dir / 'usdz')),
+        Task('upload_usdz', lambda path: upload_artifact(path, f"{prefix}/model.usdz"), ('usdz',)),
+        Task('thumbnail', lambda: render_thumbnail(primary_mesh, export_dir / 'thumbnail', frames_dir)),
+        Task('upload_thumbnail',
+             lambda path: upload_artifact(path, f"{prefix}/thumbnail{Path(path).suffix}"), ('thumbnail',))
+    ]
+
+    task_results, errors = run_task_graph(tasks, max_workers)
+
+    if f"upload_glb_{PRIMARY_LOD}" not in task_results:
+        raise RuntimeError(f"Publishing failed: {errors}")
+
+    artifacts = {}
+    for lod in meshes:
+        upload = task_results.get(f"upload_glb_{lod}")
+        if upload:
+            artifacts['glb' if lod == PRIMARY_LOD else f"glb_{lod}"] = {
+                **upload,
+                'lod': lod,
+                'draco': task_results[f"draco_{lod}"]['draco']
+            }
+    for name in ('usdz', 'thumbnail'):
+        if f"upload_{name}" in task_results:
+            artifacts[name] = task_results[f"upload_{name}"]
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'job_id': job_id,
+        'created_at': datetime.utcnow().isoformat(),
+        'artifacts': artifacts,
+        'errors': errors
+    }
+
+    manifest_path = export_dir / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    manifest['manifest_url'] = upload_artifact(str(manifest_path), f"{prefix}/manifest.json")['url']
+
+    logger.info(
+        f"Job {job_id}: published {len(artifacts)} artifacts"
+        + (f", {len(errors)} tasks failed: {sorted(errors)}" if errors else "")
+    )
+    return manifest
@@ -8,18 +8,34 @@ import subprocess
 import os
 import sys
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import json
 
+import cv2
+
+from resolution_policy import ResolutionPolicy, get_resolution_policy
+
+# Indices (focales, point principal) dans les params caméra COLMAP, par modèle
+CAMERA_PARAM_INDICES = {
+    'SIMPLE_PINHOLE': ([0], [1, 2]),
+    'PINHOLE': ([0, 1], [2, 3]),
+    'SIMPLE_RADIAL': ([0], [1, 2]),
+    'RADIAL': ([0], [1, 2]),
+    'OPENCV': ([0, 1], [2, 3]),
+    'FULL_OPENCV': ([0, 1], [2, 3]),
+}
+
 class COLMAPPipeline:
-    def __init__(self, workspace_path: str):
+    def __init__(self, workspace_path: str, resolution_policy: Optional[ResolutionPolicy] = None):
         """
         Initialise le pipeline COLMAP
         
         Args:
             workspace_path: Chemin vers le workspace COLMAP
+            resolution_policy: Résolutions SfM / dense (défaut: tier standard)
         """
         self.workspace_path = Path(workspace_path)
+        self.resolution_policy = resolution_policy or get_resolution_policy()
         self.workspace_path.mkdir(parents=True, exist_ok=True)
         
         # Dossiers COLMAP
@@ -79,7 +95,8 @@ class COLMAPPipeline:
             '--image_path', str(self.images_dir),
             '--ImageReader.camera_model', 'PINHOLE',
             '--ImageReader.single_camera', '1',
-            '--SiftExtraction.use_gpu', '1'
+            '--SiftExtraction.use_gpu', '1',
+            '--SiftExtraction.max_image_size', str(self.resolution_policy.sfm_max_size)
         ]
         
         try:
@@ -142,12 +159,19 @@ class COLMAPPipeline:
         except subprocess.CalledProcessError as e:
             return {'success': False, 'error': e.stderr}
     
-    def run_dense_reconstruction(self, model_path: Optional[str] = None) -> Dict:
+    def run_dense_reconstruction(
+        self,
+        model_path: Optional[str] = None,
+        images_dir: Optional[str] = None
+    ) -> Dict:
         """
         Reconstruction dense (point cloud)
         
         Args:
             model_path: Chemin vers le modèle sparse
+            images_dir: Images pleine résolution pour le dense (défaut: images SfM).
+                Mêmes noms de fichiers que le set SfM; les caméras du modèle
+                sparse sont remises à l'échelle.
             
         Returns:
             Dict avec résultats
@@ -169,9 +193,14 @@ class COLMAPPipeline:
             'stereo_fusion': None
         }
         
+        dense_images_dir = Path(images_dir) if images_dir else self.images_dir
+        if dense_images_dir != self.images_dir:
+            print(f"\nRemise à l'échelle du modèle sparse pour {dense_images_dir}...")
+            model_path = self.rescale_model(model_path, dense_images_dir)
+        
         # 1. Image undistorter
         print("\n[1/3] Undistortion des images...")
-        results['image_undistorter'] = self.image_undistorter(model_path)
+        results['image_undistorter'] = self.image_undistorter(model_path, dense_images_dir)
         
         # 2. Patch Match Stereo
         print("\n[2/3] Patch Match Stereo...")
@@ -184,18 +213,121 @@ class COLMAPPipeline:
         print("\n✅ Reconstruction dense terminée!")
         return results
     
-    def image_undistorter(self, model_path: Path) -> Dict:
-        """Undistort images"""
+    def rescale_model(self, model_path: Path, images_dir: Path) -> Path:
+        """
+        Copie le modèle sparse avec caméras adaptées à la résolution de images_dir
+        
+        Même convention que Camera::Rescale de COLMAP: focales et point
+        principal multipliés par le ratio de dimensions.
+        
+        Args:
+            model_path: Modèle sparse (calculé sur le set SfM)
+            images_dir: Images cibles (mêmes noms)
+            
+        Returns:
+            Chemin du modèle remis à l'échelle (format TXT)
+        """
+        scaled_dir = self.sparse_dir / f"{Path(model_path).name}_dense"
+        scaled_dir.mkdir(parents=True, exist_ok=True)
+        
+        subprocess.run([
+            'colmap', 'model_converter',
+            '--input_path', str(model_path),
+            '--output_path', str(scaled_dir),
+            '--output_type', 'TXT'
+        ], capture_output=True, text=True, check=True)
+        
+        cameras_file = scaled_dir / "cameras.txt"
+        images_file = scaled_dir / "images.txt"
+        
+        cameras = {}
+        camera_lines = []
+        for line in cameras_file.read_text().splitlines():
+            if line.startswith('#') or not line.strip():
+                camera_lines.append(line)
+                continue
+            camera_id, model, width, height, *params = line.split()
+            cameras[camera_id] = (model, int(width), int(height), [float(p) for p in params])
+        
+        # Dimensions cibles lues sur une image par caméra
+        image_sizes = self._image_sizes_by_camera(images_file, images_dir)
+        
+        scales = {}
+        for camera_id, (model, width, height, params) in cameras.items():
+            target_width, target_height = image_sizes.get(camera_id, (width, height))
+            sx, sy = target_width / width, target_height / height
+            scales[camera_id] = (sx, sy)
+            
+            focal_indices, pp_indices = CAMERA_PARAM_INDICES.get(model, ([], []))
+            if len(focal_indices) == 1:
+                params[focal_indices[0]] *= sx
+            elif focal_indices:
+                params[focal_indices[0]] *= sx
+                params[focal_indices[1]] *= sy
+            if pp_indices:
+                params[pp_indices[0]] *= sx
+                params[pp_indices[1]] *= sy
+            
+            camera_lines.append(' '.join(
+                [camera_id, model, str(target_width), str(target_height)] + [repr(p) for p in params]
+            ))
+        
+        cameras_file.write_text('\n'.join(camera_lines) + '\n')
+        
+        # Coordonnées 2D des observations (2e ligne de chaque image)
+        image_lines = []
+        camera_id = None
+        for line in images_file.read_text().splitlines():
+            if line.startswith('#') or not line.strip():
+                image_lines.append(line)
+                continue
+            if camera_id is None:
+                camera_id = line.split()[8]
+                image_lines.append(line)
+                continue
+            sx, sy = scales.get(camera_id, (1.0, 1.0))
+            values = line.split()
+            for i in range(0, len(values) - 2, 3):
+                values[i] = repr(float(values[i]) * sx)
+                values[i + 1] = repr(float(values[i + 1]) * sy)
+            image_lines.append(' '.join(values))
+            camera_id = None
+        
+        images_file.write_text('\n'.join(image_lines) + '\n')
+        return scaled_dir
+    
+    def _image_sizes_by_camera(self, images_file: Path, images_dir: Path) -> Dict[str, Tuple[int, int]]:
+        """Dimensions (largeur, hauteur) d'une image de images_dir par caméra"""
+        sizes = {}
+        is_header = True
+        for line in images_file.read_text().splitlines():
+            if line.startswith('#') or not line.strip():
+                continue
+            if is_header:
+                values = line.split()
+                camera_id, name = values[8], ' '.join(values[9:])
+                if camera_id not in sizes:
+                    img = cv2.imread(str(images_dir / name))
+                    if img is not None:
+                        sizes[camera_id] = (img.shape[1], img.shape[0])
+            is_header = not is_header
+        return sizes
+    
+    def image_undistorter(self, model_path: Path, images_dir: Optional[Path] = None) -> Dict:
+        """Undistort images (plafonnées à la résolution dense du tier)"""
         dense_images_dir = self.dense_dir / "images"
         
         cmd = [
             'colmap', 'image_undistorter',
-            '--image_path', str(self.images_dir),
+            '--image_path', str(images_dir or self.images_dir),
             '--input_path', str(model_path),
             '--output_path', str(self.dense_dir),
             '--output_type', 'COLMAP'
         ]
         
+        if self.resolution_policy.dense_max_size:
+            cmd += ['--max_image_size', str(self.resolution_policy.dense_max_size)]
+        
         try:
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
             return {'success': True, 'undistorted_images': str(dense_images_dir)}
@@ -247,10 +379,12 @@ def main():
     parser.add_argument('--sfm', action='store_true', help='Exécuter pipeline SfM')
     parser.add_argument('--dense', action='store_true', help='Exécuter reconstruction dense')
     parser.add_argument('--model', help='Chemin modèle sparse (pour dense reconstruction)')
+    parser.add_argument('--dense-images', help='Images pleine résolution pour le dense')
+    parser.add_argument('--quality', default=None, help='Tier de qualité (draft, standard, high)')
     
     args = parser.parse_args()
     
-    pipeline = COLMAPPipeline(args.workspace)
+    pipeline = COLMAPPipeline(args.workspace, get_resolution_policy(args.quality))
     
     try:
         if args.sfm:
@@ -259,7 +393,8 @@ def main():
             print(json.dumps(results, indent=2))
         
         if args.dense:
-            results = pipeline.run_dense_reconstruction(args.model)
+            pipeline.images_dir = Path(args.images)
+            results = pipeline.run_dense_reconstruction(args.model, args.dense_images)
             print("\n📊 Résultats Dense:")
             print(json.dumps(results, indent=2))
         
@@ -17,6 +17,11 @@ except ImportError:
     print("⚠️  Trimesh non installé: pip install trimesh")
     trimesh = None
 
+try:
+    from photogrammetry.usdz_packager import USD_AVAILABLE, author_usd, mesh_to_usdz
+except ImportError:
+    from usdz_packager import USD_AVAILABLE, author_usd, mesh_to_usdz
+
 class FormatConverter:
     def __init__(self, input_path: str, output_dir: str):
         """
@@ -83,12 +88,23 @@ class FormatConverter:
         """
         print(f"Conversion USDZ: {self.input_path}")
         
-        # USDZ nécessite usdzip tool (Xcode Command Line Tools)
-        # Alternative: utiliser Reality Converter ou usd-core
-        
         output_path = self.output_dir / f"{self.input_path.stem}.usdz"
         
-        # Méthode 1: Utiliser usdzip (macOS seulement)
+        # Méthode 1: usd-core + archive écrite en Python (Linux, pas d'outil externe)
+        if USD_AVAILABLE:
+            try:
+                result = mesh_to_usdz(str(self.input_path), str(output_path))
+                
+                return {
+                    'success': True,
+                    'path': result['path'],
+                    'size_mb': result['size'] / (1024 * 1024),
+                    'format': 'USDZ'
+                }
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+        
+        # Méthode 2: Utiliser usdzip (macOS seulement)
         try:
             # Convertir d'abord en USD
             usd_path = self.convert_to_usd()
@@ -123,14 +139,26 @@ class FormatConverter:
         Returns:
             Dict avec résultats
         """
-        output_path = self.output_dir / f"{self.input_path.stem}.usd"
+        output_path = self.output_dir / f"{self.input_path.stem}.usdc"
         
-        # TODO: Utiliser usd-core ou Blender pour conversion
-        # Pour l'instant, retourner erreur
-        return {
-            'success': False,
-            'error': 'Conversion USD non implémentée (nécessite usd-core)'
-        }
+        if not USD_AVAILABLE:
+            return {
+                'success': False,
+                'error': 'Conversion USD non disponible (nécessite usd-core: pip install usd-core)'
+            }
+        
+        try:
+            stage = author_usd(str(self.input_path), str(output_path))
+            
+            return {
+                'success': True,
+                'path': str(output_path),
+                'size_mb': output_path.stat().st_size / (1024 * 1024),
+                'format': 'USD',
+                **stage
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
     
     def convert_with_blender(self, format: str, output_path: Path, draco: bool = False) -> Dict:
         """
@@ -1,115 +1,704 @@
 #!/usr/bin/env python3
 """
 Frame Extractor pour Photogrammétrie
-Extrait automatiquement les frames d'une vidéo à 30fps pour COLMAP
+Extrait automatiquement les frames d'une vidéo à 30fps pour COLMAP et Gaussian Splatting
+
+Service partagé: backends ffmpeg / OpenCV (même sélection de frames) et cache
+des frames extraites par hash de contenu vidéo, pour ne décoder qu'une fois une
+vidéo soumise aux deux pipelines.
 """
 
-import cv2
 import os
+import json
+import shutil
+import hashlib
 import argparse
+import subprocess
 import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Any, Callable
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    print("⚠️  OpenCV non installé (backend ffmpeg uniquement): pip install opencv-python")
+    cv2 = None
+    np = None
+
+try:
+    from photogrammetry.resolution_policy import scaled_size
+except ImportError:
+    from resolution_policy import scaled_size
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): pas de verrou inter-process
+    fcntl = None
+
+# Cache partagé des frames extraites (layout: <cache>/<clé>/frame_%06d.jpg + manifest.json)
+FRAME_CACHE_DIR = Path(os.getenv('FRAME_CACHE_DIR', '/tmp/frames/cache'))
+FRAME_CACHE_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+
+# Éviction (scratch_space.sweep): LRU au-delà de FRAME_CACHE_MAX_GB, entrées
+# inutilisées depuis FRAME_CACHE_MAX_AGE_HOURS. Les étapes d'un job relisent
+# frames_dir sans verrou: une entrée n'est jamais évincée avant
+# FRAME_CACHE_MIN_IDLE_HOURS d'inactivité.
+FRAME_CACHE_MAX_GB = float(os.getenv('FRAME_CACHE_MAX_GB', 50))
+FRAME_CACHE_MAX_AGE_HOURS = float(os.getenv('FRAME_CACHE_MAX_AGE_HOURS', 72))
+FRAME_CACHE_MIN_IDLE_HOURS = float(os.getenv('FRAME_CACHE_MIN_IDLE_HOURS', 12))
+# Extraction interrompue (worker tué): <clé>.tmp-<pid> sans écriture depuis ce délai
+FRAME_CACHE_TMP_GRACE_HOURS = float(os.getenv('FRAME_CACHE_TMP_GRACE_HOURS', 2))
+
+BACKENDS = ('auto', 'ffmpeg', 'opencv')
+
+# Rotation d'affichage (degrés horaires) → filtres ffmpeg
+ROTATION_FILTERS = {
+    90: ['transpose=clock'],
+    180: ['hflip', 'vflip'],
+    270: ['transpose=cclock']
+}
+
 
 class FrameExtractor:
-    def __init__(self, video_path: str, output_dir: str, fps: int = 30):
+    def __init__(
+        self,
+        video_path: str,
+        output_dir: str,
+        fps: int = 30,
+        backend: str = 'auto',
+        jpeg_quality: int = 95,
+        decode_threads: int = 0,
+        encode_threads: Optional[int] = None,
+        max_size: Optional[int] = None
+    ):
         """
         Initialise l'extracteur de frames
-        
+
         Args:
             video_path: Chemin vers la vidéo
             output_dir: Dossier de sortie pour les frames
             fps: FPS d'extraction (défaut: 30)
+            backend: 'ffmpeg', 'opencv' ou 'auto' (ffmpeg si disponible)
+            jpeg_quality: Qualité JPEG des frames (0-100)
+            decode_threads: Threads de décodage ffmpeg (0 = auto)
+            encode_threads: Threads d'encodage JPEG (défaut: nombre de CPU)
+            max_size: Plus grand côté des frames (None = résolution capture)
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend inconnu: {backend} ({', '.join(BACKENDS)})")
+
         self.video_path = video_path
         self.output_dir = Path(output_dir)
         self.fps = fps
+        self.backend = backend
+        self.jpeg_quality = jpeg_quality
+        self.decode_threads = decode_threads
+        self.encode_threads = encode_threads or os.cpu_count() or 4
+        self.max_size = max_size
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
+
+    def resolve_backend(self) -> str:
+        """Backend effectif ('ffmpeg' ou 'opencv')"""
+        if self.backend != 'auto':
+            return self.backend
+        if shutil.which('ffmpeg') and (shutil.which('ffprobe') or cv2 is not None):
+            return 'ffmpeg'
+        if cv2 is not None:
+            return 'opencv'
+        raise RuntimeError("Aucun backend disponible (ffmpeg ou OpenCV requis)")
+
+    def frame_interval(self, video_fps: float) -> int:
+        """
+        Intervalle entre frames extraites
+
+        Identique pour tous les backends: frame n extraite si n % interval == 0.
+        """
+        if not video_fps or video_fps <= 0:
+            return 1
+        return max(1, int(round(video_fps / self.fps)))
+
     def extract_frames(self) -> List[str]:
         """
         Extrait les frames de la vidéo
-        
+
         Returns:
             Liste des chemins des frames extraites
         """
-        print(f"Extraction des frames de {self.video_path} à {self.fps} fps...")
-        
+        backend = self.resolve_backend()
+        print(f"Extraction des frames de {self.video_path} à {self.fps} fps ({backend})...")
+
+        if backend == 'ffmpeg':
+            return self._extract_with_ffmpeg()
+        return self._extract_with_opencv()
+
+    def _ffmpeg_filters(self, frame_interval: int, rotation: int, info: Dict[str, Any]) -> str:
+        """
+        Filtre vidéo: select d'abord, puis rotation et réduction
+
+        L'autorotate ffmpeg est désactivé (-noautorotate) car il s'insère en
+        tête du graphe et transposerait aussi les frames ignorées.
+        """
+        filters = [f"select='not(mod(n\\,{frame_interval}))'"]
+        filters.extend(ROTATION_FILTERS.get(rotation, []))
+
+        width, height = scaled_size(info['width'], info['height'], self.max_size)
+        if (width, height) != (info['width'], info['height']):
+            filters.append(f"scale={width}:{height}:flags=area")
+        return ','.join(filters)
+
+    def _ffmpeg_input_args(self) -> List[str]:
+        return [
+            'ffmpeg', '-v', 'error', '-nostdin', '-y',
+            '-threads', str(self.decode_threads),
+            '-noautorotate',
+            '-i', self.video_path,
+            '-filter_threads', str(self.decode_threads or self.encode_threads)
+        ]
+
+    def _extract_with_ffmpeg(self) -> List[str]:
+        """
+        Extraction ffmpeg: décodage multi-thread, filtre select sur l'index de
+        frame (les frames ignorées ne sont jamais converties), rotation iPhone
+        appliquée. Les frames brutes BGR passent par un pipe dans des buffers
+        NumPy réutilisés et sont encodées en JPEG en parallèle.
+        """
+        info = self.get_video_info()
+        if not info:
+            raise ValueError(f"Impossible d'ouvrir la vidéo: {self.video_path}")
+
+        frame_interval = self.frame_interval(info['fps'])
+        rotation = info.get('rotation', 0)
+        print(f"Vidéo: {info['frame_count']} frames à {info['fps']:.2f} fps ({info['duration']:.2f}s)"
+              + (f", rotation {rotation}°" if rotation else ""))
+
+        if cv2 is None:
+            return self._extract_with_ffmpeg_jpeg(frame_interval, rotation, info)
+
+        # Dimensions d'affichage (après rotation), cf. get_video_info
+        width, height = scaled_size(info['width'], info['height'], self.max_size)
+
+        cmd = self._ffmpeg_input_args() + [
+            '-vf', self._ffmpeg_filters(frame_interval, rotation, info),
+            '-vsync', 'passthrough',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            'pipe:1'
+        ]
+
+        # Anneau de buffers: un buffer n'est réutilisé qu'une fois son JPEG écrit
+        num_buffers = self.encode_threads + 2
+        buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(num_buffers)]
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+
+        extracted_frames = []
+        pending = deque()
+
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            with ThreadPoolExecutor(max_workers=self.encode_threads) as pool:
+                while True:
+                    if len(pending) == num_buffers:
+                        pending.popleft().result()
+
+                    buffer = buffers[len(extracted_frames) % num_buffers]
+                    if not _read_exact(process.stdout, memoryview(buffer.reshape(-1))):
+                        break
+
+                    frame_path = self.output_dir / f"frame_{len(extracted_frames):06d}.jpg"
+                    pending.append(pool.submit(_write_jpeg, str(frame_path), buffer, encode_params))
+                    extracted_frames.append(str(frame_path))
+
+                    if len(extracted_frames) % 100 == 0:
+                        print(f"Extrait {len(extracted_frames)} frames...")
+
+                for future in pending:
+                    future.result()
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            process.stderr.close()
+            process.wait()
+
+        if process.returncode != 0:
+            raise RuntimeError(f"Échec extraction ffmpeg: {stderr}")
+
+        print(f"Extraction terminée: {len(extracted_frames)} frames extraites")
+        return extracted_frames
+
+    def _extract_with_ffmpeg_jpeg(self, frame_interval: int, rotation: int, info: Dict[str, Any]) -> List[str]:
+        """Extraction ffmpeg sans OpenCV: JPEG écrits directement par ffmpeg"""
+        # qscale 2-31 (2 = meilleure qualité)
+        qscale = max(2, min(31, round(31 - self.jpeg_quality * 29 / 100)))
+
+        cmd = self._ffmpeg_input_args() + [
+            '-vf', self._ffmpeg_filters(frame_interval, rotation, info),
+            '-vsync', 'passthrough',
+            '-qscale:v', str(qscale),
+            '-start_number', '0',
+            str(self.output_dir / 'frame_%06d.jpg')
+        ]
+
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Échec extraction ffmpeg: {e.stderr}")
+
+        extracted_frames = sorted(str(p) for p in self.output_dir.glob('frame_*.jpg'))
+        print(f"Extraction terminée: {len(extracted_frames)} frames extraites")
+        return extracted_frames
+
+    def _extract_with_opencv(self) -> List[str]:
+        """Extraction OpenCV (fallback sans ffmpeg)"""
+        if cv2 is None:
+            raise RuntimeError("OpenCV non disponible")
+
         cap = cv2.VideoCapture(self.video_path)
         if not cap.isOpened():
             raise ValueError(f"Impossible d'ouvrir la vidéo: {self.video_path}")
-        
+
         # Obtenir les propriétés de la vidéo
         video_fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / video_fps
-        
+        duration = total_frames / video_fps if video_fps else 0
+
         print(f"Vidéo: {total_frames} frames à {video_fps} fps ({duration:.2f}s)")
-        
+
         # Calculer intervalle d'extraction
-        frame_interval = max(1, int(video_fps / self.fps))
-        
+        frame_interval = self.frame_interval(video_fps)
+        frame_size = None
+
         extracted_frames = []
         frame_count = 0
         extracted_count = 0
-        
+
         while True:
+            # grab() sans décodage complet pour les frames ignorées
+            if frame_count % frame_interval != 0:
+                if not cap.grab():
+                    break
+                frame_count += 1
+                continue
+
             ret, frame = cap.read()
             if not ret:
                 break
-            
-            # Extraire frame si c'est le bon intervalle
-            if frame_count % frame_interval == 0:
-                frame_filename = f"frame_{extracted_count:06d}.jpg"
-                frame_path = self.output_dir / frame_filename
-                
-                # Sauvegarder frame
-                cv2.imwrite(str(frame_path), frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                extracted_frames.append(str(frame_path))
-                extracted_count += 1
-                
-                if extracted_count % 10 == 0:
-                    print(f"Extrait {extracted_count} frames...")
-            
+
+            if self.max_size:
+                if frame_size is None:
+                    frame_size = scaled_size(frame.shape[1], frame.shape[0], self.max_size)
+                if frame_size != (frame.shape[1], frame.shape[0]):
+                    frame = cv2.resize(frame, frame_size, interpolation=cv2.INTER_AREA)
+
+            frame_filename = f"frame_{extracted_count:06d}.jpg"
+            frame_path = self.output_dir / frame_filename
+
+            # Sauvegarder frame
+            cv2.imwrite(str(frame_path), frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            extracted_frames.append(str(frame_path))
+            extracted_count += 1
+
+            if extracted_count % 10 == 0:
+                print(f"Extrait {extracted_count} frames...")
+
             frame_count += 1
-        
+
         cap.release()
         print(f"Extraction terminée: {extracted_count} frames extraites")
-        
+
         return extracted_frames
-    
+
     def get_video_info(self) -> dict:
         """
         Obtient les informations de la vidéo
-        
+
         Returns:
-            Dict avec infos vidéo
+            Dict avec infos vidéo (width/height après rotation d'affichage)
         """
+        if shutil.which('ffprobe'):
+            info = self._probe_with_ffprobe()
+            if info:
+                return info
+
+        if cv2 is None:
+            return {}
+
         cap = cv2.VideoCapture(self.video_path)
         if not cap.isOpened():
             return {}
-        
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        rotation = 0
+        if hasattr(cv2, 'CAP_PROP_ORIENTATION_META'):
+            rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META)) % 360
+            # Sans auto-orientation, OpenCV rapporte les dimensions codées
+            auto_oriented = bool(cap.get(cv2.CAP_PROP_ORIENTATION_AUTO))
+            if rotation in (90, 270) and not auto_oriented:
+                width, height = height, width
+
         info = {
-            'fps': cap.get(cv2.CAP_PROP_FPS),
-            'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-            'duration': cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+            'fps': fps,
+            'frame_count': frame_count,
+            'width': width,
+            'height': height,
+            'duration': frame_count / fps if fps else 0,
+            'rotation': rotation
         }
-        
+
         cap.release()
         return info
 
+    def _probe_with_ffprobe(self) -> dict:
+        """Infos vidéo via ffprobe"""
+        cmd = [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries',
+            'stream=avg_frame_rate,nb_frames,width,height,duration:stream_tags=rotate:stream_side_data=rotation',
+            '-of', 'json',
+            self.video_path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            streams = json.loads(result.stdout).get('streams', [])
+        except (subprocess.CalledProcessError, ValueError):
+            return {}
+
+        if not streams:
+            return {}
+
+        stream = streams[0]
+        rotation = _stream_rotation(stream)
+        width, height = int(stream.get('width', 0)), int(stream.get('height', 0))
+        if rotation in (90, 270):
+            width, height = height, width
+
+        num, _, den = stream.get('avg_frame_rate', '0/1').partition('/')
+        fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+        duration = float(stream.get('duration') or 0)
+        frame_count = int(stream.get('nb_frames') or round(duration * fps))
+
+        return {
+            'fps': fps,
+            'frame_count': frame_count,
+            'width': width,
+            'height': height,
+            'duration': duration or (frame_count / fps if fps else 0),
+            'rotation': rotation
+        }
+
+
+def _stream_rotation(stream: Dict[str, Any]) -> int:
+    """
+    Rotation d'affichage horaire (0/90/180/270) d'un stream ffprobe
+
+    Les MOV iPhone portent une display matrix (side data, angle anti-horaire,
+    ex: -90) ou le tag 'rotate' (horaire) sur les anciennes versions de ffmpeg.
+    """
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            return int(round(-float(side_data['rotation']))) % 360
+    rotate = stream.get('tags', {}).get('rotate')
+    if rotate:
+        return int(rotate) % 360
+    return 0
+
+
+def _read_exact(stream, view: memoryview) -> bool:
+    """Remplit entièrement le buffer depuis le pipe (False en fin de flux)"""
+    offset = 0
+    while offset < len(view):
+        count = stream.readinto(view[offset:])
+        if not count:
+            if offset:
+                raise RuntimeError("Frame tronquée dans le flux ffmpeg")
+            return False
+        offset += count
+    return True
+
+
+def _write_jpeg(path: str, frame, encode_params: List[int]):
+    """Encode et écrit une frame (cv2 relâche le GIL)"""
+    if not cv2.imwrite(path, frame, encode_params):
+        raise RuntimeError(f"Impossible d'écrire {path}")
+
+
+def compute_video_hash(video_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    SHA-256 du contenu vidéo (clé de cache)
+
+    Args:
+        video_path: Chemin vidéo
+        chunk_size: Taille de lecture
+
+    Returns:
+        Hash hexadécimal
+    """
+    sha256 = hashlib.sha256()
+    with open(video_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def frame_cache_key(
+    video_hash: str,
+    fps: int,
+    jpeg_quality: int = 95,
+    max_size: Optional[int] = None
+) -> str:
+    """Clé de cache: contenu vidéo + paramètres d'extraction"""
+    size = f"max{max_size}" if max_size else "full"
+    return f"{video_hash}-{fps}fps-{size}-q{jpeg_quality}-v{FRAME_CACHE_VERSION}"
+
+
+def extract_frames_cached(
+    video_path: str,
+    fps: int = 30,
+    cache_dir: Optional[str] = None,
+    backend: str = 'auto',
+    jpeg_quality: int = 95,
+    content_hash: Optional[str] = None,
+    max_size: Optional[int] = None,
+    verify_hash: Optional[Callable[[], str]] = None
+) -> Dict[str, Any]:
+    """
+    Extrait les frames via le cache partagé (une seule extraction par vidéo/paramètres)
+
+    Les workers COLMAP et Gaussian consomment le même dossier en lecture seule.
+    video_path peut être une URL (lecture par plages ffmpeg/OpenCV) si
+    content_hash est fourni.
+
+    Args:
+        video_path: Chemin vidéo
+        fps: FPS d'extraction
+        cache_dir: Racine du cache (défaut: FRAME_CACHE_DIR)
+        backend: Backend d'extraction
+        jpeg_quality: Qualité JPEG
+        content_hash: SHA-256 déjà connu de la vidéo (évite une relecture)
+        max_size: Plus grand côté des frames (None = résolution capture)
+        verify_hash: Retourne le SHA-256 réel quand content_hash est annoncé
+            et pas encore vérifié (téléchargement en cours); appelé avant de
+            réutiliser ou de publier une entrée du cache
+
+    Returns:
+        Dict avec frames_dir, frames, frame_count, cache_hit, cache_key
+
+    Raises:
+        ValueError: le hash réel ne correspond pas à content_hash
+    """
+    cache_root = Path(cache_dir) if cache_dir else FRAME_CACHE_DIR
+    cache_root.mkdir(parents=True, exist_ok=True)
+
+    video_hash = content_hash or compute_video_hash(video_path)
+    key = frame_cache_key(video_hash, fps, jpeg_quality, max_size)
+    frames_dir = cache_root / key
+
+    # Deux workers sur la même vidéo: le second attend puis réutilise
+    with _lock_entry(cache_root / f"{key}.lock"):
+        manifest = _load_manifest(frames_dir)
+        cache_hit = manifest is not None
+
+        if cache_hit:
+            _check_hash(video_hash, verify_hash)
+            os.utime(frames_dir / MANIFEST_FILE)  # Pour éviction LRU
+        else:
+            tmp_dir = cache_root / f"{key}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+            try:
+                extractor = FrameExtractor(
+                    video_path, str(tmp_dir), fps, backend, jpeg_quality, max_size=max_size
+                )
+                video_info = extractor.get_video_info()
+                frames = extractor.extract_frames()
+
+                manifest = {
+                    'video_sha256': video_hash,
+                    'fps': fps,
+                    'jpeg_quality': jpeg_quality,
+                    'max_size': max_size,
+                    'backend': extractor.resolve_backend(),
+                    'frame_interval': extractor.frame_interval(video_info.get('fps', 0)),
+                    'frame_count': len(frames),
+                    'frames': [Path(f).name for f in frames],
+                    'video_info': video_info,
+                    'created_at': datetime.utcnow().isoformat()
+                }
+                (tmp_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+                _check_hash(video_hash, verify_hash)
+                shutil.rmtree(frames_dir, ignore_errors=True)
+                tmp_dir.rename(frames_dir)
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+    return {
+        'frames_dir': str(frames_dir),
+        'frames': [str(frames_dir / name) for name in manifest['frames']],
+        'frame_count': manifest['frame_count'],
+        'cache_hit': cache_hit,
+        'cache_key': key,
+        'video_sha256': video_hash
+    }
+
+
+def _check_hash(video_hash: str, verify_hash: Optional[Callable[[], str]]):
+    """Hash annoncé confirmé par le contenu réel (sinon: pas d'accès au cache)"""
+    if verify_hash is None:
+        return
+    actual = verify_hash()
+    if actual != video_hash:
+        raise ValueError(f"Video content hash mismatch: announced {video_hash}, actual {actual}")
+
+
+def _lock_entry(lock_path: Path, blocking: bool = True):
+    """
+    Verrou exclusif d'une entrée du cache
+
+    L'éviction supprime le fichier de verrou avec l'entrée: un verrou obtenu
+    sur un fichier supprimé entre-temps est repris sur le nouveau fichier.
+
+    Returns:
+        Fichier de verrou ouvert (à fermer), None si non bloquant et déjà pris
+    """
+    while True:
+        lock_file = open(lock_path, 'w')
+        if not fcntl:
+            return lock_file
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        try:
+            if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                return lock_file
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+
+
+def _entry_size(frames_dir: Path) -> int:
+    total = 0
+    try:
+        with os.scandir(frames_dir) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+
+def _remove_entry(cache_root: Path, key: str) -> bool:
+    """Supprime une entrée si personne ne l'extrait ni ne la consulte"""
+    lock_path = cache_root / f"{key}.lock"
+    lock_file = _lock_entry(lock_path, blocking=False)
+    if lock_file is None:
+        return False
+    with lock_file:
+        shutil.rmtree(cache_root / key, ignore_errors=True)
+        lock_path.unlink(missing_ok=True)
+    return True
+
+
+def evict_frame_cache(
+    cache_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    max_age_hours: float = FRAME_CACHE_MAX_AGE_HOURS,
+    min_idle_hours: float = FRAME_CACHE_MIN_IDLE_HOURS,
+    tmp_grace_hours: float = FRAME_CACHE_TMP_GRACE_HOURS
+) -> Dict[str, int]:
+    """
+    Nettoie le cache de frames: extractions interrompues, entrées expirées,
+    puis les moins récemment utilisées tant que le cache dépasse max_bytes
+
+    Args:
+        cache_dir: Racine du cache (défaut: FRAME_CACHE_DIR)
+        max_bytes: Taille max du cache (défaut: FRAME_CACHE_MAX_GB)
+        max_age_hours: Inactivité au-delà de laquelle une entrée est supprimée
+        min_idle_hours: Inactivité minimale avant toute éviction
+        tmp_grace_hours: Âge des dossiers .tmp-<pid> abandonnés
+
+    Returns:
+        Compteurs {'tmp', 'expired', 'evicted'}
+    """
+    cache_root = Path(cache_dir) if cache_dir else FRAME_CACHE_DIR
+    max_bytes = max_bytes if max_bytes is not None else int(FRAME_CACHE_MAX_GB * 1024 ** 3)
+    stats = {'tmp': 0, 'expired': 0, 'evicted': 0}
+    if not cache_root.is_dir():
+        return stats
+
+    now = time.time()
+    entries = []
+    for path in cache_root.iterdir():
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            continue
+        if '.tmp-' in path.name:
+            # Le dossier est modifié à chaque frame écrite tant que l'extraction tourne
+            if now - mtime > tmp_grace_hours * 3600:
+                shutil.rmtree(path, ignore_errors=True)
+                stats['tmp'] += 1
+        elif path.is_dir():
+            try:
+                last_used = (path / MANIFEST_FILE).stat().st_mtime  # Touché à chaque réutilisation
+            except OSError:
+                last_used = mtime
+            entries.append((last_used, path.name, _entry_size(path)))
+        elif path.suffix == '.lock' and not (cache_root / path.stem).exists() and now - mtime > max_age_hours * 3600:
+            _remove_entry(cache_root, path.stem)
+
+    total = sum(size for _, _, size in entries)
+    for last_used, key, size in sorted(entries):
+        idle = now - last_used
+        expired = idle > max_age_hours * 3600
+        if not expired and total <= max_bytes:
+            break
+        if idle < min_idle_hours * 3600:
+            break
+        if _remove_entry(cache_root, key):
+            total -= size
+            stats['expired' if expired else 'evicted'] += 1
+
+    return stats
+
+
+def _load_manifest(frames_dir: Path) -> Optional[Dict[str, Any]]:
+    """Manifest d'un set de frames complet (None si absent/invalide)"""
+    try:
+        manifest = json.loads((frames_dir / MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get('frame_count') != len(manifest.get('frames', [])):
+        return None
+    return manifest
+
+
 def main():
     parser = argparse.ArgumentParser(description='Extrait les frames d\'une vidéo pour photogrammétrie')
     parser.add_argument('video', help='Chemin vers la vidéo')
     parser.add_argument('-o', '--output', default='frames', help='Dossier de sortie')
     parser.add_argument('--fps', type=int, default=30, help='FPS d\'extraction (défaut: 30)')
-    
+    parser.add_argument('--backend', choices=BACKENDS, default='auto', help='Backend de décodage')
+    parser.add_argument('--max-size', type=int, help='Plus grand côté des frames (défaut: résolution capture)')
+
     args = parser.parse_args()
-    
-    extractor = FrameExtractor(args.video, args.output, args.fps)
-    
+
+    extractor = FrameExtractor(args.video, args.output, args.fps, args.backend, max_size=args.max_size)
+
     try:
         frames = extractor.extract_frames()
         print(f"\n✅ Succès: {len(frames)} frames extraites dans {args.output}")
@@ -120,13 +709,3 @@ def main():
 
 if __name__ == '__main__':
     sys.exit(main())
-
-
-
-
-
-
-
-
-
-
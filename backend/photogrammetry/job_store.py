@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Job Store pour server_api
+État des jobs photogrammétrie et file d'attente partagés dans Redis
+
+Survit aux redémarrages et partagé par plusieurs processus API du nœud:
+- photogrammetry:job:<id>     hash (champs JSON), expire PHOTOGRAMMETRY_JOB_TTL
+- photogrammetry:queue        zset FIFO des jobs en attente (score = séquence)
+- photogrammetry:running      hash job_id -> runner propriétaire
+- photogrammetry:runner:<id>  heartbeat d'un runner (TTL)
+- photogrammetry:upload:<id>  session d'upload résumable (hash) et
+  photogrammetry:upload:<id>:chunks (set des index reçus), expire UPLOAD_SESSION_TTL
+
+Un job dont le runner ne bat plus (processus tué, redémarrage) est remis
+en tête de file par recover_orphans().
+"""
+
+import os
+import json
+import socket
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+PHOTOGRAMMETRY_JOB_TTL = int(os.getenv('PHOTOGRAMMETRY_JOB_TTL', 7 * 24 * 3600))
+RUNNER_HEARTBEAT_TTL = int(os.getenv('PHOTOGRAMMETRY_RUNNER_HEARTBEAT_TTL', 30))
+UPLOAD_SESSION_TTL = int(os.getenv('PHOTOGRAMMETRY_UPLOAD_SESSION_TTL', 24 * 3600))
+
+JOB_KEY = "photogrammetry:job:{job_id}"
+QUEUE_KEY = "photogrammetry:queue"
+QUEUE_SEQ_KEY = "photogrammetry:queue_seq"
+RUNNING_KEY = "photogrammetry:running"
+RUNNER_KEY = "photogrammetry:runner:{runner_id}"
+UPLOAD_KEY = "photogrammetry:upload:{upload_id}"
+UPLOAD_CHUNKS_KEY = "photogrammetry:upload:{upload_id}:chunks"
+
+# Retire le premier job de la file et l'attribue au runner (atomique)
+CLAIM_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+redis.call('HSET', KEYS[2], popped[1], ARGV[1])
+return popped[1]
+"""
+
+
+class JobStore:
+    """Jobs server_api dans Redis"""
+
+    def __init__(self, redis_conn: Optional[redis.Redis] = None):
+        self.redis = redis_conn or redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            password=os.getenv('REDIS_PASSWORD'),
+            db=int(os.getenv('PHOTOGRAMMETRY_REDIS_DB', 0))
+        )
+        self._claim = self.redis.register_script(CLAIM_SCRIPT)
+
+    # --- État des jobs ---
+
+    def create(self, job: Dict[str, Any]):
+        """Enregistre un nouveau job"""
+        self._write(job['job_id'], job)
+
+    def update(self, job_id: str, **fields):
+        """Met à jour des champs d'un job (écriture partielle)"""
+        self._write(job_id, fields)
+
+    def _write(self, job_id: str, fields: Dict[str, Any]):
+        key = JOB_KEY.format(job_id=job_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={name: json.dumps(value, default=str) for name, value in fields.items()})
+        pipe.expire(key, PHOTOGRAMMETRY_JOB_TTL)
+        pipe.execute()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job complet, None si inconnu ou expiré"""
+        data = self.redis.hgetall(JOB_KEY.format(job_id=job_id))
+        if not data:
+            return None
+        return {name.decode(): json.loads(value) for name, value in data.items()}
+
+    # --- File d'attente ---
+
+    def enqueue(self, job_id: str, front: bool = False) -> int:
+        """
+        Ajoute un job en file (en tête pour une reprise)
+
+        Returns:
+            Position dans la file (1 = prochain)
+        """
+        seq = self.redis.incr(QUEUE_SEQ_KEY)
+        self.redis.zadd(QUEUE_KEY, {job_id: -seq if front else seq})
+        return self.queue_position(job_id) or 1
+
+    def queue_length(self) -> int:
+        return self.redis.zcard(QUEUE_KEY)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Position dans la file (1 = prochain), None si pas en attente"""
+        rank = self.redis.zrank(QUEUE_KEY, job_id)
+        return rank + 1 if rank is not None else None
+
+    def claim(self, runner_id: str) -> Optional[str]:
+        """Prend le prochain job de la file pour ce runner"""
+        job_id = self._claim(keys=[QUEUE_KEY, RUNNING_KEY], args=[runner_id])
+        return job_id.decode() if job_id else None
+
+    def finish(self, job_id: str):
+        """Job terminé (succès ou échec): plus attribué à un runner"""
+        self.redis.hdel(RUNNING_KEY, job_id)
+
+    # --- Uploads résumables ---
+
+    def create_upload(self, upload: Dict[str, Any]):
+        """Enregistre une session d'upload"""
+        key = UPLOAD_KEY.format(upload_id=upload['upload_id'])
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={name: json.dumps(value, default=str) for name, value in upload.items()})
+        pipe.expire(key, UPLOAD_SESSION_TTL)
+        pipe.execute()
+
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Session d'upload avec les index des chunks reçus, None si inconnue ou expirée"""
+        pipe = self.redis.pipeline()
+        pipe.hgetall(UPLOAD_KEY.format(upload_id=upload_id))
+        pipe.smembers(UPLOAD_CHUNKS_KEY.format(upload_id=upload_id))
+        data, chunks = pipe.execute()
+        if not data:
+            return None
+        upload = {name.decode(): json.loads(value) for name, value in data.items()}
+        upload['received'] = sorted(int(index) for index in chunks)
+        return upload
+
+    def update_upload(self, upload_id: str, **fields):
+        key = UPLOAD_KEY.format(upload_id=upload_id)
+        self.redis.hset(key, mapping={name: json.dumps(value, default=str) for name, value in fields.items()})
+
+    def add_chunk(self, upload_id: str, index: int) -> int:
+        """
+        Marque un chunk reçu (idempotent) et prolonge la session
+
+        Returns:
+            Nombre de chunks reçus
+        """
+        chunks_key = UPLOAD_CHUNKS_KEY.format(upload_id=upload_id)
+        pipe = self.redis.pipeline()
+        pipe.sadd(chunks_key, index)
+        pipe.scard(chunks_key)
+        pipe.expire(chunks_key, UPLOAD_SESSION_TTL)
+        pipe.expire(UPLOAD_KEY.format(upload_id=upload_id), UPLOAD_SESSION_TTL)
+        return pipe.execute()[1]
+
+    def claim_upload_completion(self, upload_id: str) -> bool:
+        """Une seule requête /complete assemble la session (les suivantes: 409)"""
+        return bool(self.redis.hsetnx(UPLOAD_KEY.format(upload_id=upload_id), 'completing', 'true'))
+
+    def release_upload_completion(self, upload_id: str):
+        self.redis.hdel(UPLOAD_KEY.format(upload_id=upload_id), 'completing')
+
+    def delete_upload(self, upload_id: str):
+        self.redis.delete(UPLOAD_KEY.format(upload_id=upload_id), UPLOAD_CHUNKS_KEY.format(upload_id=upload_id))
+
+    # --- Runners ---
+
+    def heartbeat(self, runner_id: str):
+        self.redis.set(RUNNER_KEY.format(runner_id=runner_id), 1, ex=RUNNER_HEARTBEAT_TTL)
+
+    def recover_orphans(self) -> List[str]:
+        """
+        Remet en tête de file les jobs des runners disparus
+
+        Returns:
+            IDs des jobs remis en file
+        """
+        recovered = []
+        for job_id, runner_id in self.redis.hgetall(RUNNING_KEY).items():
+            if self.redis.exists(RUNNER_KEY.format(runner_id=runner_id.decode())):
+                continue
+            job_id = job_id.decode()
+            # HDEL gagnant: un seul processus reprend le job
+            if not self.redis.hdel(RUNNING_KEY, job_id):
+                continue
+            if self.get(job_id) is None:
+                continue
+            self.update(job_id, status='queued', progress=0, recovered_at=datetime.now().isoformat())
+            self.enqueue(job_id, front=True)
+            recovered.append(job_id)
+            logger.warning(f"Photogrammetry job {job_id} requeued (runner {runner_id.decode()} gone)")
+        return recovered
+
+
+def runner_id() -> str:
+    """Identifiant du processus runner (hôte + pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
@@ -115,8 +115,8 @@ class MeshGenerator:
             
             print(f"Simplifié: {original_triangles} → {len(mesh.triangles)} triangles")
             
-            # Sauvegarder
-            output_mesh = self.output_dir / "mesh_simplified.ply"
+            # Sauvegarder (un fichier par niveau de LOD)
+            output_mesh = self.output_dir / f"mesh_simplified_{target_triangles}.ply"
             o3d.io.write_triangle_mesh(str(output_mesh), mesh)
             
             return {
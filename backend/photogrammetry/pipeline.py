@@ -2,6 +2,10 @@
 """
 Pipeline Photogrammétrie Complet
 Orchestre toutes les étapes: extraction → preprocessing → COLMAP → mesh → export
+
+Chaque étape lit et écrit l'état du pipeline dans le workspace
+(pipeline_state.json): les étapes peuvent tourner dans des jobs séparés,
+sur des workers de classes de ressources différentes.
 """
 
 import sys
@@ -9,21 +13,44 @@ from pathlib import Path
 import argparse
 import json
 from datetime import datetime
+from typing import Callable, Optional, Tuple
 
-from frame_extractor import FrameExtractor
+from frame_extractor import extract_frames_cached
 from preprocessor import ImagePreprocessor
 from colmap_pipeline import COLMAPPipeline
 from mesh_generator import MeshGenerator
+from resolution_policy import ResolutionPolicy, get_resolution_policy, QUALITY_TIERS
+
+# (nom, titre, progression en fin d'étape)
+STAGES = [
+    ('frame_extraction', "EXTRACTION FRAMES", 15),
+    ('preprocessing', "PRÉTRAITEMENT", 25),
+    ('colmap_sfm', "COLMAP STRUCTURE-FROM-MOTION", 50),
+    ('colmap_dense', "COLMAP RECONSTRUCTION DENSE", 75),
+    ('mesh_generation', "GÉNÉRATION MESH", 85),
+    ('mesh_lod', "SIMPLIFICATION MESH (LOD)", 90),
+]
+
+STATE_FILE = 'pipeline_state.json'
+
+LOD_LEVELS = [
+    {'name': 'high', 'triangles': 100000},
+    {'name': 'medium', 'triangles': 50000},
+    {'name': 'low', 'triangles': 10000}
+]
 
 class PhotogrammetryPipeline:
-    def __init__(self, workspace_path: str):
+    def __init__(self, workspace_path: str, verify_hash: Optional[Callable[[], str]] = None):
         """
         Initialise le pipeline complet
         
         Args:
             workspace_path: Chemin workspace principal
+            verify_hash: Vérification du SHA-256 annoncé d'une vidéo en cours
+                de téléchargement (voir video_source), passée à l'extraction
         """
         self.workspace = Path(workspace_path)
+        self.verify_hash = verify_hash
         self.workspace.mkdir(parents=True, exist_ok=True)
         
         # Dossiers de travail
@@ -32,15 +59,174 @@ class PhotogrammetryPipeline:
         self.colmap_workspace = self.workspace / "colmap"
         self.mesh_dir = self.workspace / "mesh"
         self.export_dir = self.workspace / "export"
+        self.state_path = self.workspace / STATE_FILE
+    
+    def start(
+        self,
+        video_path: str,
+        extract_fps: int = 30,
+        quality: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> dict:
+        """
+        Initialise l'état du pipeline pour une vidéo
         
-    def run_full_pipeline(self, video_path: str, extract_fps: int = 30) -> dict:
+        Args:
+            video_path: Chemin vers la vidéo
+            extract_fps: FPS pour extraction frames
+            quality: Tier de qualité ('draft', 'standard', 'high')
+            content_hash: SHA-256 de la vidéo calculé à l'upload (évite une relecture)
+        
+        Returns:
+            Dict résultats (vide, sauvegardé dans le workspace)
+        """
+        policy = get_resolution_policy(quality)
+        results = {
+            'timestamp': datetime.now().isoformat(),
+            'video_path': video_path,
+            'video_sha256': content_hash,
+            'extract_fps': extract_fps,
+            'workspace': str(self.workspace),
+            'resolution_policy': {
+                'tier': policy.tier,
+                'sfm_max_size': policy.sfm_max_size,
+                'dense_max_size': policy.dense_max_size
+            },
+            'stages': {}
+        }
+        self.save_state(results)
+        return results
+    
+    def load_state(self) -> dict:
+        """État sauvegardé par la dernière étape"""
+        with open(self.state_path) as f:
+            return json.load(f)
+    
+    def save_state(self, results: dict):
+        """Sauvegarde atomique de l'état"""
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        tmp_path.replace(self.state_path)
+    
+    def run_stage(self, stage: str, results: Optional[dict] = None) -> Tuple[dict, str]:
+        """
+        Exécute une étape et sauvegarde l'état
+        
+        Args:
+            stage: Nom de l'étape (voir STAGES)
+            results: État courant (défaut: relu depuis le workspace)
+        
+        Returns:
+            (résultat de l'étape, message de progression)
+        
+        Raises:
+            Exception si l'étape échoue
+        """
+        if results is None:
+            results = self.load_state()
+        
+        stage_result, message = getattr(self, f'_run_{stage}')(results)
+        results['stages'][stage] = stage_result
+        self.save_state(results)
+        return stage_result, message
+    
+    def _policy(self, results: dict) -> ResolutionPolicy:
+        return ResolutionPolicy(**results['resolution_policy'])
+    
+    def _run_frame_extraction(self, results: dict) -> Tuple[dict, str]:
+        # Cache partagé avec le worker Gaussian (même vidéo → un seul décodage):
+        # extraction à la résolution capture pour tous les tiers, réduite
+        # ensuite par étape (preprocessing pour SfM, undistorter pour le dense)
+        extraction = extract_frames_cached(
+            results['video_path'],
+            results['extract_fps'],
+            content_hash=results.get('video_sha256'),
+            verify_hash=self.verify_hash
+        )
+        frames_count = len(extraction['frames'])
+        return {
+            'success': True,
+            'frames_count': frames_count,
+            'frames_dir': extraction['frames_dir'],
+            'cache_hit': extraction['cache_hit']
+        }, f"{frames_count} frames extraites"
+    
+    def _run_preprocessing(self, results: dict) -> Tuple[dict, str]:
+        frames_dir = results['stages']['frame_extraction']['frames_dir']
+        preprocessor = ImagePreprocessor(
+            frames_dir,
+            str(self.preprocessed_dir),
+            max_size=self._policy(results).sfm_max_size
+        )
+        preprocessed = preprocessor.preprocess_images()
+        return {
+            'success': True,
+            'images_count': len(preprocessed),
+            'output_dir': str(self.preprocessed_dir)
+        }, f"{len(preprocessed)} images prétraitées"
+    
+    def _run_colmap_sfm(self, results: dict) -> Tuple[dict, str]:
+        colmap = COLMAPPipeline(str(self.colmap_workspace), self._policy(results))
+        sfm_results = colmap.run_sfm_pipeline(str(self.preprocessed_dir))
+        
+        if not all(r.get('success') for r in sfm_results.values() if isinstance(r, dict)):
+            raise Exception("Échec pipeline COLMAP SfM")
+        return sfm_results, "Structure-from-Motion terminé"
+    
+    def _run_colmap_dense(self, results: dict) -> Tuple[dict, str]:
+        colmap = COLMAPPipeline(str(self.colmap_workspace), self._policy(results))
+        colmap.images_dir = self.preprocessed_dir
+        
+        # Mêmes noms de fichiers que le set SfM, résolution dense
+        frames_dir = results['stages']['frame_extraction']['frames_dir']
+        dense_results = colmap.run_dense_reconstruction(images_dir=frames_dir)
+        
+        if not dense_results['stereo_fusion'].get('success'):
+            raise Exception("Échec reconstruction dense")
+        return dense_results, "Reconstruction dense terminée"
+    
+    def _run_mesh_generation(self, results: dict) -> Tuple[dict, str]:
+        point_cloud_path = results['stages']['colmap_dense']['stereo_fusion'].get('point_cloud')
+        mesh_gen = MeshGenerator(point_cloud_path, str(self.mesh_dir))
+        mesh_results = mesh_gen.generate_mesh_poisson(depth=9)
+        
+        if not mesh_results.get('success'):
+            raise Exception("Échec génération mesh")
+        return mesh_results, "Mesh généré"
+    
+    def _run_mesh_lod(self, results: dict) -> Tuple[dict, str]:
+        point_cloud_path = results['stages']['colmap_dense']['stereo_fusion'].get('point_cloud')
+        mesh_path = results['stages']['mesh_generation']['mesh_path']
+        mesh_gen = MeshGenerator(point_cloud_path, str(self.mesh_dir))
+        
+        lod_results = {}
+        for lod in LOD_LEVELS:
+            lod_results[lod['name']] = mesh_gen.simplify_mesh(mesh_path, lod['triangles'])
+        return lod_results, f"{len(lod_results)} niveaux LOD générés"
+    
+    def run_full_pipeline(
+        self,
+        video_path: str,
+        extract_fps: int = 30,
+        quality: Optional[str] = None,
+        progress_callback: Optional[Callable[[str, int, str], None]] = None,
+        content_hash: Optional[str] = None
+    ) -> dict:
         """
         Exécute le pipeline complet
         
+        SfM tourne sur des images réduites (preprocessed), la reconstruction
+        dense sur les frames extraites, plafonnées à la résolution du tier
+        par image_undistorter.
+        
         Args:
             video_path: Chemin vers la vidéo
             extract_fps: FPS pour extraction frames
-            
+            quality: Tier de qualité ('draft', 'standard', 'high')
+            progress_callback: Appelé après chaque étape (stage, progress, message)
+            content_hash: SHA-256 de la vidéo s'il est déjà connu
+        
         Returns:
             Dict avec résultats de toutes les étapes
         """
@@ -50,102 +236,31 @@ class PhotogrammetryPipeline:
         print(f"Workspace: {self.workspace}")
         print(f"Vidéo: {video_path}\n")
         
-        results = {
-            'timestamp': datetime.now().isoformat(),
-            'video_path': video_path,
-            'workspace': str(self.workspace),
-            'stages': {}
-        }
+        results = self.start(video_path, extract_fps, quality, content_hash)
         
         try:
-            # Étape 1: Extraction frames
-            print("\n" + "=" * 60)
-            print("ÉTAPE 1: EXTRACTION FRAMES")
-            print("=" * 60)
-            extractor = FrameExtractor(video_path, str(self.frames_dir), extract_fps)
-            frames = extractor.extract_frames()
-            results['stages']['frame_extraction'] = {
-                'success': True,
-                'frames_count': len(frames),
-                'frames_dir': str(self.frames_dir)
-            }
-            
-            # Étape 2: Preprocessing
-            print("\n" + "=" * 60)
-            print("ÉTAPE 2: PRÉTRAITEMENT")
-            print("=" * 60)
-            preprocessor = ImagePreprocessor(str(self.frames_dir), str(self.preprocessed_dir))
-            preprocessed = preprocessor.preprocess_images()
-            results['stages']['preprocessing'] = {
-                'success': True,
-                'images_count': len(preprocessed),
-                'output_dir': str(self.preprocessed_dir)
-            }
-            
-            # Étape 3: COLMAP SfM
-            print("\n" + "=" * 60)
-            print("ÉTAPE 3: COLMAP STRUCTURE-FROM-MOTION")
-            print("=" * 60)
-            colmap = COLMAPPipeline(str(self.colmap_workspace))
-            sfm_results = colmap.run_sfm_pipeline(str(self.preprocessed_dir))
-            results['stages']['colmap_sfm'] = sfm_results
+            for index, (stage, title, progress) in enumerate(STAGES, 1):
+                print("\n" + "=" * 60)
+                print(f"ÉTAPE {index}: {title}")
+                print("=" * 60)
+                _, message = self.run_stage(stage, results)
+                if progress_callback:
+                    progress_callback(stage, progress, message)
             
-            if not all(r.get('success') for r in sfm_results.values() if isinstance(r, dict)):
-                raise Exception("Échec pipeline COLMAP SfM")
-            
-            # Étape 4: COLMAP Dense
-            print("\n" + "=" * 60)
-            print("ÉTAPE 4: COLMAP RECONSTRUCTION DENSE")
-            print("=" * 60)
-            dense_results = colmap.run_dense_reconstruction()
-            results['stages']['colmap_dense'] = dense_results
-            
-            if not dense_results['stereo_fusion'].get('success'):
-                raise Exception("Échec reconstruction dense")
-            
-            point_cloud_path = dense_results['stereo_fusion'].get('point_cloud')
-            
-            # Étape 5: Génération Mesh
-            print("\n" + "=" * 60)
-            print("ÉTAPE 5: GÉNÉRATION MESH")
-            print("=" * 60)
-            mesh_gen = MeshGenerator(point_cloud_path, str(self.mesh_dir))
-            mesh_results = mesh_gen.generate_mesh_poisson(depth=9)
-            results['stages']['mesh_generation'] = mesh_results
-            
-            if not mesh_results.get('success'):
-                raise Exception("Échec génération mesh")
-            
-            # Étape 6: Simplification mesh (LOD)
-            print("\n" + "=" * 60)
-            print("ÉTAPE 6: SIMPLIFICATION MESH (LOD)")
-            print("=" * 60)
-            
-            lod_levels = [
-                {'name': 'high', 'triangles': 100000},
-                {'name': 'medium', 'triangles': 50000},
-                {'name': 'low', 'triangles': 10000}
-            ]
-            
-            lod_results = {}
-            for lod in lod_levels:
-                result = mesh_gen.simplify_mesh(mesh_results['mesh_path'], lod['triangles'])
-                lod_results[lod['name']] = result
-            
-            results['stages']['mesh_lod'] = lod_results
+            self.frames_dir = Path(results['stages']['frame_extraction']['frames_dir'])
             
             # Résumé final
             print("\n" + "=" * 60)
             print("✅ PIPELINE TERMINÉ AVEC SUCCÈS!")
             print("=" * 60)
-            print(f"Frames extraites: {len(frames)}")
-            print(f"Point cloud: {point_cloud_path}")
-            print(f"Mesh principal: {mesh_results['mesh_path']}")
-            print(f"LOD générés: {len(lod_results)} niveaux")
+            print(f"Frames extraites: {results['stages']['frame_extraction']['frames_count']}")
+            print(f"Point cloud: {results['stages']['colmap_dense']['stereo_fusion'].get('point_cloud')}")
+            print(f"Mesh principal: {results['stages']['mesh_generation']['mesh_path']}")
+            print(f"LOD générés: {len(results['stages']['mesh_lod'])} niveaux")
             
             results['success'] = True
             return results
-            
+        
         except Exception as e:
             print(f"\n❌ ERREUR: {e}", file=sys.stderr)
             results['success'] = False
@@ -157,13 +272,15 @@ def main():
     parser.add_argument('video', help='Chemin vers la vidéo')
     parser.add_argument('-w', '--workspace', required=True, help='Workspace de travail')
     parser.add_argument('--fps', type=int, default=30, help='FPS extraction (défaut: 30)')
+    parser.add_argument('--quality', choices=list(QUALITY_TIERS), default=None,
+                        help='Tier de qualité (défaut: PHOTOGRAMMETRY_QUALITY ou standard)')
     parser.add_argument('-o', '--output', help='Fichier JSON de sortie avec résultats')
     
     args = parser.parse_args()
     
     pipeline = PhotogrammetryPipeline(args.workspace)
     
-    results = pipeline.run_full_pipeline(args.video, args.fps)
+    results = pipeline.run_full_pipeline(args.video, args.fps, quality=args.quality)
     
     # Sauvegarder résultats
     if args.output:
@@ -175,13 +292,3 @@ def main():
 
 if __name__ == '__main__':
     sys.exit(main())
-
-
-
-
-
-
-
-
-
-
@@ -9,19 +9,23 @@ import numpy as np
 from pathlib import Path
 import argparse
 import sys
-from typing import List
+from typing import List, Optional
+
+from resolution_policy import scaled_size
 
 class ImagePreprocessor:
-    def __init__(self, input_dir: str, output_dir: str):
+    def __init__(self, input_dir: str, output_dir: str, max_size: Optional[int] = None):
         """
         Initialise le préprocesseur
         
         Args:
             input_dir: Dossier contenant les images brutes
             output_dir: Dossier de sortie pour images préprocessées
+            max_size: Plus grand côté des images de sortie (set SfM réduit)
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.max_size = max_size
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
     def preprocess_images(self, denoise: bool = True, enhance_contrast: bool = True) -> List[str]:
@@ -57,6 +61,9 @@ class ImagePreprocessor:
                     print(f"⚠️  Impossible de charger {image_file}")
                     continue
                 
+                # Réduction avant débruitage (coût NLM proportionnel aux pixels)
+                img = self.resize_image(img)
+                
                 # Preprocessing
                 processed_img = self.process_image(img, denoise, enhance_contrast)
                 
@@ -76,6 +83,22 @@ class ImagePreprocessor:
         print(f"✅ Prétraitement terminé: {len(processed_images)} images")
         return processed_images
     
+    def resize_image(self, img: np.ndarray) -> np.ndarray:
+        """
+        Réduit l'image selon max_size (INTER_AREA)
+        
+        Args:
+            img: Image BGR
+            
+        Returns:
+            Image réduite (ou inchangée)
+        """
+        height, width = img.shape[:2]
+        size = scaled_size(width, height, self.max_size)
+        if size == (width, height):
+            return img
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    
     def process_image(self, img: np.ndarray, denoise: bool, enhance_contrast: bool) -> np.ndarray:
         """
         Prétraite une image
@@ -116,10 +139,11 @@ def main():
     parser.add_argument('-o', '--output', default='preprocessed', help='Dossier de sortie')
     parser.add_argument('--no-denoise', action='store_true', help='Désactiver débruitage')
     parser.add_argument('--no-contrast', action='store_true', help='Désactiver amélioration contraste')
+    parser.add_argument('--max-size', type=int, help='Plus grand côté des images (ex: 1600 pour SfM)')
     
     args = parser.parse_args()
     
-    preprocessor = ImagePreprocessor(args.input, args.output)
+    preprocessor = ImagePreprocessor(args.input, args.output, args.max_size)
     
     try:
         images = preprocessor.preprocess_images(
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Resolution Policy pour Photogrammétrie
+Résolution des images par étape du pipeline et par tier de qualité
+
+SfM (SIFT, matching, mapper, bundle adjustment) tourne sur un set réduit;
+la résolution capture n'est utilisée que pour la reconstruction dense.
+"""
+
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ResolutionPolicy:
+    """Taille max (plus grand côté, en pixels) par étape"""
+    tier: str
+    sfm_max_size: int
+    dense_max_size: Optional[int] = None  # None = résolution capture
+
+
+QUALITY_TIERS: Dict[str, ResolutionPolicy] = {
+    'draft': ResolutionPolicy('draft', sfm_max_size=1024, dense_max_size=1920),
+    'standard': ResolutionPolicy('standard', sfm_max_size=1600, dense_max_size=2560),
+    'high': ResolutionPolicy('high', sfm_max_size=2048, dense_max_size=None),
+}
+
+DEFAULT_QUALITY = os.getenv('PHOTOGRAMMETRY_QUALITY', 'standard')
+
+
+def get_resolution_policy(quality: Optional[str] = None, **overrides) -> ResolutionPolicy:
+    """
+    Politique de résolution pour un tier
+
+    Args:
+        quality: Tier ('draft', 'standard', 'high'), défaut PHOTOGRAMMETRY_QUALITY
+        **overrides: sfm_max_size / dense_max_size explicites
+
+    Returns:
+        ResolutionPolicy
+    """
+    quality = quality or DEFAULT_QUALITY
+    if quality not in QUALITY_TIERS:
+        raise ValueError(f"Tier de qualité inconnu: {quality} ({', '.join(QUALITY_TIERS)})")
+
+    policy = QUALITY_TIERS[quality]
+    overrides = {k: v for k, v in overrides.items() if k in ('sfm_max_size', 'dense_max_size')}
+    return replace(policy, **overrides) if overrides else policy
+
+
+def scaled_size(width: int, height: int, max_size: Optional[int]) -> Tuple[int, int]:
+    """
+    Dimensions après réduction (ratio conservé, jamais d'agrandissement)
+
+    Args:
+        width: Largeur source
+        height: Hauteur source
+        max_size: Plus grand côté max (None = inchangé)
+
+    Returns:
+        (largeur, hauteur) paires pour les encodeurs
+    """
+    if not max_size or max(width, height) <= max_size:
+        return width, height
+
+    scale = max_size / max(width, height)
+    # Dimensions paires (yuv420 / encodeurs JPEG)
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Scratch Space Manager
+Espaces de travail disque des jobs: allocation, quotas, nettoyage
+
+Chaque workspace (photogrammetry, gaussian, mesh) et chaque upload est
+réservé dans un registre partagé par tous les processus du nœud (work
+horses RQ, server_api):
+- admission: refusée si l'espace libre, moins les réservations en cours,
+  passe sous SCRATCH_MIN_FREE_GB ou si le quota du nœud est dépassé;
+- quota par job: vérifié aux fins d'étape (check_quota);
+- succès: workspace supprimé; échec: conservé SCRATCH_FAILED_RETENTION_HOURS
+  pour debug (ou tant qu'un retry RQ est prévu);
+- balayage: rétentions expirées, workspaces actifs abandonnés et orphelins
+  (dossiers sans réservation), puis éviction LRU des workspaces conservés
+  quand le disque manque; le cache de frames partagé (FRAME_CACHE_DIR) est
+  nettoyé au même passage (frame_extractor.evict_frame_cache).
+
+Layout inchangé sous SCRATCH_ROOT: <kind>/processing/<job_id>,
+photogrammetry/uploads/<fichier>, photogrammetry/results/<job_id>.
+Registre: SCRATCH_ROOT/.scratch/ledger.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev): pas de verrou inter-process
+    fcntl = None
+
+try:
+    from photogrammetry.frame_extractor import evict_frame_cache
+except ImportError:
+    from frame_extractor import evict_frame_cache
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+SCRATCH_ROOT = Path(os.getenv('SCRATCH_ROOT', '/tmp'))
+SCRATCH_NODE_QUOTA_GB = float(os.getenv('SCRATCH_NODE_QUOTA_GB', 200))
+SCRATCH_MIN_FREE_GB = float(os.getenv('SCRATCH_MIN_FREE_GB', 5))
+SCRATCH_FAILED_RETENTION_HOURS = float(os.getenv('SCRATCH_FAILED_RETENTION_HOURS', 24))
+SCRATCH_STALE_HOURS = float(os.getenv('SCRATCH_STALE_HOURS', 48))
+SCRATCH_ORPHAN_GRACE_MINUTES = float(os.getenv('SCRATCH_ORPHAN_GRACE_MINUTES', 30))
+SCRATCH_SWEEP_INTERVAL = int(os.getenv('SCRATCH_SWEEP_INTERVAL', 300))
+
+# Emplacement par type d'espace (relatif à SCRATCH_ROOT)
+KINDS = {
+    'photogrammetry': 'photogrammetry/processing',
+    'gaussian': 'gaussian/processing',
+    'mesh': 'mesh/processing',
+    'uploads': 'photogrammetry/uploads',
+    'results': 'photogrammetry/results'
+}
+
+# Quota par job (Go), surchargeable par SCRATCH_QUOTA_<KIND>_GB
+DEFAULT_JOB_QUOTAS_GB = {
+    'photogrammetry': 20,
+    'gaussian': 30,
+    'mesh': 5,
+    'uploads': 0.25,
+    'results': 2
+}
+
+LEDGER_DIR = '.scratch'
+LEDGER_FILE = 'ledger.json'
+
+ACTIVE = 'active'
+RETAINED = 'retained'
+
+
+class ScratchSpaceError(Exception):
+    """Erreur de gestion de l'espace scratch"""
+
+
+class InsufficientScratchSpace(ScratchSpaceError):
+    """Job refusé: espace disque insuffisant sur le nœud"""
+
+
+class ScratchQuotaExceeded(ScratchSpaceError):
+    """Workspace au-delà du quota du job"""
+
+
+def job_quota(kind: str) -> int:
+    """Quota par job en octets"""
+    env = os.getenv(f"SCRATCH_QUOTA_{kind.upper()}_GB")
+    return int(float(env if env is not None else DEFAULT_JOB_QUOTAS_GB[kind]) * GB)
+
+
+def workspace_path(kind: str, job_id: str) -> Path:
+    """Chemin du workspace d'un job"""
+    if kind not in KINDS:
+        raise ValueError(f"Type d'espace inconnu: {kind} ({', '.join(KINDS)})")
+    return SCRATCH_ROOT / KINDS[kind] / job_id
+
+
+def directory_size(path: Path) -> int:
+    """Taille d'un fichier ou d'un dossier (récursif), 0 si absent"""
+    try:
+        if path.is_file():
+            return path.stat().st_size
+    except OSError:
+        return 0
+
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def _remove(path: Path):
+    try:
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists() or path.is_symlink():
+            path.unlink()
+    except OSError as e:
+        logger.warning(f"Error removing scratch path {path}: {e}")
+
+
+@contextmanager
+def _ledger():
+    """Registre des réservations, verrouillé pour la durée du bloc"""
+    ledger_dir = SCRATCH_ROOT / LEDGER_DIR
+    ledger_dir.mkdir(parents=True, exist_ok=True)
+    ledger_path = ledger_dir / LEDGER_FILE
+
+    with open(ledger_dir / f"{LEDGER_FILE}.lock", 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                entries = json.loads(ledger_path.read_text())
+            except (OSError, ValueError):
+                entries = {}
+
+            # Écrit aussi si le bloc lève (évictions faites avant un refus d'admission)
+            try:
+                yield entries
+            finally:
+                tmp_path = ledger_dir / f"{LEDGER_FILE}.tmp-{os.getpid()}"
+                tmp_path.write_text(json.dumps(entries))
+                os.replace(tmp_path, ledger_path)
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _key(kind: str, job_id: str) -> str:
+    return f"{kind}:{job_id}"
+
+
+def _committed_bytes(entries: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    (octets engagés sur le quota du nœud, réservations pas encore écrites)
+
+    Un workspace actif compte pour max(quota, taille mesurée), un workspace
+    conservé pour sa taille.
+    """
+    committed = 0
+    outstanding = 0
+    for entry in entries.values():
+        if entry['status'] == ACTIVE:
+            committed += max(entry['quota'], entry['size'])
+            outstanding += max(0, entry['quota'] - entry['size'])
+        else:
+            committed += entry['size']
+    return committed, outstanding
+
+
+def _has_room(entries: Dict[str, Dict[str, Any]], quota: int) -> bool:
+    committed, outstanding = _committed_bytes(entries)
+    if committed + quota > SCRATCH_NODE_QUOTA_GB * GB:
+        return False
+    free = shutil.disk_usage(SCRATCH_ROOT).free
+    return free - outstanding - quota >= SCRATCH_MIN_FREE_GB * GB
+
+
+def _orphans(entries: Dict[str, Dict[str, Any]], min_age: float) -> List[Tuple[float, Path]]:
+    """Dossiers/fichiers sans réservation, plus vieux que min_age secondes (mtime, path)"""
+    known = {entry['path'] for entry in entries.values()}
+    now = time.time()
+    orphans = []
+    for relative in KINDS.values():
+        base = SCRATCH_ROOT / relative
+        if not base.is_dir():
+            continue
+        for path in base.iterdir():
+            if str(path) in known:
+                continue
+            try:
+                mtime = path.lstat().st_mtime
+            except OSError:
+                continue
+            if now - mtime >= min_age:
+                orphans.append((mtime, path))
+    return sorted(orphans)
+
+
+def _evict_lru(entries: Dict[str, Dict[str, Any]], quota: int = 0) -> int:
+    """
+    Libère de la place: workspaces conservés puis orphelins, du moins
+    récemment utilisé au plus récent, jusqu'à pouvoir admettre quota
+
+    Returns:
+        Nombre de chemins supprimés
+    """
+    retained = sorted(
+        (entry['last_used'], key) for key, entry in entries.items() if entry['status'] == RETAINED
+    )
+    evicted = 0
+    for _, key in retained:
+        if _has_room(entries, quota):
+            return evicted
+        entry = entries.pop(key)
+        logger.info(f"Evicting retained scratch {entry['path']} ({entry['size']} bytes)")
+        _remove(Path(entry['path']))
+        evicted += 1
+
+    for _, path in _orphans(entries, SCRATCH_ORPHAN_GRACE_MINUTES * 60):
+        if _has_room(entries, quota):
+            return evicted
+        logger.info(f"Evicting orphan scratch {path}")
+        _remove(path)
+        evicted += 1
+    return evicted
+
+
+def allocate_workspace(kind: str, job_id: str, quota_bytes: Optional[int] = None, path: Optional[Path] = None) -> Path:
+    """
+    Réserve et crée le workspace d'un job
+
+    Un workspace déjà réservé (retry RQ, étape suivante d'un job
+    multi-étapes) est réactivé tel quel, sans nouvelle admission.
+
+    Args:
+        kind: Type d'espace (KINDS)
+        job_id: ID du job (ou de l'upload)
+        quota_bytes: Quota du job (défaut: job_quota(kind))
+        path: Chemin explicite (fichier d'upload); défaut: workspace_path
+
+    Returns:
+        Chemin du workspace (dossier créé) ou du fichier (dossier parent créé)
+
+    Raises:
+        InsufficientScratchSpace: espace libre ou quota du nœud insuffisant
+    """
+    path = Path(path) if path else workspace_path(kind, job_id)
+    quota = quota_bytes if quota_bytes is not None else job_quota(kind)
+    key = _key(kind, job_id)
+
+    with _ledger() as entries:
+        entry = entries.get(key)
+        if entry is None:
+            if not _has_room(entries, quota):
+                _evict_lru(entries, quota)
+                if not _has_room(entries, quota):
+                    raise InsufficientScratchSpace(
+                        f"Not enough scratch space for {kind} job {job_id} "
+                        f"({quota / GB:.1f} GB requested)"
+                    )
+            entry = entries[key] = {
+                'kind': kind,
+                'path': str(path),
+                'quota': quota,
+                'size': 0,
+                'created_at': time.time()
+            }
+        entry.update(status=ACTIVE, last_used=time.time(), retain_until=None)
+
+    if kind == 'uploads':
+        path.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def check_quota(kind: str, job_id: str, used_bytes: Optional[int] = None) -> int:
+    """
+    Vérifie le quota d'un job (fin d'étape) et met à jour sa taille
+
+    Args:
+        kind: Type d'espace
+        job_id: ID du job
+        used_bytes: Taille déjà mesurée (ex: JobMetrics.lap().scratch_bytes)
+
+    Returns:
+        Taille du workspace en octets
+
+    Raises:
+        ScratchQuotaExceeded: workspace au-delà du quota
+    """
+    with _ledger() as entries:
+        entry = entries.get(_key(kind, job_id))
+        if entry is None:
+            return used_bytes or 0
+        if used_bytes is None:
+            used_bytes = directory_size(Path(entry['path']))
+        entry['size'] = used_bytes
+        entry['last_used'] = time.time()
+        quota = entry['quota']
+
+    if used_bytes > quota:
+        raise ScratchQuotaExceeded(
+            f"{kind} job {job_id} uses {used_bytes / GB:.1f} GB of scratch (quota {quota / GB:.1f} GB)"
+        )
+    return used_bytes
+
+
+def retain_workspace(kind: str, job_id: str, hours: float):
+    """Conserve un workspace hours heures (puis supprimé par le balayage)"""
+    with _ledger() as entries:
+        entry = entries.get(_key(kind, job_id))
+        if entry is None:
+            return
+        if hours <= 0:
+            del entries[_key(kind, job_id)]
+            _remove(Path(entry['path']))
+            return
+        entry.update(
+            status=RETAINED,
+            size=directory_size(Path(entry['path'])),
+            last_used=time.time(),
+            retain_until=time.time() + hours * 3600
+        )
+
+
+def release_workspace(kind: str, job_id: str, succeeded: bool, will_retry: bool = False):
+    """
+    Fin de job: suppression après succès, rétention après échec
+
+    Args:
+        kind: Type d'espace
+        job_id: ID du job
+        succeeded: Job terminé avec succès
+        will_retry: Échec suivi d'un retry RQ (workspace gardé actif pour la reprise)
+    """
+    try:
+        if succeeded:
+            retain_workspace(kind, job_id, 0)
+        elif will_retry:
+            with _ledger() as entries:
+                entry = entries.get(_key(kind, job_id))
+                if entry:
+                    entry['last_used'] = time.time()
+        else:
+            retain_workspace(kind, job_id, SCRATCH_FAILED_RETENTION_HOURS)
+    except Exception as e:
+        logger.error(f"Error releasing scratch for {kind} job {job_id}: {e}")
+
+
+def sweep() -> Dict[str, int]:
+    """
+    Balayage: rétentions expirées, workspaces actifs abandonnés (nœud ou
+    worker tué), orphelins, éviction LRU si le disque manque, puis cache de
+    frames (extractions interrompues, entrées expirées, LRU au-delà de
+    FRAME_CACHE_MAX_GB)
+
+    Returns:
+        Compteurs par catégorie supprimée
+    """
+    now = time.time()
+    stats = {'expired': 0, 'stale': 0, 'orphans': 0, 'evicted': 0, 'frame_cache': 0}
+
+    with _ledger() as entries:
+        for key, entry in list(entries.items()):
+            path = Path(entry['path'])
+            if entry['status'] == RETAINED and entry['retain_until'] <= now:
+                stats['expired'] += 1
+            elif entry['status'] == ACTIVE and now - entry['last_used'] > SCRATCH_STALE_HOURS * 3600:
+                stats['stale'] += 1
+            elif not path.exists():
+                del entries[key]
+                continue
+            else:
+                continue
+            del entries[key]
+            _remove(path)
+
+        for _, path in _orphans(entries, SCRATCH_ORPHAN_GRACE_MINUTES * 60):
+            _remove(path)
+            stats['orphans'] += 1
+
+        stats['evicted'] = _evict_lru(entries)
+
+    try:
+        stats['frame_cache'] = sum(evict_frame_cache().values())
+    except Exception as e:
+        logger.error(f"Frame cache eviction failed: {e}")
+
+    if any(stats.values()):
+        logger.info(f"Scratch sweep: {stats}")
+    return stats
+
+
+def usage() -> Dict[str, Any]:
+    """État de l'espace scratch du nœud"""
+    with _ledger() as entries:
+        committed, outstanding = _committed_bytes(entries)
+        counts = {
+            status: sum(1 for entry in entries.values() if entry['status'] == status)
+            for status in (ACTIVE, RETAINED)
+        }
+    disk = shutil.disk_usage(SCRATCH_ROOT)
+    return {
+        'root': str(SCRATCH_ROOT),
+        'free_bytes': disk.free,
+        'committed_bytes': committed,
+        'outstanding_bytes': outstanding,
+        'node_quota_bytes': int(SCRATCH_NODE_QUOTA_GB * GB),
+        'active': counts[ACTIVE],
+        'retained': counts[RETAINED]
+    }
+
+
+def run_sweeper(interval: int = SCRATCH_SWEEP_INTERVAL):
+    """Boucle de balayage (un processus par nœud)"""
+    logger.info(f"Scratch sweeper started on {SCRATCH_ROOT} (every {interval}s)")
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"Scratch sweep failed: {e}")
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestion de l'espace scratch du nœud")
+    parser.add_argument('command', choices=['sweep', 'run', 'usage'],
+                        help="sweep: un balayage, run: balayage périodique, usage: état")
+    parser.add_argument('--interval', type=int, default=SCRATCH_SWEEP_INTERVAL,
+                        help='Intervalle du balayage périodique (secondes)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.command == 'sweep':
+        print(json.dumps(sweep(), indent=2))
+    elif args.command == 'usage':
+        print(json.dumps(usage(), indent=2))
+    else:
+        run_sweeper(args.interval)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,29 +6,182 @@ Endpoints REST pour upload, processing, status, download
 
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 import os
+import sys
+import time
 import uuid
+import shutil
+import logging
 from pathlib import Path
 from datetime import datetime
-import json
-import subprocess
 import threading
-from typing import Dict
+from typing import Dict, Any, Optional
+
+try:
+    from photogrammetry.scratch_space import (
+        SCRATCH_ROOT, KINDS,
+        InsufficientScratchSpace, allocate_workspace, release_workspace, retain_workspace
+    )
+    from photogrammetry.job_store import JobStore, runner_id, RUNNER_HEARTBEAT_TTL
+except ImportError:
+    from scratch_space import (
+        SCRATCH_ROOT, KINDS,
+        InsufficientScratchSpace, allocate_workspace, release_workspace, retain_workspace
+    )
+    from job_store import JobStore, runner_id, RUNNER_HEARTBEAT_TTL
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from security.upload_ingest import (
+    ingest_stream, ingest_chunk, hash_file, sniff_container, UploadRejected,
+    CONTAINER_TYPES, MAX_FILE_SIZE as MAX_UPLOAD_SIZE
+)
+
+try:
+    from security.content_security import validate_upload
+except ImportError:
+    # python-magic absent: taille et type vérifiés à l'ingest, pas de scan antivirus
+    validate_upload = None
+
+try:
+    from photogrammetry.artifact_publisher import Task, run_task_graph, lod_meshes, export_glb, export_usdz, PRIMARY_LOD
+except ImportError:
+    from artifact_publisher import Task, run_task_graph, lod_meshes, export_glb, export_usdz, PRIMARY_LOD
+
+logger = logging.getLogger(__name__)
+
+if validate_upload is None:
+    logger.warning("security.content_security unavailable: uploads are not virus-scanned")
 
 app = Flask(__name__)
 CORS(app)  # Permettre requêtes cross-origin
 
 # Configuration
-UPLOAD_FOLDER = Path('/tmp/photogrammetry/uploads')
-PROCESSING_FOLDER = Path('/tmp/photogrammetry/processing')
-RESULTS_FOLDER = Path('/tmp/photogrammetry/results')
+UPLOAD_FOLDER = SCRATCH_ROOT / KINDS['uploads']
+PROCESSING_FOLDER = SCRATCH_ROOT / KINDS['photogrammetry']
+RESULTS_FOLDER = SCRATCH_ROOT / KINDS['results']
+
+# Marge multipart (boundaries, en-têtes de parties) sur la taille annoncée
+MULTIPART_OVERHEAD = 1024 * 1024
+
+# Corps multipart sans Content-Length (chunked): coupé par werkzeug au-delà
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
+# Uploads résumables: taille des chunks (le dernier peut être plus court)
+UPLOAD_CHUNK_SIZE = int(os.getenv('PHOTOGRAMMETRY_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+
+# Résultats d'un job réussi conservés pour le téléchargement
+RESULTS_RETENTION_HOURS = float(os.getenv('PHOTOGRAMMETRY_RESULTS_RETENTION_HOURS', 24))
+
+# Pipelines simultanés par processus API, jobs en attente (tous processus)
+MAX_CONCURRENT_JOBS = int(os.getenv('PHOTOGRAMMETRY_MAX_CONCURRENT_JOBS', 1))
+MAX_QUEUED_JOBS = int(os.getenv('PHOTOGRAMMETRY_MAX_QUEUED_JOBS', 20))
+QUEUE_FULL_RETRY_AFTER = int(os.getenv('PHOTOGRAMMETRY_QUEUE_RETRY_AFTER', 60))
+
+# Processus API sans runner (upload/status seulement)
+RUNNER_ENABLED = os.getenv('PHOTOGRAMMETRY_RUNNER_ENABLED', 'true').lower() == 'true'
 
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 PROCESSING_FOLDER.mkdir(parents=True, exist_ok=True)
 RESULTS_FOLDER.mkdir(parents=True, exist_ok=True)
 
-# Jobs tracking
-processing_jobs = {}
+# Jobs tracking (Redis: partagé entre processus, survit aux redémarrages)
+job_store = JobStore()
+
+# Type MIME des fichiers de résultats (par extension)
+RESULT_MIMETYPES = {
+    '.glb': 'model/gltf-binary',
+    '.usdz': 'model/vnd.usdz+zip',
+    '.ply': 'application/octet-stream',
+    '.obj': 'text/plain'
+}
+
+class JobRunner:
+    """
+    Pool borné de threads consommant la file partagée
+    
+    Chaque processus API exécute au plus max_workers pipelines; les jobs
+    en trop attendent dans la file Redis. Le heartbeat permet aux autres
+    processus de reprendre les jobs d'un runner disparu.
+    """
+    
+    def __init__(self, store: JobStore, max_workers: int = MAX_CONCURRENT_JOBS, poll_interval: float = 2.0):
+        self.store = store
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.runner_id = runner_id()
+        self.wakeup = threading.Event()
+    
+    def start(self):
+        # Heartbeat avant tout claim: nos jobs ne doivent pas passer pour orphelins
+        self.store.heartbeat(self.runner_id)
+        threading.Thread(target=self._heartbeat, name='photogrammetry-heartbeat', daemon=True).start()
+        for index in range(self.max_workers):
+            threading.Thread(target=self._work, name=f'photogrammetry-runner-{index}', daemon=True).start()
+        logger.info(f"Photogrammetry runner {self.runner_id} started ({self.max_workers} workers)")
+    
+    def notify(self):
+        """Nouveau job en file: réveille un thread libre"""
+        self.wakeup.set()
+    
+    def _heartbeat(self):
+        while True:
+            try:
+                self.store.heartbeat(self.runner_id)
+                if self.store.recover_orphans():
+                    self.notify()
+            except Exception as e:
+                logger.error(f"Photogrammetry runner heartbeat failed: {e}")
+            time.sleep(max(1, RUNNER_HEARTBEAT_TTL // 3))
+    
+    def _work(self):
+        while True:
+            try:
+                job_id = self.store.claim(self.runner_id)
+            except Exception as e:
+                logger.error(f"Photogrammetry runner claim failed: {e}")
+                job_id = None
+            
+            if job_id is None:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            
+            # Erreur Redis hors du try de process_video (lecture du job, écriture
+            # de l'échec, finish): journalisée, le thread continue de consommer
+            try:
+                process_video(job_id)
+            except Exception as e:
+                logger.error(f"Photogrammetry runner failed on job {job_id}: {e}")
+            
+            try:
+                self.store.finish(job_id)
+            except Exception as e:
+                logger.error(f"Photogrammetry runner finish failed for job {job_id}: {e}")
+
+_runner: Optional[JobRunner] = None
+_runner_pid: Optional[int] = None
+_runner_lock = threading.Lock()
+
+def ensure_runner() -> Optional[JobRunner]:
+    """Démarre le runner du processus (une fois, et après un fork)"""
+    global _runner, _runner_pid
+    
+    if not RUNNER_ENABLED:
+        return None
+    
+    with _runner_lock:
+        if _runner is None or _runner_pid != os.getpid():
+            _runner = JobRunner(job_store)
+            _runner_pid = os.getpid()
+            _runner.start()
+    return _runner
+
+@app.before_request
+def start_runner():
+    ensure_runner()
 
 @app.route('/api/v1/photogrammetry/upload', methods=['POST'])
 def upload_video():
@@ -36,103 +189,464 @@ def upload_video():
     Upload vidéo pour photogrammétrie
     
     Returns:
-        JSON avec job_id et status
+        JSON avec job_id, status et position dans la file
     """
-    if 'video' not in request.files:
-        return jsonify({'error': 'Aucun fichier vidéo'}), 400
+    # Taille annoncée: refus avant de lire le corps
+    if request.content_length and request.content_length > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+        return jsonify({'error': f'Fichier trop volumineux (max {MAX_UPLOAD_SIZE // (1024 * 1024)}MB)'}), 413
     
-    video_file = request.files['video']
+    # Corps brut (Content-Type vidéo, ?filename=): streamé directement sur disque
+    if request.mimetype.startswith('video/') or request.mimetype == 'application/octet-stream':
+        filename = request.args.get('filename', 'video.mp4')
+        video_stream = request.stream
+    else:
+        if 'video' not in request.files:
+            return jsonify({'error': 'Aucun fichier vidéo'}), 400
+        video_file = request.files['video']
+        filename = video_file.filename
+        video_stream = video_file.stream
     
     # Validation
-    if video_file.filename == '':
+    if filename == '':
         return jsonify({'error': 'Fichier vide'}), 400
     
     allowed_extensions = {'.mp4', '.mov', '.MOV', '.MP4'}
-    if not any(video_file.filename.endswith(ext) for ext in allowed_extensions):
+    if not any(filename.endswith(ext) for ext in allowed_extensions):
         return jsonify({'error': 'Format non supporté (MP4/MOV requis)'}), 400
     
+    # Admission: file pleine → réessayer plus tard (avant d'écrire sur disque)
+    queue_full = queue_full_response()
+    if queue_full:
+        return queue_full
+    
     # Générer job ID
     job_id = str(uuid.uuid4())
-    upload_path = UPLOAD_FOLDER / f"{job_id}_{video_file.filename}"
+    upload_path = UPLOAD_FOLDER / f"{job_id}_{secure_filename(filename)}"
+    
+    # Réserver l'espace (upload + workspace) avant d'écrire sur disque
+    try:
+        allocate_workspace('uploads', job_id, path=upload_path)
+        allocate_workspace('photogrammetry', job_id)
+    except InsufficientScratchSpace as e:
+        release_workspace('uploads', job_id, succeeded=True)
+        return jsonify({'error': 'Espace disque insuffisant, réessayez plus tard', 'detail': str(e)}), 507
+    
+    # Sauvegarder vidéo: hash, taille et type calculés au fil de l'écriture,
+    # interruption dès que la limite est dépassée
+    try:
+        ingested = ingest_stream(video_stream, str(upload_path), max_size=MAX_UPLOAD_SIZE, expected_type='video')
+    except UploadRejected as e:
+        release_workspace('uploads', job_id, succeeded=True)
+        release_workspace('photogrammetry', job_id, succeeded=True)
+        return jsonify({'error': str(e), 'reason': e.reason}), e.status_code
     
-    # Sauvegarder vidéo
-    video_file.save(str(upload_path))
+    rejected = rejected_upload_response(upload_path, ingested)
+    if rejected:
+        release_workspace('uploads', job_id, succeeded=True)
+        release_workspace('photogrammetry', job_id, succeeded=True)
+        return rejected
     
-    # Vérifier taille
-    file_size_mb = upload_path.stat().st_size / (1024 * 1024)
-    if file_size_mb > 250:
-        upload_path.unlink()
-        return jsonify({'error': 'Fichier trop volumineux (max 250MB)'}), 400
+    queue_position = enqueue_upload(job_id, upload_path, ingested)
     
-    # Créer job
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'queue_position': queue_position,
+        'file_size': ingested['file_size'],
+        'file_hash': ingested['file_hash'],
+        'message': 'Vidéo uploadée, en attente de traitement'
+    }), 200
+
+def rejected_upload_response(upload_path: Path, ingested: Dict[str, Any]):
+    """
+    Réponse 400 si validate_upload refuse le fichier, None sinon
+    
+    Taille, hash et type viennent de l'ingest: seul le scan antivirus relit le fichier.
+    """
+    if validate_upload is None:
+        return None
+    validation = validate_upload(str(upload_path), 'video', ingested=ingested)
+    if validation['valid']:
+        return None
+    return jsonify({'error': 'Fichier refusé', 'errors': validation['errors'], 'reason': 'validation_failed'}), 400
+
+def queue_full_response():
+    """Réponse 503 (Retry-After) si la file est pleine, None sinon"""
+    queue_length = job_store.queue_length()
+    if queue_length < MAX_QUEUED_JOBS:
+        return None
+    
+    response = jsonify({
+        'error': 'File de traitement pleine, réessayez plus tard',
+        'queue_length': queue_length
+    })
+    response.headers['Retry-After'] = str(QUEUE_FULL_RETRY_AFTER)
+    return response, 503
+
+def enqueue_upload(job_id: str, upload_path: Path, ingested: Dict[str, Any]) -> int:
+    """
+    Crée le job d'une vidéo reçue et la met en file
+    
+    Args:
+        job_id: ID du job
+        upload_path: Vidéo sur disque
+        ingested: file_size, file_hash, mime_type
+    
+    Returns:
+        Position dans la file
+    """
     job = {
         'job_id': job_id,
-        'status': 'uploaded',
+        'status': 'queued',
         'upload_path': str(upload_path),
+        'file_size': ingested['file_size'],
+        'file_hash': ingested['file_hash'],
+        'mime_type': ingested['mime_type'],
         'created_at': datetime.now().isoformat(),
         'progress': 0,
         'stages': {}
     }
     
-    processing_jobs[job_id] = job
+    job_store.create(job)
+    queue_position = job_store.enqueue(job_id)
+    
+    # Traité par le premier thread libre d'un runner
+    runner = ensure_runner()
+    if runner:
+        runner.notify()
+    
+    return queue_position
+
+# --- Uploads résumables ---
+# POST /uploads (session) → PUT /uploads/<id>/chunks/<n> (parallèles,
+# rejouables) → POST /uploads/<id>/complete. Chaque chunk est écrit à son
+# offset dans le fichier final: pas d'assemblage ni de copie.
+
+def upload_session_status(upload: Dict[str, Any]) -> Dict[str, Any]:
+    received = set(upload['received'])
+    return {
+        'upload_id': upload['upload_id'],
+        'file_size': upload['file_size'],
+        'chunk_size': upload['chunk_size'],
+        'total_chunks': upload['total_chunks'],
+        'received_chunks': len(received),
+        'missing_chunks': [index for index in range(upload['total_chunks']) if index not in received]
+    }
+
+def abort_upload(upload_id: str):
+    """Supprime une session d'upload et son fichier"""
+    job_store.delete_upload(upload_id)
+    release_workspace('uploads', upload_id, succeeded=True)
+
+@app.route('/api/v1/photogrammetry/uploads', methods=['POST'])
+def create_upload():
+    """
+    Ouvre une session d'upload résumable
+            
+    Body JSON: filename, file_size, sha256 (optionnel, vérifié à la fin)
+    
+    Returns:
+        JSON avec upload_id, chunk_size et total_chunks
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    file_size = data.get('file_size')
+    
+    if not filename:
+        return jsonify({'error': 'Nom de fichier requis'}), 400
+    
+    allowed_extensions = {'.mp4', '.mov', '.MOV', '.MP4'}
+    if not any(filename.endswith(ext) for ext in allowed_extensions):
+        return jsonify({'error': 'Format non supporté (MP4/MOV requis)'}), 400
+        
+    if not isinstance(file_size, int) or file_size <= 0:
+        return jsonify({'error': 'file_size invalide'}), 400
+    if file_size > MAX_UPLOAD_SIZE:
+        return jsonify({'error': f'Fichier trop volumineux (max {MAX_UPLOAD_SIZE // (1024 * 1024)}MB)'}), 413
+    
+    queue_full = queue_full_response()
+    if queue_full:
+        return queue_full
     
-    # Démarrer processing en background
-    thread = threading.Thread(target=process_video, args=(job_id, str(upload_path)))
-    thread.daemon = True
-    thread.start()
+    # L'upload_id devient le job_id à la fin de l'upload
+    upload_id = str(uuid.uuid4())
+    upload_path = UPLOAD_FOLDER / f"{upload_id}_{secure_filename(filename)}"
     
+    # Réservation à la taille exacte annoncée, fichier créé à sa taille finale
+    try:
+        allocate_workspace('uploads', upload_id, quota_bytes=file_size, path=upload_path)
+    except InsufficientScratchSpace as e:
+        return jsonify({'error': 'Espace disque insuffisant, réessayez plus tard', 'detail': str(e)}), 507
+    
+    with open(upload_path, 'wb') as f:
+        f.truncate(file_size)
+    
+    total_chunks = -(-file_size // UPLOAD_CHUNK_SIZE)
+    job_store.create_upload({
+        'upload_id': upload_id,
+        'filename': filename,
+        'upload_path': str(upload_path),
+        'file_size': file_size,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'total_chunks': total_chunks,
+        'sha256': data.get('sha256'),
+        'created_at': datetime.now().isoformat()
+    })
+        
     return jsonify({
-        'job_id': job_id,
-        'status': 'uploaded',
-        'message': 'Vidéo uploadée, processing démarré'
+        'upload_id': upload_id,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'total_chunks': total_chunks
+    }), 201
+
+@app.route('/api/v1/photogrammetry/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id: str, index: int):
+    """
+    Reçoit un chunk (corps brut), écrit à son offset
+    
+    En-tête optionnel X-Chunk-SHA256: le chunk est refusé s'il ne correspond pas.
+    """
+    upload = job_store.get_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload non trouvé'}), 404
+    if index >= upload['total_chunks']:
+        return jsonify({'error': 'Index de chunk invalide'}), 400
+    if upload.get('completing'):
+        return jsonify({'error': 'Upload en cours de finalisation'}), 409
+    
+    offset = index * upload['chunk_size']
+    length = min(upload['chunk_size'], upload['file_size'] - offset)
+    if request.content_length is not None and request.content_length != length:
+        return jsonify({'error': f'Taille de chunk invalide ({length} octets attendus)'}), 400
+    
+    try:
+        chunk = ingest_chunk(request.stream, upload['upload_path'], offset, length)
+    except UploadRejected as e:
+        return jsonify({'error': str(e), 'reason': e.reason}), e.status_code
+    except FileNotFoundError:
+        # Session abandonnée pendant la requête (DELETE, type refusé au chunk 0)
+        return jsonify({'error': 'Upload non trouvé'}), 404
+    
+    expected_sha256 = request.headers.get('X-Chunk-SHA256')
+    if expected_sha256 and expected_sha256.lower() != chunk['sha256']:
+        return jsonify({'error': 'Checksum du chunk invalide', 'reason': 'checksum_mismatch'}), 400
+        
+    # Type vérifié sur le premier chunk, avant de recevoir le reste
+    if index == 0:
+        mime_type = sniff_container(chunk['head'])
+        if mime_type not in CONTAINER_TYPES['video']:
+            abort_upload(upload_id)
+            return jsonify({'error': f'File type not allowed: {mime_type or "unknown"}', 'reason': 'unsupported_type'}), 415
+        job_store.update_upload(upload_id, mime_type=mime_type)
+    
+    received = job_store.add_chunk(upload_id, index)
+    
+    return jsonify({
+        'upload_id': upload_id,
+        'index': index,
+        'sha256': chunk['sha256'],
+        'received_chunks': received,
+        'total_chunks': upload['total_chunks']
+    }), 200
+
+@app.route('/api/v1/photogrammetry/uploads/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id: str):
+    """Chunks reçus et manquants (reprise après interruption)"""
+    upload = job_store.get_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload non trouvé'}), 404
+    return jsonify(upload_session_status(upload)), 200
+
+@app.route('/api/v1/photogrammetry/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id: str):
+    """Abandonne un upload"""
+    if job_store.get_upload(upload_id) is None:
+        return jsonify({'error': 'Upload non trouvé'}), 404
+    abort_upload(upload_id)
+    return jsonify({'upload_id': upload_id, 'status': 'aborted'}), 200
+
+@app.route('/api/v1/photogrammetry/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id: str):
+    """
+    Termine un upload: vérifie les chunks et le hash, puis met le job en file
+        
+    Returns:
+        JSON avec job_id (= upload_id), status et position dans la file
+    """
+    upload = job_store.get_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload non trouvé'}), 404
+    
+    status = upload_session_status(upload)
+    if status['missing_chunks']:
+        return jsonify({'error': 'Upload incomplet', **status}), 400
+    
+    # Une seule requête termine la session (double clic, retry client)
+    if not job_store.claim_upload_completion(upload_id):
+        return jsonify({'error': 'Upload déjà en cours de finalisation'}), 409
+    
+    try:
+        queue_full = queue_full_response()
+        if queue_full:
+            return queue_full
+        
+        # Hash complet (clé du cache de frames): une lecture séquentielle
+        file_hash = hash_file(upload['upload_path'])
+        if upload.get('sha256') and upload['sha256'].lower() != file_hash:
+            abort_upload(upload_id)
+            return jsonify({'error': 'Checksum du fichier invalide', 'reason': 'checksum_mismatch'}), 400
+        
+        ingested = {
+            'file_size': upload['file_size'],
+            'file_hash': file_hash,
+            'mime_type': upload['mime_type']
+        }
+        rejected = rejected_upload_response(Path(upload['upload_path']), ingested)
+        if rejected:
+            abort_upload(upload_id)
+            return rejected
+        
+        try:
+            allocate_workspace('photogrammetry', upload_id)
+        except InsufficientScratchSpace as e:
+            # Chunks conservés: le client peut réessayer /complete
+            return jsonify({'error': 'Espace disque insuffisant, réessayez plus tard', 'detail': str(e)}), 507
+        
+        queue_position = enqueue_upload(upload_id, Path(upload['upload_path']), ingested)
+        job_store.delete_upload(upload_id)
+    
+    finally:
+        job_store.release_upload_completion(upload_id)
+    
+    return jsonify({
+        'job_id': upload_id,
+        'status': 'queued',
+        'queue_position': queue_position,
+        'file_size': upload['file_size'],
+        'file_hash': file_hash,
+        'message': 'Vidéo uploadée, en attente de traitement'
     }), 200
 
-def process_video(job_id: str, video_path: str):
+def process_video(job_id: str):
     """
-    Traite la vidéo en background
+    Traite la vidéo d'un job (thread du runner)
     
     Args:
         job_id: ID du job
-        video_path: Chemin vidéo
     """
-    job = processing_jobs[job_id]
+    job = job_store.get(job_id)
+    if job is None:
+        logger.warning(f"Photogrammetry job {job_id} expired before processing")
+        return
+    
+    video_path = job['upload_path']
+    status = 'failed'
+    stages = {}
     
     try:
-        job['status'] = 'processing'
-        job['progress'] = 10
+        job_store.update(job_id, status='processing', progress=10, started_at=datetime.now().isoformat())
         
-        # Workspace pour ce job
-        workspace = PROCESSING_FOLDER / job_id
-        workspace.mkdir(parents=True, exist_ok=True)
+        # Workspace pour ce job (réservé à l'upload, réactivé après une reprise)
+        workspace = allocate_workspace('photogrammetry', job_id)
         
         # Pipeline complet
         from pipeline import PhotogrammetryPipeline
         
         pipeline = PhotogrammetryPipeline(str(workspace))
         
-        job['progress'] = 20
-        results = pipeline.run_full_pipeline(video_path, extract_fps=30)
+        def progress_callback(stage: str, progress: int, message: str):
+            stages[stage] = message
+            job_store.update(job_id, progress=progress, stages=stages)
+        
+        job_store.update(job_id, progress=20)
+        results = pipeline.run_full_pipeline(
+            video_path,
+            extract_fps=30,
+            progress_callback=progress_callback,
+            content_hash=job.get('file_hash')
+        )
         
         if results['success']:
-            job['status'] = 'completed'
-            job['progress'] = 100
-            job['results'] = results
-            
-            # Copier résultats vers dossier final
-            results_dir = RESULTS_FOLDER / job_id
-            results_dir.mkdir(parents=True, exist_ok=True)
-            
-            # TODO: Copier fichiers mesh/GLB vers results_dir
-            
-            job['results_path'] = str(results_dir)
+            # Export GLB/USDZ et copie vers le dossier final (le workspace est supprimé)
+            results_dir, files = publish_results(job_id, results, workspace)
+            status = 'completed'
+            job_store.update(
+                job_id,
+                status=status,
+                progress=100,
+                results=results,
+                results_path=str(results_dir),
+                files=files,
+                completed_at=datetime.now().isoformat()
+            )
         else:
-            job['status'] = 'failed'
-            job['error'] = results.get('error', 'Processing failed')
+            job_store.update(job_id, status='failed', error=results.get('error', 'Processing failed'))
             
     except Exception as e:
-        job['status'] = 'failed'
-        job['error'] = str(e)
-        job['progress'] = 0
+        logger.error(f"Error processing photogrammetry job {job_id}: {e}")
+        job_store.update(job_id, status='failed', error=str(e), progress=0)
+    
+    finally:
+        # Vidéo source: conservée avec le workspace en cas d'échec (debug)
+        succeeded = status == 'completed'
+        release_workspace('uploads', job_id, succeeded=succeeded)
+        release_workspace('photogrammetry', job_id, succeeded=succeeded)
+
+def export_results(results: Dict[str, Any], export_dir: Path) -> Dict[str, str]:
+    """
+    Exporte le mesh principal (LOD PRIMARY_LOD) en GLB et USDZ, en parallèle
+    
+    Un format en échec est journalisé et absent du résultat: les meshes
+    restent publiés.
+    
+    Returns:
+        {format: chemin du fichier exporté}
+    """
+    mesh_path = lod_meshes(results)[PRIMARY_LOD]
+    # Échecs journalisés par run_task_graph
+    exported, _ = run_task_graph([
+        Task('glb', lambda: export_glb(mesh_path, export_dir / 'glb')),
+        Task('usdz', lambda: export_usdz(mesh_path, export_dir / 'usdz'))
+    ])
+    return exported
+
+def publish_results(job_id: str, results: Dict[str, Any], workspace: Path):
+    """
+    Exporte GLB/USDZ puis copie les fichiers résultats du workspace vers
+    RESULTS_FOLDER/<job_id>
+    
+    Args:
+        job_id: ID du job
+        results: Résultats du pipeline
+        workspace: Workspace du job (exports intermédiaires)
+        
+    Returns:
+        (dossier résultats, {format: nom de fichier})
+    """
+    stages = results.get('stages', {})
+    exported = export_results(results, workspace / 'exports')
+    
+    candidates = [
+        ('glb', exported.get('glb')),
+        ('usdz', exported.get('usdz')),
+        ('mesh', stages.get('mesh_generation', {}).get('mesh_path'))
+    ]
+    for name, lod in stages.get('mesh_lod', {}).items():
+        if lod.get('success'):
+            candidates.append((f"mesh_{name}", lod.get('mesh_path')))
+    
+    results_dir = allocate_workspace('results', job_id)
+    files = {}
+    for name, source in candidates:
+        if not source or not Path(source).is_file():
+            continue
+        filename = f"{name}{Path(source).suffix}"
+        shutil.copy2(source, results_dir / filename)
+        files[name] = filename
+    
+    # Supprimé par le balayage scratch après la rétention
+    retain_workspace('results', job_id, RESULTS_RETENTION_HOURS)
+    return results_dir, files
 
 @app.route('/api/v1/photogrammetry/status/<job_id>', methods=['GET'])
 def get_job_status(job_id: str):
@@ -143,38 +657,44 @@ def get_job_status(job_id: str):
         job_id: ID du job
         
     Returns:
-        JSON avec status et progression
+        JSON avec status, progression et position dans la file
     """
-    if job_id not in processing_jobs:
+    job = job_store.get(job_id)
+    if job is None:
         return jsonify({'error': 'Job non trouvé'}), 404
     
-    job = processing_jobs[job_id]
-    
-    return jsonify({
+    response = {
         'job_id': job_id,
         'status': job['status'],
         'progress': job.get('progress', 0),
         'created_at': job['created_at'],
         'stages': job.get('stages', {}),
         'error': job.get('error')
-    }), 200
+    }
+    
+    if job['status'] == 'queued':
+        response['queue_position'] = job_store.queue_position(job_id)
+        response['queue_length'] = job_store.queue_length()
+    elif job['status'] == 'completed':
+        response['formats'] = sorted(job.get('files', {}))
+    
+    return jsonify(response), 200
 
 @app.route('/api/v1/photogrammetry/download/<job_id>', methods=['GET'])
 def download_results(job_id: str):
     """
-    Télécharge résultats (GLB/USDZ)
+    Télécharge résultats (GLB/USDZ ou mesh)
     
     Args:
         job_id: ID du job
         
     Returns:
-        Fichier GLB/USDZ
+        Fichier demandé (?format=glb|usdz|mesh|mesh_high|mesh_medium|mesh_low)
     """
-    if job_id not in processing_jobs:
+    job = job_store.get(job_id)
+    if job is None:
         return jsonify({'error': 'Job non trouvé'}), 404
     
-    job = processing_jobs[job_id]
-    
     if job['status'] != 'completed':
         return jsonify({'error': 'Job non terminé'}), 400
     
@@ -182,12 +702,12 @@ def download_results(job_id: str):
     format_type = request.args.get('format', 'glb').lower()
     
     # Chercher fichier résultat
-    results_path = Path(job.get('results_path', ''))
-    
-    if format_type == 'glb':
-        glb_file = results_path / 'mesh_high.glb'
-        if glb_file.exists():
-            return send_file(str(glb_file), as_attachment=True, mimetype='model/gltf-binary')
+    filename = job.get('files', {}).get(format_type)
+    if filename:
+        result_file = Path(job['results_path']) / filename
+        if result_file.exists():
+            mimetype = RESULT_MIMETYPES.get(result_file.suffix, 'application/octet-stream')
+            return send_file(str(result_file), as_attachment=True, mimetype=mimetype)
     
     return jsonify({'error': 'Fichier résultat non trouvé'}), 404
 
@@ -206,6 +726,11 @@ def get_preview(job_id: str):
     return jsonify({'error': 'Preview non implémenté'}), 501
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    
+    # Jobs en file au redémarrage: traités sans attendre une requête
+    ensure_runner()
+    
     # Configuration serveur
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
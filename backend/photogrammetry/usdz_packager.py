@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+USDZ Packager
+Écriture USDZ en Python (Linux): stage USD via usd-core, archive ZIP alignée
+
+Un USDZ est une archive ZIP dont les entrées sont stockées sans
+compression, avec des données alignées sur 64 octets (lecture mmap par
+ARKit / Quick Look); la première entrée est le layer USD par défaut.
+UsdzWriter écrit ce format directement: chaque fichier est streamé depuis
+le disque dans l'archive (CRC calculé au passage, en-tête complété
+ensuite), sans copie intermédiaire ni chargement en mémoire.
+
+Usage:
+    mesh_to_usdz('mesh.ply', 'model.usdz')
+
+    with UsdzWriter('model.usdz') as archive:
+        archive.add_file('model.usdc', 'model.usdc')
+        archive.add_file('textures/albedo.png', 'albedo.png')
+"""
+
+import os
+import sys
+import zlib
+import struct
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+    import trimesh
+except ImportError:
+    trimesh = None
+
+try:
+    from pxr import Usd, UsdGeom, UsdShade, Sdf, Vt, Gf
+except ImportError:
+    Usd = None
+
+USD_AVAILABLE = Usd is not None and trimesh is not None
+
+# Alignement des données de chaque entrée (spécification USDZ)
+ALIGNMENT = 64
+
+# Champ extra de bourrage (même identifiant que usdzip)
+PADDING_EXTRA_ID = 0x1986
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Limites ZIP sans ZIP64
+ZIP_MAX_SIZE = 0xFFFFFFFF
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_RECORD = struct.Struct('<IHHHHIIH')
+
+LOCAL_HEADER_SIGNATURE = 0x04034b50
+CENTRAL_HEADER_SIGNATURE = 0x02014b50
+END_RECORD_SIGNATURE = 0x06054b50
+
+# Offset du CRC dans l'en-tête local (CRC, taille compressée, taille)
+LOCAL_CRC_OFFSET = 14
+
+ZIP_VERSION = 20
+UTF8_FLAG = 0x0800
+
+USD_EXTENSIONS = ('.usdc', '.usda', '.usd')
+
+TEXTURE_DIR = 'textures'
+
+
+def _dos_datetime(moment: datetime) -> Tuple[int, int]:
+    dos_time = (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2)
+    dos_date = ((max(moment.year, 1980) - 1980) << 9) | (moment.month << 5) | moment.day
+    return dos_time, dos_date
+
+
+class UsdzWriter:
+    """Archive USDZ: entrées stockées, données alignées sur ALIGNMENT octets"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.entries: List[Dict[str, Any]] = []
+        self._buffer = bytearray(COPY_BUFFER_SIZE)
+        self._time, self._date = _dos_datetime(datetime.now())
+
+    def __enter__(self) -> 'UsdzWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.unlink(self.path)
+
+    def add_file(self, arcname: str, source_path: str):
+        """Ajoute un fichier du disque (streamé par blocs)"""
+        with open(source_path, 'rb') as source:
+            self._add(arcname, source)
+
+    def add_bytes(self, arcname: str, data: bytes):
+        """Ajoute un contenu en mémoire (petits fichiers)"""
+        self._add(arcname, None, data)
+
+    def _add(self, arcname: str, source: Optional[BinaryIO], data: bytes = b''):
+        if not self.entries and not arcname.endswith(USD_EXTENSIONS):
+            raise ValueError(f"First USDZ entry must be a USD layer, got {arcname}")
+        if any(entry['name'] == arcname for entry in self.entries):
+            raise ValueError(f"Duplicate USDZ entry: {arcname}")
+
+        name = arcname.encode('utf-8')
+        flags = 0 if name.isascii() else UTF8_FLAG
+        offset = self.file.tell()
+        extra = self._padding(offset + LOCAL_HEADER.size + len(name))
+
+        # En-tête provisoire: CRC et tailles connus après la copie
+        self.file.write(LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, ZIP_VERSION, flags, 0, self._time, self._date,
+            0, 0, 0, len(name), len(extra)
+        ))
+        self.file.write(name)
+        self.file.write(extra)
+
+        crc, size = self._copy(source) if source else (zlib.crc32(data), len(data))
+        if not source:
+            self.file.write(data)
+        if size > ZIP_MAX_SIZE or offset > ZIP_MAX_SIZE:
+            raise ValueError(f"USDZ entry too large for ZIP without ZIP64: {arcname}")
+
+        end = self.file.tell()
+        self.file.seek(offset + LOCAL_CRC_OFFSET)
+        self.file.write(struct.pack('<III', crc, size, size))
+        self.file.seek(end)
+
+        self.entries.append({'name': arcname, 'encoded': name, 'flags': flags, 'crc': crc, 'size': size, 'offset': offset})
+
+    @staticmethod
+    def _padding(data_offset: int) -> bytes:
+        """Champ extra qui aligne le début des données"""
+        pad = -data_offset % ALIGNMENT
+        if pad == 0:
+            return b''
+        if pad < 4:
+            pad += ALIGNMENT
+        return struct.pack('<HH', PADDING_EXTRA_ID, pad - 4) + bytes(pad - 4)
+
+    def _copy(self, source: BinaryIO) -> Tuple[int, int]:
+        view = memoryview(self._buffer)
+        crc = 0
+        size = 0
+        while True:
+            count = source.readinto(view)
+            if not count:
+                return crc, size
+            crc = zlib.crc32(view[:count], crc)
+            self.file.write(view[:count])
+            size += count
+
+    def close(self):
+        """Écrit le répertoire central et ferme l'archive"""
+        central_offset = self.file.tell()
+        for entry in self.entries:
+            self.file.write(CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE, ZIP_VERSION, ZIP_VERSION, entry['flags'], 0,
+                self._time, self._date, entry['crc'], entry['size'], entry['size'],
+                len(entry['encoded']), 0, 0, 0, 0, 0, entry['offset']
+            ))
+            self.file.write(entry['encoded'])
+        central_size = self.file.tell() - central_offset
+
+        self.file.write(END_RECORD.pack(
+            END_RECORD_SIGNATURE, 0, 0, len(self.entries), len(self.entries),
+            central_size, central_offset, 0
+        ))
+        self.file.close()
+
+
+def author_usd(mesh_path: str, usd_path: str, texture_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Écrit un stage USD (mesh + matériau UsdPreviewSurface) depuis un mesh
+
+    Couleur: texture (si le mesh a des UVs), sinon couleurs de sommets
+    (primvars:displayColor), sinon gris neutre.
+
+    Args:
+        mesh_path: Mesh source (.ply, .obj, .glb)
+        usd_path: Layer de sortie (.usdc binaire recommandé)
+        texture_name: Chemin de la texture dans l'archive (textures/...)
+
+    Returns:
+        Dict avec vertices, faces, color ('texture', 'vertex', 'constant')
+    """
+    if not USD_AVAILABLE:
+        raise RuntimeError("usd-core et trimesh requis: pip install usd-core trimesh")
+
+    mesh = trimesh.load(mesh_path, force='mesh', process=False)
+    vertices = np.asarray(mesh.vertices, dtype=np.float32)
+    faces = np.asarray(mesh.faces, dtype=np.int32)
+
+    stage = Usd.Stage.CreateNew(usd_path)
+    UsdGeom.SetStageUpAxis(stage, UsdGeom.Tokens.y)
+    UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+
+    root = UsdGeom.Xform.Define(stage, '/Model')
+    stage.SetDefaultPrim(root.GetPrim())
+
+    usd_mesh = UsdGeom.Mesh.Define(stage, '/Model/Mesh')
+    usd_mesh.CreatePointsAttr(Vt.Vec3fArray.FromNumpy(vertices))
+    usd_mesh.CreateFaceVertexCountsAttr(Vt.IntArray.FromNumpy(np.full(len(faces), 3, dtype=np.int32)))
+    usd_mesh.CreateFaceVertexIndicesAttr(Vt.IntArray.FromNumpy(faces.reshape(-1)))
+    usd_mesh.CreateNormalsAttr(Vt.Vec3fArray.FromNumpy(np.asarray(mesh.vertex_normals, dtype=np.float32)))
+    usd_mesh.SetNormalsInterpolation(UsdGeom.Tokens.vertex)
+    usd_mesh.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+    usd_mesh.CreateExtentAttr(Vt.Vec3fArray([Gf.Vec3f(*map(float, bound)) for bound in mesh.bounds]))
+
+    material = UsdShade.Material.Define(stage, '/Model/Material')
+    surface = UsdShade.Shader.Define(stage, '/Model/Material/Surface')
+    surface.CreateIdAttr('UsdPreviewSurface')
+    surface.CreateInput('roughness', Sdf.ValueTypeNames.Float).Set(0.8)
+    surface.CreateInput('metallic', Sdf.ValueTypeNames.Float).Set(0.0)
+    material.CreateSurfaceOutput().ConnectToSource(surface.ConnectableAPI(), 'surface')
+    diffuse = surface.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f)
+
+    uv = getattr(mesh.visual, 'uv', None)
+    vertex_colors = mesh.visual.vertex_colors if mesh.visual.kind == 'vertex' else None
+
+    if texture_name and uv is not None and len(uv) == len(vertices):
+        color = 'texture'
+        primvars = UsdGeom.PrimvarsAPI(usd_mesh)
+        primvars.CreatePrimvar('st', Sdf.ValueTypeNames.TexCoord2fArray, UsdGeom.Tokens.vertex).Set(
+            Vt.Vec2fArray.FromNumpy(np.asarray(uv, dtype=np.float32))
+        )
+        reader = UsdShade.Shader.Define(stage, '/Model/Material/STReader')
+        reader.CreateIdAttr('UsdPrimvarReader_float2')
+        reader.CreateInput('varname', Sdf.ValueTypeNames.Token).Set('st')
+        texture = UsdShade.Shader.Define(stage, '/Model/Material/Albedo')
+        texture.CreateIdAttr('UsdUVTexture')
+        texture.CreateInput('file', Sdf.ValueTypeNames.Asset).Set(texture_name)
+        texture.CreateInput('st', Sdf.ValueTypeNames.Float2).ConnectToSource(reader.ConnectableAPI(), 'result')
+        diffuse.ConnectToSource(texture.ConnectableAPI(), 'rgb')
+    elif vertex_colors is not None and len(vertex_colors) == len(vertices):
+        color = 'vertex'
+        display_color = usd_mesh.CreateDisplayColorPrimvar(UsdGeom.Tokens.vertex)
+        display_color.Set(Vt.Vec3fArray.FromNumpy(np.asarray(vertex_colors[:, :3], dtype=np.float32) / 255.0))
+        reader = UsdShade.Shader.Define(stage, '/Model/Material/ColorReader')
+        reader.CreateIdAttr('UsdPrimvarReader_float3')
+        reader.CreateInput('varname', Sdf.ValueTypeNames.Token).Set('displayColor')
+        diffuse.ConnectToSource(reader.ConnectableAPI(), 'result')
+    else:
+        color = 'constant'
+        diffuse.Set(Gf.Vec3f(0.8, 0.8, 0.8))
+
+    UsdShade.MaterialBindingAPI.Apply(usd_mesh.GetPrim()).Bind(material)
+    stage.GetRootLayer().Save()
+
+    return {
+        'vertices': len(vertices),
+        'faces': len(faces),
+        'color': color
+    }
+
+
+def mesh_to_usdz(mesh_path: str, output_path: str, texture_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Convertit un mesh en USDZ (stage usdc + texture éventuelle)
+
+    Args:
+        mesh_path: Mesh source
+        output_path: Archive .usdz
+        texture_path: Texture couleur (PNG/JPEG) pour un mesh avec UVs
+
+    Returns:
+        Dict avec path, size, entries et les infos du stage
+    """
+    output = Path(output_path)
+    usd_path = output.with_suffix('.usdc')
+    texture_name = f"{TEXTURE_DIR}/{Path(texture_path).name}" if texture_path else None
+
+    try:
+        stage_info = author_usd(mesh_path, str(usd_path), texture_name)
+        with UsdzWriter(str(output)) as archive:
+            archive.add_file(usd_path.name, str(usd_path))
+            if stage_info['color'] == 'texture':
+                archive.add_file(texture_name, texture_path)
+    finally:
+        usd_path.unlink(missing_ok=True)
+
+    return {
+        'path': str(output),
+        'size': output.stat().st_size,
+        'entries': len(archive.entries),
+        **stage_info
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convertit un mesh en USDZ (usd-core, sans usdzip)')
+    parser.add_argument('mesh', help='Mesh source (.ply, .obj, .glb)')
+    parser.add_argument('-o', '--output', help='Archive de sortie (défaut: <mesh>.usdz)')
+    parser.add_argument('--texture', help='Texture couleur (mesh avec UVs)')
+
+    args = parser.parse_args()
+    output = args.output or str(Path(args.mesh).with_suffix('.usdz'))
+
+    try:
+        result = mesh_to_usdz(args.mesh, output, args.texture)
+        print(f"✅ USDZ: {result['path']} ({result['size'] / 1024 / 1024:.2f}MB, couleur: {result['color']})")
+        return 0
+    except Exception as e:
+        print(f"❌ Erreur: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
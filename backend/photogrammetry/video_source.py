@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Video Source
+Vidéo d'entrée d'un job: fichier local ou objet R2 (r2://<key>)
+
+Les clients uploadent directement dans R2 (URLs multipart présignées); le
+job ne porte que la clé. Le worker télécharge l'objet dans son workspace
+par plages parallèles: pas de système de fichiers partagé avec l'API.
+
+Option R2_STREAM_EXTRACTION: l'extraction des frames lit l'objet via une
+URL GET présignée (ffmpeg/OpenCV font des lectures par plages) pendant que
+le téléchargement continue. Le SHA-256 annoncé à l'upload sert de clé de
+cache; il est vérifié sur le fichier téléchargé avant toute lecture ou
+écriture du cache (verify_hash).
+
+Usage:
+    video = open_video(video_path, workspace)
+    extract_frames_cached(video.source, content_hash=video.content_hash,
+                          verify_hash=video.hash_check)
+    video.wait()  # Fichier local complet (retries, étapes suivantes)
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Union, Callable
+
+try:
+    from photogrammetry.frame_extractor import compute_video_hash
+except ImportError:
+    from frame_extractor import compute_video_hash
+
+logger = logging.getLogger(__name__)
+
+R2_SCHEME = 'r2://'
+
+R2_STREAM_EXTRACTION = os.getenv('R2_STREAM_EXTRACTION', 'false').lower() == 'true'
+R2_STREAM_URL_EXPIRATION = int(os.getenv('R2_STREAM_URL_EXPIRATION', 6 * 3600))
+
+# Métadonnée d'objet posée à la création de l'upload (SHA-256 annoncé)
+SHA256_METADATA = 'sha256'
+
+# Sous-dossier du workspace recevant la vidéo téléchargée
+INPUT_DIR = 'input'
+
+
+def is_r2_source(video_path: Optional[str]) -> bool:
+    return bool(video_path) and video_path.startswith(R2_SCHEME)
+
+
+def r2_source(key: str) -> str:
+    """Référence r2://<key> portée par le job"""
+    return f"{R2_SCHEME}{key}"
+
+
+def r2_key(video_path: str) -> str:
+    return video_path[len(R2_SCHEME):]
+
+
+class VideoSource:
+    """Vidéo d'un job, téléchargée dans le workspace si elle est dans R2"""
+
+    def __init__(self, video_path: str, workspace: Union[str, Path], stream: bool = R2_STREAM_EXTRACTION):
+        self.video_path = video_path
+        self.workspace = Path(workspace)
+        self.stream = stream
+        # Entrée de l'extraction (chemin local ou URL présignée)
+        self.source = video_path
+        # SHA-256 de clé de cache (None: calculé par l'extraction)
+        self.content_hash: Optional[str] = None
+        self.local_path: Optional[str] = None if is_r2_source(video_path) else video_path
+        # Vérification du hash annoncé (extraction en streaming uniquement)
+        self.hash_check: Optional[Callable[[], str]] = None
+        self._declared_hash: Optional[str] = None
+        self._verified_hash: Optional[str] = None
+        self._download: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def open(self) -> 'VideoSource':
+        """Prépare la source (téléchargement synchrone ou en arrière-plan)"""
+        if self.local_path:
+            return self
+
+        from api.r2_client import get_file_info, download_to_file, generate_presigned_url
+
+        key = r2_key(self.video_path)
+        info = get_file_info(key)
+        if info is None:
+            raise FileNotFoundError(f"Video not found in R2: {key}")
+
+        input_dir = self.workspace / INPUT_DIR
+        input_dir.mkdir(parents=True, exist_ok=True)
+        dest = input_dir / Path(key).name
+        self._declared_hash = (info['metadata'].get(SHA256_METADATA) or '').lower() or None
+
+        # Retry RQ ou étape suivante: déjà téléchargée (renommée une fois complète)
+        if dest.exists() and dest.stat().st_size == info['size']:
+            self._set_local(dest)
+            return self
+
+        def download():
+            try:
+                download_to_file(key, str(dest), size=info['size'], etag=info['etag'])
+            except BaseException as e:
+                self._error = e
+
+        if self.stream and self._declared_hash:
+            self._download = threading.Thread(target=download, name=f'r2-download-{dest.name}', daemon=True)
+            self._download.start()
+            self.source = generate_presigned_url(key, expiration=R2_STREAM_URL_EXPIRATION, method='get_object')
+            self.content_hash = self._declared_hash
+            self.hash_check = self.verify_hash
+            logger.info(f"Streaming {key} ({info['size']} bytes) while downloading to {dest}")
+            return self
+
+        download()
+        if self._error:
+            raise self._error
+        self._set_local(dest)
+        logger.info(f"Downloaded {key} ({info['size']} bytes) to {dest}")
+        return self
+
+    def _set_local(self, path: Path):
+        self.local_path = str(path)
+        self.source = str(path)
+
+    def wait(self) -> str:
+        """
+        Attend la fin du téléchargement
+
+        Returns:
+            Chemin local de la vidéo
+        """
+        if self._download:
+            self._download.join()
+            self._download = None
+            if self._error:
+                raise self._error
+            self.local_path = str(self.workspace / INPUT_DIR / Path(r2_key(self.video_path)).name)
+        return self.local_path
+
+    def verify_hash(self) -> str:
+        """
+        SHA-256 réel de la vidéo téléchargée (attend la fin du téléchargement)
+
+        Returns:
+            Hash hexadécimal, comparé par l'appelant à content_hash
+        """
+        if self._verified_hash is None:
+            self._verified_hash = compute_video_hash(self.wait())
+        return self._verified_hash
+
+
+def open_video(video_path: str, workspace: Union[str, Path], stream: bool = R2_STREAM_EXTRACTION) -> VideoSource:
+    """
+    Résout la vidéo d'un job
+
+    Args:
+        video_path: Chemin local ou r2://<key>
+        workspace: Workspace du job (reçoit la vidéo téléchargée)
+        stream: Extraction depuis une URL présignée pendant le téléchargement
+
+    Returns:
+        VideoSource ouverte
+    """
+    return VideoSource(video_path, workspace, stream).open()
@@ -4,7 +4,8 @@ API Endpoints pour Jobs
 Flask routes pour soumettre et suivre les jobs
 """
 
-from flask import Flask, request, jsonify
+import math
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from job_service import (
     submit_photogrammetry_job,
@@ -12,19 +13,46 @@ from job_service import (
     submit_ai_vision_job,
     submit_ai_generation_job,
     submit_mesh_optimization_job,
-    get_job_status
+    submit_jobs_bulk,
+    get_job_status,
+    BULK_MAX_JOBS
 )
 from job_models import JobType, JobPriority
+from fair_scheduler import get_wait_percentiles
+from progress_stream import get_job_owner, stream_job_progress, wait_for_progress, LONG_POLL_TIMEOUT
 from auth_supabase import require_auth
+import direct_upload
 from typing import Dict, Any
 
 app = Flask(__name__)
 CORS(app)
 
+def get_user_tier(user: Dict[str, Any]) -> str:
+    """Tier fair-share de l'utilisateur (app_metadata.tier du JWT Supabase)"""
+    return (user.get('app_metadata') or {}).get('tier', 'free')
+
+def tracking_urls(job_id: str) -> Dict[str, str]:
+    """URLs de suivi de progression: SSE et long-poll (fallback)"""
+    return {
+        'events_url': f"/api/v1/jobs/{job_id}/events",
+        'progress_url': f"/api/v1/jobs/{job_id}/progress"
+    }
+
+def submission_response(job_id: str) -> Dict[str, Any]:
+    """Réponse de soumission (un doublon peut être déjà terminé)"""
+    job = get_job_status(job_id) or {}
+    return {
+        'job_id': job_id,
+        'status': 'completed' if job.get('status') == 'completed' else 'queued',
+        'output_url': job.get('output_url'),
+        'deduplicated_from': job.get('deduplicated_from'),
+        **tracking_urls(job_id)
+    }
+
 @app.route('/api/v1/jobs/photogrammetry', methods=['POST'])
 @require_auth
 def create_photogrammetry_job(user: Dict[str, Any]):
-    """Submit photogrammetry job"""
+    """Submit photogrammetry job: {"video_path", "sha256"? (direct upload), "quality"?, ...}"""
     data = request.json
     video_path = data.get('video_path')
     priority = JobPriority(data.get('priority', 'default'))
@@ -32,17 +60,21 @@ def create_photogrammetry_job(user: Dict[str, Any]):
     if not video_path:
         return jsonify({'error': 'video_path required'}), 400
     
+    if not direct_upload.check_video_access(user['sub'], video_path):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
     job_id = submit_photogrammetry_job(
         user_id=user['sub'],
+        tier=get_user_tier(user),
         video_path=video_path,
         asset_id=data.get('asset_id'),
-        priority=priority
+        priority=priority,
+        quality=data.get('quality'),
+        # SHA-256 retourné par /uploads/complete: pas de relecture de l'entrée
+        content_hash=direct_upload.upload_content_hash(user['sub'], video_path, data.get('sha256'))
     )
     
-    return jsonify({
-        'job_id': job_id,
-        'status': 'queued'
-    }), 201
+    return jsonify(submission_response(job_id)), 201
 
 @app.route('/api/v1/jobs/gaussian-splatting', methods=['POST'])
 @require_auth
@@ -55,17 +87,18 @@ def create_gaussian_splatting_job(user: Dict[str, Any]):
     if not video_path:
         return jsonify({'error': 'video_path required'}), 400
     
+    if not direct_upload.check_video_access(user['sub'], video_path):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
     job_id = submit_gaussian_splatting_job(
         user_id=user['sub'],
+        tier=get_user_tier(user),
         video_path=video_path,
         config=config,
         asset_id=data.get('asset_id')
     )
     
-    return jsonify({
-        'job_id': job_id,
-        'status': 'queued'
-    }), 201
+    return jsonify(submission_response(job_id)), 201
 
 @app.route('/api/v1/jobs/ai-vision', methods=['POST'])
 @require_auth
@@ -80,14 +113,12 @@ def create_ai_vision_job(user: Dict[str, Any]):
     
     job_id = submit_ai_vision_job(
         user_id=user['sub'],
+        tier=get_user_tier(user),
         image_path=image_path,
         prompt=prompt
     )
     
-    return jsonify({
-        'job_id': job_id,
-        'status': 'queued'
-    }), 201
+    return jsonify(submission_response(job_id)), 201
 
 @app.route('/api/v1/jobs/ai-generation', methods=['POST'])
 @require_auth
@@ -103,19 +134,127 @@ def create_ai_generation_job(user: Dict[str, Any]):
     
     job_id = submit_ai_generation_job(
         user_id=user['sub'],
+        tier=get_user_tier(user),
         generation_type=generation_type,
         prompt=prompt,
         config=config
     )
     
+    return jsonify(submission_response(job_id)), 201
+
+@app.route('/api/v1/jobs/uploads', methods=['POST'])
+@require_auth
+def create_direct_upload(user: Dict[str, Any]):
+    """
+    Start a direct-to-R2 video upload: {"filename", "file_size", "content_type", "sha256"?}
+    
+    Le client envoie les parts sur les URLs présignées (en parallèle), puis
+    appelle /complete; video_path (r2://<key>) est ensuite passé au job.
+    """
+    data = request.json or {}
+    
+    try:
+        upload = direct_upload.start_upload(
+            user['sub'],
+            data.get('filename', ''),
+            data.get('file_size'),
+            data.get('content_type', ''),
+            sha256=data.get('sha256')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(upload), 201
+
+@app.route('/api/v1/jobs/uploads/parts', methods=['POST'])
+@require_auth
+def refresh_direct_upload_parts(user: Dict[str, Any]):
+    """Resume a direct upload: {"key", "upload_id", "file_size"} → uploaded parts, new URLs"""
+    data = request.json or {}
+    key = data.get('key', '')
+    
+    if not data.get('upload_id') or not isinstance(data.get('file_size'), int):
+        return jsonify({'error': 'upload_id and file_size required'}), 400
+    
+    if not direct_upload.owns_key(user['sub'], key):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(direct_upload.part_urls(key, data['upload_id'], data['file_size'])), 200
+
+@app.route('/api/v1/jobs/uploads/complete', methods=['POST'])
+@require_auth
+def complete_direct_upload(user: Dict[str, Any]):
+    """Complete a direct upload: {"key", "upload_id", "parts"?: [{"PartNumber", "ETag"}]}"""
+    data = request.json or {}
+    key = data.get('key', '')
+    
+    if not data.get('upload_id'):
+        return jsonify({'error': 'upload_id required'}), 400
+    
+    if not direct_upload.owns_key(user['sub'], key):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        result = direct_upload.complete_upload(key, data['upload_id'], data.get('parts'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result), 200
+
+@app.route('/api/v1/jobs/uploads', methods=['DELETE'])
+@require_auth
+def abort_direct_upload(user: Dict[str, Any]):
+    """Abort a direct upload: {"key", "upload_id"}"""
+    data = request.json or {}
+    key = data.get('key', '')
+    
+    if not direct_upload.owns_key(user['sub'], key):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if not direct_upload.abort_upload(key, data.get('upload_id', '')):
+        return jsonify({'error': 'Abort failed'}), 502
+    
+    return jsonify({'key': key, 'status': 'aborted'}), 200
+
+@app.route('/api/v1/jobs/batch', methods=['POST'])
+@require_auth
+def create_jobs_batch(user: Dict[str, Any]):
+    """
+    Submit several jobs: {"jobs": [{"type": "photogrammetry", "video_path": ...}, ...]}
+    
+    201 si tous les éléments sont acceptés, 207 si certains sont en erreur
+    (résultat par élément, dans l'ordre de la requête).
+    """
+    data = request.json or {}
+    items = data.get('jobs')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'jobs list required'}), 400
+    
+    if len(items) > BULK_MAX_JOBS:
+        return jsonify({'error': f'Too many jobs (max {BULK_MAX_JOBS})'}), 400
+    
+    results = submit_jobs_bulk(user['sub'], items, tier=get_user_tier(user))
+    errors = sum(1 for result in results if 'error' in result)
+    for result in results:
+        if 'error' not in result:
+            result.update(tracking_urls(result['job_id']))
+    
     return jsonify({
-        'job_id': job_id,
-        'status': 'queued'
-    }), 201
+        'jobs': results,
+        'count': len(results) - errors,
+        'errors': errors
+    }), 207 if errors else 201
+
+@app.route('/api/v1/jobs/queue-stats', methods=['GET'])
+@require_auth
+def get_queue_stats(user: Dict[str, Any]):
+    """Queue wait percentiles per tier (submit → worker start, seconds)"""
+    return jsonify({'tiers': get_wait_percentiles()}), 200
 
 @app.route('/api/v1/jobs/<job_id>', methods=['GET'])
 @require_auth
-def get_job(job_id: str, user: Dict[str, Any]):
+def get_job(user: Dict[str, Any], job_id: str):
     """Get job status"""
     job = get_job_status(job_id)
     
@@ -128,15 +267,67 @@ def get_job(job_id: str, user: Dict[str, Any]):
     
     return jsonify(job), 200
 
+@app.route('/api/v1/jobs/<job_id>/events', methods=['GET'])
+@require_auth
+def stream_job_events(user: Dict[str, Any], job_id: str):
+    """Stream job progress (Server-Sent Events)"""
+    owner = get_job_owner(job_id)
+    
+    if not owner:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if owner != user['sub']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return Response(
+        stream_with_context(stream_job_progress(job_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Pas de buffering nginx
+        }
+    )
+
+@app.route('/api/v1/jobs/<job_id>/progress', methods=['GET'])
+@require_auth
+def poll_job_progress(user: Dict[str, Any], job_id: str):
+    """Long-poll job progress (fallback SSE): ?since=<updated_at>&timeout=<s>"""
+    owner = get_job_owner(job_id)
+    
+    if not owner:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if owner != user['sub']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    timeout = request.args.get('timeout', LONG_POLL_TIMEOUT, type=float)
+    if timeout is None or not math.isfinite(timeout):
+        return jsonify({'error': 'timeout must be a number of seconds'}), 400
+    timeout = min(max(timeout, 0), LONG_POLL_TIMEOUT)
+    state = wait_for_progress(job_id, since=request.args.get('since'), timeout=timeout)
+    
+    if not state:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(state), 200
+
 @app.route('/api/v1/jobs', methods=['GET'])
 @require_auth
 def list_user_jobs(user: Dict[str, Any]):
-    """List user's jobs"""
+    """List user's jobs (with queue position for pending jobs)"""
     from job_tracker import get_user_jobs
+    from rq_config import get_jobs_status
     
     limit = int(request.args.get('limit', 50))
     jobs = get_user_jobs(user['sub'], limit)
     
+    try:
+        queue_status = get_jobs_status(str(job['id']) for job in jobs)
+        for job in jobs:
+            job['queue'] = queue_status.get(str(job['id']))
+    except Exception as e:
+        app.logger.warning(f"Error fetching queue status: {e}")
+    
     return jsonify({
         'jobs': jobs,
         'count': len(jobs)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Database Pool
+Pool de connexions PostgreSQL partagé par processus (job_tracker, webhooks)
+
+Les workers RQ forkent un work-horse par job: le pool hérité du parent n'est
+jamais réutilisé ni fermé dans l'enfant (fermer enverrait un Terminate sur le
+socket du parent), un nouveau pool est créé au premier accès.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN', 1))
+POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX', 10))
+
+# Connexion inactive depuis plus longtemps: SELECT 1 avant réutilisation
+HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
+# Attente max d'une connexion libre quand les POOL_MAX_CONN sont empruntées
+POOL_WAIT_TIMEOUT = float(os.getenv('DB_POOL_WAIT_TIMEOUT', 30))
+
+_pool: Optional[pg_pool.ThreadedConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+_last_used: Dict[int, float] = {}
+
+# Un slot par connexion empruntable: getconn() lève PoolError au-delà de
+# POOL_MAX_CONN au lieu d'attendre
+_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+
+# Pools hérités d'un fork: gardés référencés pour ne jamais être fermés
+_inherited_pools: List[pg_pool.ThreadedConnectionPool] = []
+
+def get_connection_params() -> Dict[str, Any]:
+    """Paramètres de connexion PostgreSQL (env DB_*)"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 5432)),
+        'database': os.getenv('DB_NAME', 'arcode_db'),
+        'user': os.getenv('DB_USER', 'arcode_user'),
+        'password': os.getenv('DB_PASSWORD'),
+        'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
+        # Détecte les connexions mortes (failover, idle timeout du proxy)
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 3
+    }
+
+def _reset_after_fork():
+    """Oublie le pool du parent dans un processus forké"""
+    global _pool, _pool_pid, _pool_lock, _slots
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+    _last_used.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_pool() -> pg_pool.ThreadedConnectionPool:
+    """Pool du processus courant (créé au premier appel)"""
+    global _pool, _pool_pid
+
+    if _pool is not None and _pool_pid != os.getpid():
+        _reset_after_fork()
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pg_pool.ThreadedConnectionPool(
+                    POOL_MIN_CONN,
+                    POOL_MAX_CONN,
+                    **get_connection_params()
+                )
+                _pool_pid = os.getpid()
+
+    return _pool
+
+def close_pool():
+    """Ferme toutes les connexions du pool (arrêt du processus)"""
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+        _slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+        _last_used.clear()
+
+def _is_healthy(conn) -> bool:
+    """Vérifie une connexion avant de la prêter"""
+    if conn.closed:
+        return False
+
+    last_used = _last_used.get(id(conn))
+    if last_used is not None and time.monotonic() - last_used < HEALTH_CHECK_INTERVAL:
+        return True
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _putconn(db_pool: pg_pool.ThreadedConnectionPool, conn, discard: bool = False):
+    """Rend une connexion au pool (fermée si cassée)"""
+    if discard or conn.closed:
+        _last_used.pop(id(conn), None)
+        db_pool.putconn(conn, close=True)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+        db_pool.putconn(conn)
+
+def _release(db_pool: pg_pool.ThreadedConnectionPool, conn, discard: bool = False):
+    """Rend une connexion empruntée par _acquire et libère son slot"""
+    try:
+        _putconn(db_pool, conn, discard)
+    finally:
+        # Pool remplacé (fork, close_pool): les slots ont été recréés avec lui
+        if db_pool is _pool:
+            _slots.release()
+
+def _acquire() -> Tuple[pg_pool.ThreadedConnectionPool, Any]:
+    """
+    Emprunte une connexion saine, en attendant qu'une se libère
+
+    Raises:
+        PoolError si aucune connexion ne se libère en POOL_WAIT_TIMEOUT
+    """
+    db_pool = get_pool()
+    slots = _slots
+    if not slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+        raise pg_pool.PoolError(f"No PostgreSQL connection available after {POOL_WAIT_TIMEOUT}s")
+
+    try:
+        for _ in range(POOL_MAX_CONN + 1):
+            conn = db_pool.getconn()
+            if _is_healthy(conn):
+                return db_pool, conn
+            logger.warning("Discarding broken PostgreSQL connection")
+            _putconn(db_pool, conn, discard=True)
+
+        raise psycopg2.OperationalError("No healthy PostgreSQL connection available")
+    except BaseException:
+        slots.release()
+        raise
+
+@contextmanager
+def connection() -> Iterator[Any]:
+    """
+    Connexion empruntée au pool
+
+    Commit en sortie normale, rollback sur exception. Les connexions en
+    erreur réseau sont fermées au lieu d'être rendues au pool.
+    """
+    db_pool, conn = _acquire()
+    discard = False
+
+    try:
+        yield conn
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        _release(db_pool, conn, discard)
+
+@contextmanager
+def db_cursor(dict_cursor: bool = False) -> Iterator[Any]:
+    """
+    Cursor sur une connexion du pool (transaction commitée en sortie)
+
+    Args:
+        dict_cursor: Lignes retournées en dict (RealDictCursor)
+    """
+    with connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor if dict_cursor else None)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Direct Upload
+Upload des vidéos de capture directement dans R2 (multipart présigné)
+
+Le client découpe la vidéo en parts de taille fixe et les envoie en
+parallèle sur des URLs présignées; l'API ne voit passer aucun octet.
+La clé de l'objet est portée par le job (video_path = r2://<key>) et
+téléchargée par le worker (photogrammetry.video_source).
+
+Flux:
+    start_upload()    → key, upload_id, part_size, URLs des parts
+    part_urls()       → parts reçues, nouvelles URLs (reprise)
+    complete_upload() → assemblage côté R2, video_path du job
+    abort_upload()    → parts supprimées
+"""
+
+import sys
+import os
+import uuid
+import math
+from typing import Dict, Any, List, Optional
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.utils import secure_filename
+from photogrammetry.video_source import r2_source, is_r2_source, r2_key, SHA256_METADATA
+from security.upload_ingest import sniff_container, CONTAINER_TYPES, SNIFF_BYTES
+
+logger = logging.getLogger(__name__)
+
+DIRECT_UPLOAD_MAX_SIZE = int(os.getenv('DIRECT_UPLOAD_MAX_SIZE', str(10 * 1024 ** 3)))  # 10GB
+DIRECT_UPLOAD_PART_SIZE = int(os.getenv('DIRECT_UPLOAD_PART_SIZE', str(16 * 1024 * 1024)))  # 16MB
+DIRECT_UPLOAD_URL_EXPIRATION = int(os.getenv('DIRECT_UPLOAD_URL_EXPIRATION', 3600))
+
+# Contraintes multipart S3/R2: parts de 5MB minimum (sauf la dernière), 10000 parts
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+VIDEO_CONTENT_TYPES = {'video/mp4', 'video/quicktime'}
+
+UPLOAD_PREFIX = 'uploads/videos'
+
+def upload_key(user_id: str, filename: str) -> str:
+    """Clé R2 d'une vidéo uploadée (préfixe propre à l'utilisateur)"""
+    return f"{UPLOAD_PREFIX}/{user_id}/{uuid.uuid4()}/{secure_filename(filename) or 'video.mp4'}"
+
+def owns_key(user_id: str, key: str) -> bool:
+    return key.startswith(f"{UPLOAD_PREFIX}/{user_id}/") and '..' not in key.split('/')
+
+def check_video_access(user_id: str, video_path: Optional[str]) -> bool:
+    """Un job ne peut référencer que les objets R2 uploadés par son utilisateur"""
+    return not is_r2_source(video_path) or owns_key(user_id, r2_key(video_path))
+
+def declared_content_hash(video_path: str) -> Optional[str]:
+    """
+    Clé de contenu d'une vidéo uploadée en direct (dédoublonnage)
+
+    Le SHA-256 est celui annoncé à start_upload (métadonnée de l'objet):
+    l'API ne voit pas les octets et ne peut pas le vérifier. La clé est donc
+    préfixée par l'utilisateur propriétaire: annoncer le hash d'une vidéo
+    d'un autre utilisateur ne donne pas accès à ses résultats.
+
+    Returns:
+        "<user_id>:<sha256>", None si l'objet n'a pas de SHA-256 annoncé
+    """
+    from api.r2_client import get_file_info
+
+    key = r2_key(video_path)
+    if not key.startswith(f"{UPLOAD_PREFIX}/"):
+        return None
+    info = get_file_info(key)
+    sha256 = (info['metadata'].get(SHA256_METADATA) or '').lower() if info else ''
+    if not sha256:
+        return None
+    owner = key[len(UPLOAD_PREFIX) + 1:].split('/', 1)[0]
+    return f"{owner}:{sha256}"
+
+def upload_content_hash(user_id: str, video_path: Optional[str], sha256: Optional[str]) -> Optional[str]:
+    """
+    Clé de contenu d'un upload direct depuis le SHA-256 retourné par complete_upload
+
+    Même clé que declared_content_hash, sans HEAD R2 dans la requête de
+    soumission. Préfixée par l'utilisateur qui soumet, propriétaire de l'objet.
+
+    Returns:
+        "<user_id>:<sha256>", None hors upload direct de l'utilisateur ou SHA-256 invalide
+    """
+    if not is_sha256_digest(sha256) or not is_r2_source(video_path) or not owns_key(user_id, r2_key(video_path)):
+        return None
+    return f"{user_id}:{sha256.lower()}"
+
+def is_sha256_digest(value: Optional[str]) -> bool:
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value.lower())
+
+def part_size_for(file_size: int) -> int:
+    """Taille de part: DIRECT_UPLOAD_PART_SIZE, augmentée si plus de MAX_PARTS"""
+    part_size = max(DIRECT_UPLOAD_PART_SIZE, MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+    # Multiple de 1MB: découpage simple côté client
+    return math.ceil(part_size / (1024 * 1024)) * 1024 * 1024
+
+def start_upload(
+    user_id: str,
+    filename: str,
+    file_size: int,
+    content_type: str,
+    sha256: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Crée un upload multipart et présigne toutes ses parts
+
+    Args:
+        user_id: User ID
+        filename: Nom du fichier
+        file_size: Taille exacte en octets
+        content_type: Type MIME (VIDEO_CONTENT_TYPES)
+        sha256: SHA-256 annoncé (clé du cache de frames, vérifié par le worker)
+
+    Returns:
+        Dict avec key, upload_id, part_size, part_count, part_urls, video_path
+
+    Raises:
+        ValueError si la requête est invalide
+    """
+    from api.r2_client import create_multipart_upload, generate_presigned_part_urls
+
+    if not isinstance(file_size, int) or file_size <= 0:
+        raise ValueError("file_size required")
+    if file_size > DIRECT_UPLOAD_MAX_SIZE:
+        raise ValueError(f"File too large (max {DIRECT_UPLOAD_MAX_SIZE // 1024 ** 2}MB)")
+    if content_type not in VIDEO_CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    if sha256 is not None and not is_sha256_digest(sha256):
+        raise ValueError("sha256 must be a hex SHA-256 digest")
+
+    key = upload_key(user_id, filename)
+    part_size = part_size_for(file_size)
+    part_count = math.ceil(file_size / part_size)
+
+    metadata = {'user-id': user_id, 'file-size': str(file_size)}
+    if sha256:
+        metadata[SHA256_METADATA] = sha256.lower()
+
+    upload_id = create_multipart_upload(key, content_type, metadata)
+    urls = generate_presigned_part_urls(key, upload_id, list(range(1, part_count + 1)), DIRECT_UPLOAD_URL_EXPIRATION)
+
+    logger.info(f"Direct upload started for user {user_id}: {key} ({file_size} bytes, {part_count} parts)")
+
+    return {
+        'key': key,
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'part_count': part_count,
+        'part_urls': [urls[number] for number in range(1, part_count + 1)],
+        'expires_in': DIRECT_UPLOAD_URL_EXPIRATION,
+        'video_path': r2_source(key)
+    }
+
+def part_urls(key: str, upload_id: str, file_size: int) -> Dict[str, Any]:
+    """
+    Parts déjà reçues et nouvelles URLs pour les parts manquantes (reprise)
+
+    Args:
+        key: Clé R2
+        upload_id: Upload multipart
+        file_size: Taille annoncée à start_upload (même découpage)
+
+    Returns:
+        Dict avec uploaded_parts et part_urls {numéro: URL}
+    """
+    from api.r2_client import list_uploaded_parts, generate_presigned_part_urls
+
+    uploaded = list_uploaded_parts(key, upload_id)
+    part_count = math.ceil(file_size / part_size_for(file_size))
+    done = {part['PartNumber'] for part in uploaded}
+    part_numbers = [number for number in range(1, part_count + 1) if number not in done]
+
+    urls = generate_presigned_part_urls(key, upload_id, part_numbers, DIRECT_UPLOAD_URL_EXPIRATION)
+    return {
+        'uploaded_parts': [part['PartNumber'] for part in uploaded],
+        'part_urls': {str(number): url for number, url in urls.items()},
+        'expires_in': DIRECT_UPLOAD_URL_EXPIRATION
+    }
+
+def complete_upload(
+    key: str,
+    upload_id: str,
+    parts: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Assemble l'objet côté R2 (sans transfert) et retourne la référence du job
+
+    La taille annoncée et le type (premiers octets, GET par plage) sont
+    vérifiés; un objet invalide est supprimé.
+
+    Args:
+        key: Clé R2
+        upload_id: Upload multipart
+        parts: [{PartNumber, ETag}] du client (défaut: parts listées par R2)
+
+    Returns:
+        Dict avec video_path, file_size, sha256 (annoncé, None sinon)
+
+    Raises:
+        ValueError si l'objet assemblé est invalide
+    """
+    from api.r2_client import complete_multipart_upload, get_file_info, download_range, delete_file
+
+    complete_multipart_upload(key, upload_id, parts)
+    info = get_file_info(key)
+    if info is None:
+        raise ValueError(f"Upload not found after completion: {key}")
+
+    declared = info['metadata'].get('file-size')
+    if declared and int(declared) != info['size']:
+        delete_file(key)
+        raise ValueError(f"Size mismatch: declared {declared}, uploaded {info['size']}")
+
+    mime_type = sniff_container(download_range(key, 0, SNIFF_BYTES - 1))
+    if mime_type not in CONTAINER_TYPES['video']:
+        delete_file(key)
+        raise ValueError(f"File type not allowed: {mime_type or 'unknown'}")
+
+    return {
+        'video_path': r2_source(key),
+        'file_size': info['size'],
+        'sha256': info['metadata'].get(SHA256_METADATA)
+    }
+
+def abort_upload(key: str, upload_id: str) -> bool:
+    """Abandonne un upload (parts supprimées par R2)"""
+    from api.r2_client import abort_multipart_upload
+    return abort_multipart_upload(key, upload_id)
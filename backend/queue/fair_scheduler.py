@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Fair-Share Scheduler
+File d'attente par utilisateur entre job_service et RQ (deficit round-robin)
+
+Les jobs soumis vont dans une liste Redis par utilisateur; le dispatcher sert
+les utilisateurs à tour de rôle (quantum = poids du tier), dans la limite
+de jobs en cours par utilisateur et par tier, et ne remplit les queues RQ
+que jusqu'à FAIRSHARE_QUEUE_DEPTH: un utilisateur qui soumet 200 vidéos ne
+bloque plus les autres.
+
+Le dispatch est déclenché à chaque soumission et par la boucle
+`python fair_scheduler.py` (systemd/fairshare-dispatcher.service), qui
+remplit les slots libérés par les jobs terminés.
+"""
+
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from rq_config import redis_conn, ALL_QUEUES, index_job
+
+logger = logging.getLogger(__name__)
+
+FAIRSHARE_ENABLED = os.getenv('FAIRSHARE_ENABLED', 'true').lower() == 'true'
+
+# Jobs en attente max par queue RQ (le reste attend dans les listes utilisateur)
+FAIRSHARE_QUEUE_DEPTH = int(os.getenv('FAIRSHARE_QUEUE_DEPTH', 10))
+
+# Un job sans état terminal après ce délai ne compte plus comme en cours
+RUNNING_TTL = int(os.getenv('FAIRSHARE_RUNNING_TTL', 4 * 3600))
+
+DISPATCH_INTERVAL = float(os.getenv('FAIRSHARE_DISPATCH_INTERVAL', 2))
+
+# Échantillons de temps d'attente conservés par tier
+WAIT_SAMPLES = 1000
+
+PENDING_KEY = "fairshare:pending:{user_id}"
+RUNNING_KEY = "fairshare:running:{user_id}"
+TIER_RUNNING_KEY = "fairshare:running_tier:{tier}"
+WAIT_KEY = "fairshare:wait:{tier}"
+RING_KEY = "fairshare:ring"
+ACTIVE_KEY = "fairshare:active"
+DEFICIT_KEY = "fairshare:deficit"
+USER_TIER_KEY = "fairshare:tiers"
+JOB_USER_KEY = "fairshare:job_user"
+LOCK_KEY = "fairshare:lock"
+
+# Entrée dans le ring si l'utilisateur n'était pas actif (même transaction que le RPUSH)
+ACTIVATE_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+# Sortie du ring si la file est vide: vérification et retrait atomiques,
+# une soumission concurrente ne peut pas laisser un job sans utilisateur actif
+DEACTIVATE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('LREM', KEYS[2], 0, ARGV[1])
+redis.call('SREM', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+return 1
+"""
+
+@dataclass(frozen=True)
+class TierPolicy:
+    """Poids DRR et plafonds de concurrence d'un tier"""
+    weight: int
+    max_running_per_user: int
+    max_running_total: int
+
+TIER_POLICIES: Dict[str, TierPolicy] = {
+    'free': TierPolicy(weight=1, max_running_per_user=1, max_running_total=20),
+    'pro': TierPolicy(weight=3, max_running_per_user=4, max_running_total=60),
+    'enterprise': TierPolicy(weight=6, max_running_per_user=10, max_running_total=200),
+}
+
+DEFAULT_TIER = 'free'
+
+_activate = redis_conn.register_script(ACTIVATE_SCRIPT)
+_deactivate = redis_conn.register_script(DEACTIVATE_SCRIPT)
+
+# kind -> fonction d'enqueue RQ (enregistrées par job_service)
+_handlers: Dict[str, Callable[..., Any]] = {}
+
+def register_handler(kind: str, handler: Callable[..., Any]):
+    """
+    Enregistre la fonction qui enqueue un type de job dans RQ
+
+    Le handler reçoit les params soumis plus `meta` (à passer à l'enqueue).
+    """
+    _handlers[kind] = handler
+
+def get_tier_policy(tier: Optional[str]) -> TierPolicy:
+    return TIER_POLICIES.get(tier or DEFAULT_TIER, TIER_POLICIES[DEFAULT_TIER])
+
+def submit(
+    kind: str,
+    job_id: str,
+    user_id: str,
+    queue: str,
+    params: Dict[str, Any],
+    tier: Optional[str] = None
+):
+    """
+    Met un job en attente dans la file de l'utilisateur
+
+    Args:
+        kind: Type de job (handler enregistré)
+        job_id: Job ID
+        user_id: User ID
+        queue: Queue RQ de destination (limite de profondeur)
+        params: Arguments JSON du handler
+        tier: Tier de l'utilisateur (free, pro, enterprise)
+    """
+    submit_many([{
+        'kind': kind,
+        'job_id': job_id,
+        'user_id': user_id,
+        'queue': queue,
+        'params': params,
+        'tier': tier
+    }])
+
+def submit_many(entries: List[Dict[str, Any]]):
+    """
+    Met plusieurs jobs en attente en un seul pipeline Redis
+
+    Args:
+        entries: Dicts kind, job_id, user_id, queue, params, tier (voir submit)
+    """
+    now = time.time()
+
+    if not FAIRSHARE_ENABLED:
+        for entry in entries:
+            tier = entry.get('tier') if entry.get('tier') in TIER_POLICIES else DEFAULT_TIER
+            _handlers[entry['kind']](meta={'fairshare': {'tier': tier, 'submitted_at': now}}, **entry['params'])
+        return
+
+    pipe = redis_conn.pipeline()
+    activated = set()
+    for entry in entries:
+        user_id = entry['user_id']
+        tier = entry.get('tier') if entry.get('tier') in TIER_POLICIES else DEFAULT_TIER
+        payload = json.dumps({
+            'kind': entry['kind'],
+            'job_id': entry['job_id'],
+            'queue': entry['queue'],
+            'tier': tier,
+            'submitted_at': now,
+            'params': entry['params']
+        })
+
+        pipe.rpush(PENDING_KEY.format(user_id=user_id), payload)
+        pipe.hset(USER_TIER_KEY, user_id, tier)
+        if user_id not in activated:
+            activated.add(user_id)
+            _activate(keys=[ACTIVE_KEY, RING_KEY], args=[user_id], client=pipe)
+        index_job(entry['job_id'], pipeline=pipe, queue='fairshare', state='pending', user_id=user_id)
+    pipe.execute()
+
+def _running_count(key: str, now: float) -> int:
+    redis_conn.zremrangebyscore(key, 0, now - RUNNING_TTL)
+    return redis_conn.zcard(key)
+
+def _queue_has_room(queue_name: str) -> bool:
+    queue = ALL_QUEUES.get(queue_name)
+    return queue is None or redis_conn.llen(queue.key) < FAIRSHARE_QUEUE_DEPTH
+
+def _dispatch_one(user_id: str, payload: Dict[str, Any], now: float):
+    """Enqueue RQ + comptage en cours"""
+    handler = _handlers[payload['kind']]
+    meta = {'fairshare': {'tier': payload['tier'], 'submitted_at': payload['submitted_at']}}
+    handler(meta=meta, **payload['params'])
+
+    pipe = redis_conn.pipeline()
+    pipe.zadd(RUNNING_KEY.format(user_id=user_id), {payload['job_id']: now})
+    pipe.zadd(TIER_RUNNING_KEY.format(tier=payload['tier']), {payload['job_id']: now})
+    pipe.hset(JOB_USER_KEY, payload['job_id'], json.dumps([user_id, payload['tier']]))
+    pipe.execute()
+
+def _serve_user(user_id: str, now: float) -> int:
+    """Tour DRR d'un utilisateur: nombre de jobs dispatchés"""
+    tier = (redis_conn.hget(USER_TIER_KEY, user_id) or b'').decode() or DEFAULT_TIER
+    policy = get_tier_policy(tier)
+    pending_key = PENDING_KEY.format(user_id=user_id)
+
+    deficit = float(redis_conn.hget(DEFICIT_KEY, user_id) or 0) + policy.weight
+    dispatched = 0
+
+    while deficit >= 1:
+        if _running_count(RUNNING_KEY.format(user_id=user_id), now) >= policy.max_running_per_user:
+            break
+        if _running_count(TIER_RUNNING_KEY.format(tier=tier), now) >= policy.max_running_total:
+            break
+
+        raw = redis_conn.lindex(pending_key, 0)
+        if raw is None:
+            break
+        payload = json.loads(raw)
+        if not _queue_has_room(payload['queue']):
+            break
+
+        redis_conn.lpop(pending_key)
+        try:
+            _dispatch_one(user_id, payload, now)
+        except Exception as e:
+            logger.error(f"Error dispatching job {payload['job_id']}: {e}")
+            redis_conn.lpush(pending_key, raw)
+            break
+
+        deficit -= 1
+        dispatched += 1
+
+    # File vide: sort du ring, déficit remis à zéro (DRR)
+    if not _deactivate(keys=[pending_key, RING_KEY, ACTIVE_KEY, DEFICIT_KEY], args=[user_id]):
+        redis_conn.hset(DEFICIT_KEY, user_id, min(deficit, policy.weight))
+        if dispatched:
+            # Servi: passe en fin de ring
+            redis_conn.lrem(RING_KEY, 1, user_id)
+            redis_conn.rpush(RING_KEY, user_id)
+
+    return dispatched
+
+def dispatch(max_rounds: int = 100) -> int:
+    """
+    Remplit les queues RQ depuis les files utilisateur
+
+    Returns:
+        Nombre de jobs dispatchés
+    """
+    if not FAIRSHARE_ENABLED:
+        return 0
+
+    lock = redis_conn.lock(LOCK_KEY, timeout=60, blocking_timeout=0)
+    if not lock.acquire(blocking=False):
+        return 0  # Un autre dispatcher tourne
+
+    total = 0
+    try:
+        for _ in range(max_rounds):
+            now = time.time()
+            ring = [user.decode() for user in redis_conn.lrange(RING_KEY, 0, -1)]
+            dispatched = sum(_serve_user(user_id, now) for user_id in ring)
+            total += dispatched
+            if not dispatched:
+                break
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+    return total
+
+def release_job(job_id: str):
+    """Libère le slot d'un job terminé (appelé sur état terminal)"""
+    if not FAIRSHARE_ENABLED:
+        return
+    try:
+        owner = redis_conn.hget(JOB_USER_KEY, job_id)
+        if not owner:
+            return
+        user_id, tier = json.loads(owner)
+
+        pipe = redis_conn.pipeline()
+        pipe.zrem(RUNNING_KEY.format(user_id=user_id), job_id)
+        pipe.zrem(TIER_RUNNING_KEY.format(tier=tier), job_id)
+        pipe.hdel(JOB_USER_KEY, job_id)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Error releasing fair-share slot for job {job_id}: {e}")
+
+def record_queue_wait(meta: Dict[str, Any]):
+    """Temps soumission → démarrage (appelé par le worker au démarrage du job)"""
+    fairshare = meta.get('fairshare')
+    if not fairshare:
+        return
+    try:
+        key = WAIT_KEY.format(tier=fairshare['tier'])
+        pipe = redis_conn.pipeline()
+        pipe.lpush(key, round(time.time() - fairshare['submitted_at'], 3))
+        pipe.ltrim(key, 0, WAIT_SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Error recording queue wait: {e}")
+
+def _percentile(values: List[float], pct: float) -> float:
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[index]
+
+def get_wait_percentiles() -> Dict[str, Dict[str, Any]]:
+    """
+    Percentiles du temps d'attente par tier (derniers WAIT_SAMPLES jobs)
+
+    Returns:
+        Dict tier -> {samples, p50, p90, p99, pending_users}
+    """
+    tiers = list(TIER_POLICIES)
+    pipe = redis_conn.pipeline()
+    for tier in tiers:
+        pipe.lrange(WAIT_KEY.format(tier=tier), 0, -1)
+    pipe.hgetall(USER_TIER_KEY)
+    pipe.smembers(ACTIVE_KEY)
+    *samples, user_tiers, active = pipe.execute()
+
+    pending_users = {tier: 0 for tier in tiers}
+    for user_id in active:
+        tier = (user_tiers.get(user_id) or b'').decode() or DEFAULT_TIER
+        pending_users[tier] = pending_users.get(tier, 0) + 1
+
+    stats = {}
+    for tier, raw in zip(tiers, samples):
+        values = sorted(float(v) for v in raw)
+        stats[tier] = {
+            'samples': len(values),
+            'p50': _percentile(values, 50) if values else None,
+            'p90': _percentile(values, 90) if values else None,
+            'p99': _percentile(values, 99) if values else None,
+            'pending_users': pending_users.get(tier, 0)
+        }
+    return stats
+
+def run_dispatcher(interval: float = DISPATCH_INTERVAL):
+    """Boucle de dispatch (systemd/fairshare-dispatcher.service)"""
+    # Import pour ses effets: job_service enregistre les handlers (register_handler)
+    import job_service  # noqa: F401
+
+    logger.info("Fair-share dispatcher started")
+    while True:
+        try:
+            dispatched = dispatch()
+            if dispatched:
+                logger.info(f"Dispatched {dispatched} jobs")
+        except Exception as e:
+            logger.error(f"Dispatcher error: {e}")
+        time.sleep(interval)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    run_dispatcher()
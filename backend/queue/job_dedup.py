@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Job Deduplication
+Dédoublonnage des soumissions par hash du contenu d'entrée + type + config
+
+Un doublon d'un job en cours s'y rattache (ligne suiveuse mise à jour à la
+fin du job d'origine), un doublon d'un job terminé reprend ses sorties.
+Chaque soumission garde sa propre ligne processing_jobs (contrôle d'accès
+par utilisateur inchangé), avec `deduplicated_from` dans metadata.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from job_models import JobStatus
+from rq_config import redis_conn
+from direct_upload import declared_content_hash, is_r2_source
+
+logger = logging.getLogger(__name__)
+
+JOB_DEDUP_ENABLED = os.getenv('JOB_DEDUP_ENABLED', 'true').lower() == 'true'
+JOB_DEDUP_TTL = int(os.getenv('JOB_DEDUP_TTL', 7 * 24 * 3600))
+
+DEDUP_KEY = "job_dedup:{dedup_key}"
+FOLLOWERS_KEY = "job_dedup_followers:{job_id}"
+
+# Sorties en metadata recopiées sur les doublons (en plus de output_url)
+OUTPUT_METADATA_KEYS = ('output_urls', 'artifacts', 'analysis')
+
+# États d'un job d'origine auquel un doublon peut se rattacher
+IN_FLIGHT_STATUSES = {
+    JobStatus.PENDING.value,
+    JobStatus.QUEUED.value,
+    JobStatus.PROCESSING.value,
+    JobStatus.RETRYING.value
+}
+
+def input_content_hash(path: Optional[str], chunk_size: int = 1024 * 1024) -> Optional[str]:
+    """
+    SHA-256 d'un fichier d'entrée local ou d'une vidéo uploadée dans R2
+
+    Returns:
+        Hash hexadécimal, None si l'entrée n'est ni un fichier local ni un
+        upload direct avec SHA-256 annoncé (URL...)
+    """
+    if is_r2_source(path):
+        return declared_content_hash(path)
+    if not path or not os.path.isfile(path):
+        return None
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def output_metadata(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Sorties d'un job terminé stockées dans metadata"""
+    metadata = job.get('metadata') or {}
+    return {key: metadata[key] for key in OUTPUT_METADATA_KEYS if key in metadata}
+
+def compute_dedup_key(job_type: str, content_hash: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Clé de dédoublonnage: type + contenu + config canonique"""
+    config_json = json.dumps(config or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{job_type}:{content_hash}:{config_json}".encode()).hexdigest()
+
+def claim(dedup_key: str, job_id: str) -> Optional[str]:
+    """
+    Réserve la clé pour un nouveau job (SET NX)
+
+    Returns:
+        None si réservée pour job_id, sinon le job_id déjà enregistré
+    """
+    key = DEDUP_KEY.format(dedup_key=dedup_key)
+    if redis_conn.set(key, job_id, nx=True, ex=JOB_DEDUP_TTL):
+        return None
+
+    existing = redis_conn.get(key)
+    return existing.decode() if existing else None
+
+def replace(dedup_key: str, job_id: str):
+    """Enregistre job_id pour la clé (job d'origine échoué ou disparu)"""
+    redis_conn.set(DEDUP_KEY.format(dedup_key=dedup_key), job_id, ex=JOB_DEDUP_TTL)
+
+def claim_many(claims: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """
+    claim() pour un lot de (dedup_key, job_id), en un pipeline
+
+    Une clé répétée dans le lot retourne le job_id de sa première occurrence.
+
+    Returns:
+        Par élément: None si réservée pour son job_id, sinon le job_id déjà enregistré
+    """
+    pipe = redis_conn.pipeline(transaction=False)
+    for dedup_key, job_id in claims:
+        key = DEDUP_KEY.format(dedup_key=dedup_key)
+        pipe.set(key, job_id, nx=True, ex=JOB_DEDUP_TTL)
+        pipe.get(key)
+    results = pipe.execute()
+
+    return [
+        None if claimed or not existing else existing.decode()
+        for claimed, existing in zip(results[::2], results[1::2])
+    ]
+
+def replace_many(replacements: List[Tuple[str, str]]):
+    """replace() pour un lot de (dedup_key, job_id), en un pipeline"""
+    pipe = redis_conn.pipeline(transaction=False)
+    for dedup_key, job_id in replacements:
+        pipe.set(DEDUP_KEY.format(dedup_key=dedup_key), job_id, ex=JOB_DEDUP_TTL)
+    pipe.execute()
+
+def attach_follower(original_job_id: str, job_id: str):
+    """Rattache un doublon à un job en cours"""
+    key = FOLLOWERS_KEY.format(job_id=original_job_id)
+    pipe = redis_conn.pipeline()
+    pipe.sadd(key, job_id)
+    pipe.expire(key, JOB_DEDUP_TTL)
+    pipe.execute()
+
+def propagate_to_followers(
+    job_id: str,
+    status: JobStatus,
+    error_message: Optional[str] = None,
+    output_url: Optional[str] = None
+):
+    """Reporte l'état final du job d'origine (après ses retries RQ) sur ses doublons"""
+    if not JOB_DEDUP_ENABLED:
+        return
+    try:
+        followers = redis_conn.smembers(FOLLOWERS_KEY.format(job_id=job_id))
+    except Exception as e:
+        logger.warning(f"Error reading dedup followers of job {job_id}: {e}")
+        return
+    if not followers:
+        return
+
+    from job_tracker import get_job, update_job_status, update_job_metadata
+
+    outputs = {}
+    if status == JobStatus.COMPLETED:
+        original = get_job(job_id)
+        outputs = output_metadata(original) if original else {}
+
+    for follower in followers:
+        follower_id = follower.decode()
+        if outputs:
+            update_job_metadata(follower_id, outputs)
+        update_job_status(
+            follower_id,
+            status,
+            progress=100 if status == JobStatus.COMPLETED else None,
+            error_message=error_message,
+            output_url=output_url
+        )
+
+    redis_conn.delete(FOLLOWERS_KEY.format(job_id=job_id))
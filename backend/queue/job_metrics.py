@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Job Resource Metrics
+Comptabilité des ressources par job et par étape (table job_metrics)
+
+Chaque étape mesure temps réel, CPU (processus + enfants attendus: COLMAP,
+Blender, ns-train via RUSAGE_CHILDREN), pic RSS, disque scratch et octets
+uploadés. RQ exécute chaque job dans un work horse forké: les compteurs
+getrusage du horse ne couvrent que le job en cours.
+
+Usage (chronomètre à tours):
+    metrics = JobMetrics(job_id, JobType.MESH_OPTIMIZATION.value, workspace)
+    ...
+    metrics.lap('lod_high')
+    metrics.add_uploaded(len(data))
+    ...
+    metrics.finish(JobStatus.COMPLETED)
+"""
+
+import os
+import time
+import socket
+import logging
+import resource
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Union
+
+from psycopg2.extras import execute_values
+
+from job_models import JobStatus
+from db_pool import db_cursor
+
+logger = logging.getLogger(__name__)
+
+JOB_METRICS_ENABLED = os.getenv('JOB_METRICS_ENABLED', 'true').lower() == 'true'
+
+# ru_maxrss est en kilo-octets sous Linux
+RSS_UNIT_BYTES = 1024
+
+@dataclass
+class StageMetrics:
+    """Ressources consommées par une étape"""
+    stage: str
+    wall_seconds: float
+    cpu_seconds: float
+    child_cpu_seconds: float
+    peak_rss_bytes: int
+    child_peak_rss_bytes: int
+    scratch_bytes: int
+    uploaded_bytes: int
+
+    @property
+    def total_cpu_seconds(self) -> float:
+        return self.cpu_seconds + self.child_cpu_seconds
+
+def directory_size(path: Optional[Union[str, Path]]) -> int:
+    """Taille totale des fichiers sous path (0 si absent)"""
+    if not path:
+        return 0
+
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+def _cpu(usage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+class JobMetrics:
+    """Mesure les ressources d'un job étape par étape"""
+
+    def __init__(self, job_id: str, job_type: str, workspace: Optional[Union[str, Path]] = None):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.workspace = workspace
+        self.stages: List[StageMetrics] = []
+        self.worker = self._worker_name()
+        self._uploaded = 0
+        self._finished = False
+        self._mark()
+
+    @staticmethod
+    def _worker_name() -> str:
+        try:
+            from rq import get_current_job
+            job = get_current_job()
+            if job and job.worker_name:
+                return job.worker_name
+        except Exception:
+            pass
+        return f"{socket.gethostname()}.{os.getpid()}"
+
+    def _mark(self):
+        self._wall = time.monotonic()
+        self._self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def add_uploaded(self, nbytes: int):
+        """Ajoute des octets uploadés à l'étape en cours"""
+        self._uploaded += nbytes
+
+    def lap(self, stage: str) -> StageMetrics:
+        """
+        Clôt l'étape en cours (depuis le tour précédent) sous le nom stage
+
+        Returns:
+            Mesures de l'étape
+        """
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        metrics = StageMetrics(
+            stage=stage,
+            wall_seconds=time.monotonic() - self._wall,
+            cpu_seconds=_cpu(self_usage) - _cpu(self._self_usage),
+            child_cpu_seconds=_cpu(child_usage) - _cpu(self._child_usage),
+            # Pics cumulés du processus (high-water mark, pas un delta)
+            peak_rss_bytes=self_usage.ru_maxrss * RSS_UNIT_BYTES,
+            child_peak_rss_bytes=child_usage.ru_maxrss * RSS_UNIT_BYTES,
+            scratch_bytes=directory_size(self.workspace),
+            uploaded_bytes=self._uploaded
+        )
+        self.stages.append(metrics)
+        self._uploaded = 0
+        self._mark()
+        return metrics
+
+    def finish(self, status: JobStatus, final: bool = True):
+        """
+        Enregistre les étapes dans job_metrics et alimente Prometheus
+
+        Le temps écoulé depuis le dernier tour est enregistré comme étape
+        'other' (ou 'failed' en cas d'échec). Ne lève jamais d'exception.
+
+        Args:
+            status: Statut du job à la fin de ce processus
+            final: False pour une étape intermédiaire d'un job multi-étapes;
+                les totaux Prometheus sont publiés par la dernière étape
+        """
+        if not JOB_METRICS_ENABLED or self._finished:
+            return
+        self._finished = True
+
+        try:
+            residual = self.lap('failed' if status == JobStatus.FAILED else 'other')
+            # Reliquat négligeable après le dernier tour: pas de ligne
+            if residual.stage == 'other' and residual.wall_seconds < 1 and not residual.uploaded_bytes:
+                self.stages.pop()
+            record_stage_metrics(self.job_id, self.job_type, self.worker, status.value, self.stages)
+        except Exception as e:
+            logger.error(f"Error recording metrics for job {self.job_id}: {e}")
+
+        try:
+            observe_stages(self.job_type, self.stages)
+            if final:
+                totals = get_job_totals(self.job_id) or summarize(self.stages)
+                observe_job(self.job_type, status.value, totals)
+        except Exception as e:
+            logger.warning(f"Error publishing metrics for job {self.job_id}: {e}")
+
+def summarize(stages: List[StageMetrics]) -> Dict[str, Any]:
+    """Totaux d'un job à partir de ses étapes"""
+    return {
+        'wall_seconds': sum(s.wall_seconds for s in stages),
+        'cpu_seconds': sum(s.total_cpu_seconds for s in stages),
+        'peak_rss_bytes': max((max(s.peak_rss_bytes, s.child_peak_rss_bytes) for s in stages), default=0),
+        'scratch_bytes': max((s.scratch_bytes for s in stages), default=0),
+        'uploaded_bytes': sum(s.uploaded_bytes for s in stages)
+    }
+
+def record_stage_metrics(job_id: str, job_type: str, worker: str, status: str, stages: List[StageMetrics]):
+    """Insère les étapes d'un job (un INSERT multi-lignes)"""
+    if not stages:
+        return
+
+    rows = [
+        (
+            job_id, job_type, s.stage, worker, status,
+            s.wall_seconds, s.cpu_seconds, s.child_cpu_seconds,
+            s.peak_rss_bytes, s.child_peak_rss_bytes, s.scratch_bytes, s.uploaded_bytes
+        )
+        for s in stages
+    ]
+
+    with db_cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO job_metrics (
+                job_id, job_type, stage, worker, status,
+                wall_seconds, cpu_seconds, child_cpu_seconds,
+                peak_rss_bytes, child_peak_rss_bytes, scratch_bytes, uploaded_bytes
+            ) VALUES %s
+        """, rows, page_size=len(rows))
+
+def get_job_totals(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Totaux d'un job sur toutes ses lignes (étapes exécutées par plusieurs
+    work horses, retries compris)
+    """
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    SUM(wall_seconds),
+                    SUM(cpu_seconds + child_cpu_seconds),
+                    MAX(GREATEST(peak_rss_bytes, child_peak_rss_bytes)),
+                    MAX(scratch_bytes),
+                    SUM(uploaded_bytes)
+                FROM job_metrics
+                WHERE job_id = %s
+            """, (job_id,))
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.warning(f"Error reading metrics totals for job {job_id}: {e}")
+        return None
+
+    if not row or row[0] is None:
+        return None
+
+    return {
+        'wall_seconds': float(row[0]),
+        'cpu_seconds': float(row[1] or 0),
+        'peak_rss_bytes': int(row[2] or 0),
+        'scratch_bytes': int(row[3] or 0),
+        'uploaded_bytes': int(row[4] or 0)
+    }
+
+def get_job_metrics(job_id: str) -> List[Dict[str, Any]]:
+    """Lignes job_metrics d'un job, dans l'ordre d'exécution"""
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT stage, worker, status, wall_seconds, cpu_seconds, child_cpu_seconds,
+                       peak_rss_bytes, child_peak_rss_bytes, scratch_bytes, uploaded_bytes, created_at
+                FROM job_metrics
+                WHERE job_id = %s
+                ORDER BY id
+            """, (job_id,))
+            columns = [desc[0] for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting metrics for job {job_id}: {e}")
+        return []
+
+def observe_stages(job_type: str, stages: List[StageMetrics]):
+    """Histogrammes Prometheus par étape"""
+    try:
+        from monitoring.api_metrics import track_job_stage
+    except ImportError:
+        return
+
+    for s in stages:
+        track_job_stage(job_type, s.stage, s.wall_seconds, s.total_cpu_seconds)
+
+def observe_job(job_type: str, status: str, totals: Dict[str, Any]):
+    """Histogrammes Prometheus par job (track_processing_job)"""
+    try:
+        from monitoring.api_metrics import track_processing_job
+    except ImportError:
+        return
+
+    track_processing_job(
+        job_type,
+        status,
+        totals['wall_seconds'],
+        cpu_seconds=totals['cpu_seconds'],
+        peak_rss_bytes=totals['peak_rss_bytes'],
+        scratch_bytes=totals['scratch_bytes'],
+        uploaded_bytes=totals['uploaded_bytes']
+    )
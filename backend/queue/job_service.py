@@ -6,12 +6,21 @@ Service principal pour soumettre et gérer les jobs
 
 import os
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from job_models import ProcessingJob, JobType, JobStatus, JobPriority
-from job_tracker import create_job, get_job as get_job_db
-from rq_config import get_queue
+from job_tracker import create_job, create_jobs, update_job_status, update_job_metadata, get_job as get_job_db, get_jobs as get_jobs_db
+from progress_reporter import get_cached_progress
+from rq_config import get_queue, get_resource_queue, enqueue_job
+from job_stages import enqueue_photogrammetry_stages, MESH_OPTIMIZATION_STAGE, PHOTOGRAMMETRY_STAGES
+from direct_upload import check_video_access, upload_content_hash
+from job_dedup import (
+    JOB_DEDUP_ENABLED, IN_FLIGHT_STATUSES, input_content_hash, compute_dedup_key,
+    claim, claim_many, replace, replace_many, attach_follower, output_metadata
+)
 from rq import Retry
+import fair_scheduler
+import logging
 from webhooks import trigger_webhook, WebhookEvent
 
 # Import workers
@@ -20,13 +29,23 @@ from workers.gaussian_worker import process_gaussian_splatting_job
 from workers.ai_worker import process_ai_vision_job, process_ai_generation_job
 from workers.mesh_worker import process_mesh_optimization_job
 
+# Photogrammétrie découpée en étapes par classe de ressources: les étapes
+# partagent le workspace (état, frames) et exigent un SCRATCH_ROOT et un
+# FRAME_CACHE_DIR partagés par tous les workers. Désactivé par défaut.
+PHOTOGRAMMETRY_STAGED = os.getenv('PHOTOGRAMMETRY_STAGED', 'false').lower() == 'true'
+
+logger = logging.getLogger(__name__)
+
 def submit_photogrammetry_job(
     user_id: str,
     video_path: str,
     asset_id: Optional[str] = None,
-    priority: JobPriority = JobPriority.DEFAULT
+    priority: JobPriority = JobPriority.DEFAULT,
+    quality: Optional[str] = None,
+    tier: Optional[str] = None,
+    content_hash: Optional[str] = None
 ) -> str:
-    """Submit photogrammetry job"""
+    """Submit photogrammetry job (quality: tier de résolution draft/standard/high, tier: offre utilisateur)"""
     job_id = str(uuid.uuid4())
     
     # Create job in database
@@ -37,21 +56,27 @@ def submit_photogrammetry_job(
         asset_id=asset_id,
         input_url=video_path,
         status=JobStatus.PENDING,
-        priority=priority
+        priority=priority,
+        metadata={'quality': quality} if quality else None
     )
     
+    # Même vidéo, même qualité: rattaché au job existant
+    duplicate = _find_duplicate(job, video_path, {'quality': quality}, content_hash)
+    if duplicate:
+        return _create_duplicate(job, duplicate)
+    
     create_job(job)
     
-    # Queue job
-    queue = get_queue(priority.value)
-    queue.enqueue(
-        process_photogrammetry_job,
+    # Queue job (file fair-share de l'utilisateur)
+    _submit(
+        'photogrammetry',
         job_id,
-        video_path,
         user_id,
-        job_id=job_id,
-        retry=Retry(max=3, interval=[60, 120, 300]),
-        timeout=3600  # 1 hour
+        PHOTOGRAMMETRY_STAGES[0].resource_class if PHOTOGRAMMETRY_STAGED else priority.value,
+        tier,
+        video_path=video_path,
+        quality=quality,
+        priority=priority.value
     )
     
     # Trigger webhook
@@ -68,7 +93,8 @@ def submit_gaussian_splatting_job(
     video_path: str,
     config: Dict[str, Any],
     asset_id: Optional[str] = None,
-    priority: JobPriority = JobPriority.LOW  # Gaussian Splatting prend du temps
+    priority: JobPriority = JobPriority.LOW,  # Gaussian Splatting prend du temps
+    tier: Optional[str] = None
 ) -> str:
     """Submit Gaussian Splatting job"""
     job_id = str(uuid.uuid4())
@@ -86,17 +112,8 @@ def submit_gaussian_splatting_job(
     
     create_job(job)
     
-    queue = get_queue(priority.value)
-    queue.enqueue(
-        process_gaussian_splatting_job,
-        job_id,
-        video_path,
-        user_id,
-        config,
-        job_id=job_id,
-        retry=Retry(max=2, interval=[300, 600]),
-        timeout=7200  # 2 hours
-    )
+    _submit('gaussian_splatting', job_id, user_id, priority.value, tier,
+            video_path=video_path, config=config, priority=priority.value)
     
     return job_id
 
@@ -104,7 +121,9 @@ def submit_ai_vision_job(
     user_id: str,
     image_path: str,
     prompt: str,
-    priority: JobPriority = JobPriority.HIGH  # AI vision est rapide
+    priority: JobPriority = JobPriority.HIGH,  # AI vision est rapide
+    tier: Optional[str] = None,
+    content_hash: Optional[str] = None
 ) -> str:
     """Submit AI vision job"""
     job_id = str(uuid.uuid4())
@@ -119,19 +138,14 @@ def submit_ai_vision_job(
         metadata={'prompt': prompt}
     )
     
+    duplicate = _find_duplicate(job, image_path, {'prompt': prompt}, content_hash)
+    if duplicate:
+        return _create_duplicate(job, duplicate)
+    
     create_job(job)
     
-    queue = get_queue(priority.value)
-    queue.enqueue(
-        process_ai_vision_job,
-        job_id,
-        image_path,
-        prompt,
-        user_id,
-        job_id=job_id,
-        retry=Retry(max=2, interval=[10, 30]),
-        timeout=180  # 3 minutes
-    )
+    _submit('ai_vision', job_id, user_id, priority.value, tier,
+            image_path=image_path, prompt=prompt, priority=priority.value)
     
     return job_id
 
@@ -140,7 +154,8 @@ def submit_ai_generation_job(
     generation_type: str,
     prompt: str,
     config: Dict[str, Any],
-    priority: JobPriority = JobPriority.DEFAULT
+    priority: JobPriority = JobPriority.DEFAULT,
+    tier: Optional[str] = None
 ) -> str:
     """Submit AI generation job"""
     job_id = str(uuid.uuid4())
@@ -156,18 +171,9 @@ def submit_ai_generation_job(
     
     create_job(job)
     
-    queue = get_queue(priority.value)
-    queue.enqueue(
-        process_ai_generation_job,
-        job_id,
-        generation_type,
-        prompt,
-        user_id,
-        config,
-        job_id=job_id,
-        retry=Retry(max=2, interval=[30, 60]),
-        timeout=600  # 10 minutes
-    )
+    _submit('ai_generation', job_id, user_id, priority.value, tier,
+            generation_type=generation_type, prompt=prompt, config=config,
+            priority=priority.value)
     
     return job_id
 
@@ -176,7 +182,9 @@ def submit_mesh_optimization_job(
     mesh_path: str,
     asset_id: Optional[str] = None,
     lod_levels: list = ['high', 'medium', 'low'],
-    priority: JobPriority = JobPriority.DEFAULT
+    priority: JobPriority = JobPriority.DEFAULT,
+    tier: Optional[str] = None,
+    content_hash: Optional[str] = None
 ) -> str:
     """Submit mesh optimization job"""
     job_id = str(uuid.uuid4())
@@ -192,23 +200,442 @@ def submit_mesh_optimization_job(
         metadata={'lod_levels': lod_levels}
     )
     
+    duplicate = _find_duplicate(job, mesh_path, {'lod_levels': lod_levels}, content_hash)
+    if duplicate:
+        return _create_duplicate(job, duplicate)
+    
     create_job(job)
     
-    queue = get_queue(priority.value)
-    queue.enqueue(
+    # Blender (bpy): queue dédiée
+    _submit('mesh_optimization', job_id, user_id, MESH_OPTIMIZATION_STAGE.resource_class, tier,
+            mesh_path=mesh_path, lod_levels=lod_levels, priority=priority.value)
+    
+    return job_id
+
+def _find_duplicate(
+    job: ProcessingJob,
+    input_path: Optional[str],
+    config: Dict[str, Any],
+    content_hash: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Cherche un job identique (même contenu d'entrée, type et config)
+    
+    Args:
+        job: Nouveau job (pas encore créé)
+        input_path: Entrée du job, hashée si content_hash est inconnu
+        config: Paramètres qui changent le résultat
+        content_hash: SHA-256 déjà calculé à l'ingest (évite de relire l'entrée)
+    
+    Returns:
+        Ligne du job d'origine (en cours ou terminé), None si le job doit tourner
+    """
+    if not JOB_DEDUP_ENABLED:
+        return None
+    
+    content_hash = content_hash or input_content_hash(input_path)
+    if not content_hash:
+        return None
+    
+    dedup_key = compute_dedup_key(job.job_type.value, content_hash, config)
+    try:
+        original_id = claim(dedup_key, job.job_id)
+        if original_id is None:
+            return None
+        
+        original = get_job_db(original_id)
+        if _is_reusable(original):
+            return original
+        
+        # Job d'origine échoué, annulé ou expiré: ce job le remplace
+        replace(dedup_key, job.job_id)
+    except Exception as e:
+        logger.warning(f"Job deduplication unavailable: {e}")
+    
+    return None
+
+def _find_duplicates(
+    candidates: List[Tuple[ProcessingJob, Optional[str], Dict[str, Any], Optional[str]]]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    _find_duplicate pour un lot: réservations en un pipeline Redis, jobs
+    d'origine lus en une requête
+    
+    Seules les entrées sans hash connu sont hashées. Une entrée répétée dans
+    le lot suit le premier job du lot qui la porte.
+    
+    Args:
+        candidates: (job, entrée, config, hash connu) par élément dédoublonnable
+    
+    Returns:
+        job_id -> ligne du job d'origine, pour les doublons seulement
+    """
+    if not JOB_DEDUP_ENABLED:
+        return {}
+    
+    keyed = []
+    for job, input_path, config, content_hash in candidates:
+        content_hash = content_hash or input_content_hash(input_path)
+        if content_hash:
+            keyed.append((job, compute_dedup_key(job.job_type.value, content_hash, config)))
+    if not keyed:
+        return {}
+    
+    duplicates: Dict[str, Dict[str, Any]] = {}
+    try:
+        claimed = claim_many([(dedup_key, job.job_id) for job, dedup_key in keyed])
+        batch_ids = {job.job_id for job, _ in keyed}
+        originals = get_jobs_db([job_id for job_id in set(claimed) if job_id and job_id not in batch_ids])
+        
+        owners: Dict[str, str] = {}
+        replaced = []
+        for (job, dedup_key), original_id in zip(keyed, claimed):
+            if dedup_key in owners:
+                duplicates[job.job_id] = {'id': owners[dedup_key], 'status': JobStatus.QUEUED.value}
+            elif original_id is None:
+                owners[dedup_key] = job.job_id
+            elif _is_reusable(originals.get(original_id)):
+                duplicates[job.job_id] = originals[original_id]
+            else:
+                owners[dedup_key] = job.job_id
+                replaced.append((dedup_key, job.job_id))
+        
+        if replaced:
+            replace_many(replaced)
+    except Exception as e:
+        logger.warning(f"Job deduplication unavailable: {e}")
+    
+    return duplicates
+
+def _is_reusable(original: Optional[Dict[str, Any]]) -> bool:
+    """Job d'origine en cours ou terminé (un doublon peut s'y rattacher)"""
+    return bool(original) and (
+        original['status'] in IN_FLIGHT_STATUSES or original['status'] == JobStatus.COMPLETED.value
+    )
+
+def _apply_duplicate(job: ProcessingJob, original: Dict[str, Any]):
+    """Prépare la ligne du doublon avant INSERT: sorties recopiées ou en attente du job d'origine"""
+    job.metadata['deduplicated_from'] = str(original['id'])
+    
+    if original['status'] == JobStatus.COMPLETED.value:
+        job.status = JobStatus.COMPLETED
+        job.progress = 100
+        job.output_url = original.get('output_url')
+        job.metadata.update(output_metadata(original))
+    else:
+        job.status = JobStatus.QUEUED
+
+def _create_duplicate(job: ProcessingJob, original: Dict[str, Any]) -> str:
+    """Crée la ligne du doublon: sorties recopiées ou rattachée au job en cours"""
+    _apply_duplicate(job, original)
+    create_job(job)
+    if job.status == JobStatus.COMPLETED:
+        return job.job_id
+    
+    original_id = str(original['id'])
+    attach_follower(original_id, job.job_id)
+    
+    # Terminé entre la lecture et le rattachement: plus de propagation à attendre
+    original = get_job_db(original_id) or original
+    if original['status'] == JobStatus.COMPLETED.value:
+        outputs = output_metadata(original)
+        if outputs:
+            update_job_metadata(job.job_id, outputs)
+        update_job_status(job.job_id, JobStatus.COMPLETED, progress=100, output_url=original.get('output_url'))
+    return job.job_id
+
+def _submit(kind: str, job_id: str, user_id: str, queue: str, tier: Optional[str], **params):
+    """Met le job dans la file fair-share de l'utilisateur et tente un dispatch immédiat"""
+    params.update(job_id=job_id, user_id=user_id)
+    fair_scheduler.submit(kind, job_id, user_id, queue, params, tier=tier)
+    fair_scheduler.dispatch()
+
+# Enqueue RQ effectif, appelé par le dispatcher fair-share (params JSON + meta)
+
+def _enqueue_photogrammetry(job_id, user_id, video_path, quality, priority, meta):
+    priority = JobPriority(priority)
+    if PHOTOGRAMMETRY_STAGED:
+        enqueue_photogrammetry_stages(job_id, video_path, user_id, quality, priority, meta=meta)
+        return
+    
+    enqueue_job(
+        get_queue(priority.value),
+        process_photogrammetry_job,
+        job_id,
+        video_path,
+        user_id,
+        quality,
+        job_id=job_id,
+        retry=Retry(max=3, interval=[60, 120, 300]),
+        timeout=3600,  # 1 hour
+        meta=meta
+    )
+
+def _enqueue_gaussian_splatting(job_id, user_id, video_path, config, priority, meta):
+    enqueue_job(
+        get_queue(priority),
+        process_gaussian_splatting_job,
+        job_id,
+        video_path,
+        user_id,
+        config,
+        job_id=job_id,
+        retry=Retry(max=2, interval=[300, 600]),
+        timeout=7200,  # 2 hours
+        meta=meta
+    )
+
+def _enqueue_ai_vision(job_id, user_id, image_path, prompt, priority, meta):
+    enqueue_job(
+        get_queue(priority),
+        process_ai_vision_job,
+        job_id,
+        image_path,
+        prompt,
+        user_id,
+        job_id=job_id,
+        retry=Retry(max=2, interval=[10, 30]),
+        timeout=180,  # 3 minutes
+        meta=meta
+    )
+
+def _enqueue_ai_generation(job_id, user_id, generation_type, prompt, config, priority, meta):
+    enqueue_job(
+        get_queue(priority),
+        process_ai_generation_job,
+        job_id,
+        generation_type,
+        prompt,
+        user_id,
+        config,
+        job_id=job_id,
+        retry=Retry(max=2, interval=[30, 60]),
+        timeout=600,  # 10 minutes
+        meta=meta
+    )
+
+def _enqueue_mesh_optimization(job_id, user_id, mesh_path, lod_levels, priority, meta):
+    enqueue_job(
+        get_resource_queue(MESH_OPTIMIZATION_STAGE.resource_class),
         process_mesh_optimization_job,
         job_id,
         mesh_path,
         user_id,
         lod_levels,
         job_id=job_id,
+        at_front=priority == JobPriority.HIGH.value,
         retry=Retry(max=2, interval=[60, 120]),
-        timeout=1800  # 30 minutes
+        timeout=MESH_OPTIMIZATION_STAGE.timeout,
+        meta=meta
     )
+
+fair_scheduler.register_handler('photogrammetry', _enqueue_photogrammetry)
+fair_scheduler.register_handler('gaussian_splatting', _enqueue_gaussian_splatting)
+fair_scheduler.register_handler('ai_vision', _enqueue_ai_vision)
+fair_scheduler.register_handler('ai_generation', _enqueue_ai_generation)
+fair_scheduler.register_handler('mesh_optimization', _enqueue_mesh_optimization)
+
+# Soumission en lot
+BULK_MAX_JOBS = int(os.getenv('BULK_MAX_JOBS', 1000))
+
+# type (kind fair-share) -> (JobType, champ d'entrée requis)
+BULK_JOB_TYPES = {
+    'photogrammetry': (JobType.PHOTOGRAMMETRY, 'video_path'),
+    'gaussian_splatting': (JobType.GAUSSIAN_SPLATTING, 'video_path'),
+    'ai_vision': (JobType.AI_VISION, 'image_path'),
+    'ai_generation': (JobType.AI_GENERATION, 'prompt'),
+    'mesh_optimization': (JobType.MESH_OPTIMIZATION, 'mesh_path'),
+}
+
+BULK_DEFAULT_PRIORITIES = {
+    'gaussian_splatting': JobPriority.LOW,
+    'ai_vision': JobPriority.HIGH,
+}
+
+def _build_bulk_job(user_id: str, item: Dict[str, Any]) -> Tuple[ProcessingJob, Dict[str, Any], Optional[str], Dict[str, Any], Optional[str]]:
+    """
+    Job, entrée fair-share et clé de dédoublonnage d'un élément de lot
     
-    return job_id
+    Mêmes champs que les endpoints unitaires, plus `type` (et `sha256`
+    retourné par l'upload direct d'une vidéo).
+    
+    Returns:
+        (job, entrée fair_scheduler sans tier, chemin à hasher, config de
+        dédoublonnage, hash de contenu connu)
+    
+    Raises:
+        ValueError si l'élément est invalide
+    """
+    kind = item.get('type')
+    if kind not in BULK_JOB_TYPES:
+        raise ValueError(f"unknown job type: {kind}")
+    job_type, input_field = BULK_JOB_TYPES[kind]
+    if not item.get(input_field):
+        raise ValueError(f"{input_field} required")
+    if input_field == 'video_path' and not check_video_access(user_id, item['video_path']):
+        raise ValueError("video_path not accessible")
+    
+    priority = JobPriority(item.get('priority', BULK_DEFAULT_PRIORITIES.get(kind, JobPriority.DEFAULT)))
+    job_id = str(uuid.uuid4())
+    params: Dict[str, Any] = {'job_id': job_id, 'user_id': user_id, 'priority': priority.value}
+    queue = priority.value
+    dedup_path = None
+    dedup_config: Dict[str, Any] = {}
+    content_hash = None
+    
+    if kind == 'photogrammetry':
+        quality = item.get('quality')
+        params.update(video_path=item['video_path'], quality=quality)
+        metadata = {'quality': quality} if quality else None
+        if PHOTOGRAMMETRY_STAGED:
+            queue = PHOTOGRAMMETRY_STAGES[0].resource_class
+        dedup_path, dedup_config = item['video_path'], {'quality': quality}
+        content_hash = upload_content_hash(user_id, item['video_path'], item.get('sha256'))
+    elif kind == 'gaussian_splatting':
+        config = item.get('config', {})
+        params.update(video_path=item['video_path'], config=config)
+        metadata = config
+    elif kind == 'ai_vision':
+        prompt = item.get('prompt', 'Describe this image')
+        params.update(image_path=item['image_path'], prompt=prompt)
+        metadata = {'prompt': prompt}
+        dedup_path, dedup_config = item['image_path'], {'prompt': prompt}
+    elif kind == 'ai_generation':
+        if not item.get('generation_type'):
+            raise ValueError("generation_type required")
+        config = item.get('config', {})
+        params.update(generation_type=item['generation_type'], prompt=item['prompt'], config=config)
+        metadata = {'type': item['generation_type'], 'prompt': item['prompt'], **config}
+    else:
+        lod_levels = item.get('lod_levels', ['high', 'medium', 'low'])
+        params.update(mesh_path=item['mesh_path'], lod_levels=lod_levels)
+        metadata = {'lod_levels': lod_levels}
+        queue = MESH_OPTIMIZATION_STAGE.resource_class
+        dedup_path, dedup_config = item['mesh_path'], {'lod_levels': lod_levels}
+    
+    job = ProcessingJob(
+        job_id=job_id,
+        job_type=job_type,
+        user_id=user_id,
+        asset_id=item.get('asset_id'),
+        input_url=item.get(input_field) if input_field != 'prompt' else None,
+        status=JobStatus.PENDING,
+        priority=priority,
+        metadata=metadata
+    )
+    entry = {'kind': kind, 'job_id': job_id, 'user_id': user_id, 'queue': queue, 'params': params}
+    return job, entry, dedup_path, dedup_config, content_hash
+
+def submit_jobs_bulk(
+    user_id: str,
+    items: List[Dict[str, Any]],
+    tier: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Soumet un lot de jobs: un INSERT multi-lignes, un pipeline Redis
+    
+    Échecs partiels:
+    - un élément invalide est rejeté seul (`error`), les autres sont soumis;
+    - l'INSERT est une transaction unique: s'il échoue, aucun job du lot n'est
+      créé ni mis en file;
+    - si la mise en file échoue après l'INSERT, les jobs créés passent FAILED
+      et sont retournés en erreur (pas de job orphelin en pending).
+    
+    Args:
+        user_id: User ID
+        items: Éléments `{type, ...champs de l'endpoint unitaire}`
+        tier: Tier fair-share de l'utilisateur
+    
+    Returns:
+        Un résultat par élément, dans l'ordre: {index, job_id, status, deduplicated_from} ou {index, error}
+    """
+    if len(items) > BULK_MAX_JOBS:
+        raise ValueError(f"Batch too large ({len(items)} > {BULK_MAX_JOBS})")
+    
+    results: List[Dict[str, Any]] = []
+    jobs: List[ProcessingJob] = []
+    entries: List[Dict[str, Any]] = []
+    followers: List[Tuple[str, str]] = []
+    
+    built: List[Tuple[int, ProcessingJob, Dict[str, Any]]] = []
+    candidates = []
+    for index, item in enumerate(items):
+        try:
+            job, entry, dedup_path, dedup_config, content_hash = _build_bulk_job(user_id, item)
+        except (ValueError, TypeError, AttributeError) as e:
+            results.append({'index': index, 'error': str(e)})
+            continue
+        built.append((index, job, entry))
+        if dedup_path:
+            candidates.append((job, dedup_path, dedup_config, content_hash))
+    
+    duplicates = _find_duplicates(candidates)
+    
+    for index, job, entry in built:
+        duplicate = duplicates.get(job.job_id)
+        if duplicate:
+            _apply_duplicate(job, duplicate)
+            if job.status != JobStatus.COMPLETED:
+                followers.append((str(duplicate['id']), job.job_id))
+        else:
+            entry['tier'] = tier
+            entries.append(entry)
+        
+        jobs.append(job)
+        results.append({
+            'index': index,
+            'job_id': job.job_id,
+            'status': 'completed' if job.status == JobStatus.COMPLETED else 'queued',
+            'deduplicated_from': job.metadata.get('deduplicated_from')
+        })
+    results.sort(key=lambda result: result['index'])
+    
+    submitted = {job.job_id for job in jobs}
+    
+    if not create_jobs(jobs):
+        return [
+            {'index': r['index'], 'error': 'database error'} if r.get('job_id') in submitted else r
+            for r in results
+        ]
+    
+    try:
+        fair_scheduler.submit_many(entries)
+        for original_id, job_id in followers:
+            attach_follower(original_id, job_id)
+    except Exception as e:
+        logger.error(f"Error enqueueing batch of {len(entries)} jobs: {e}")
+        failed = {entry['job_id'] for entry in entries} | {job_id for _, job_id in followers}
+        for job_id in failed:
+            update_job_status(job_id, JobStatus.FAILED, error_message='enqueue failed')
+        return [
+            {'index': r['index'], 'job_id': r['job_id'], 'error': 'enqueue failed'} if r.get('job_id') in failed else r
+            for r in results
+        ]
+    
+    try:
+        fair_scheduler.dispatch()
+    except Exception as e:
+        logger.warning(f"Dispatch after batch submit failed (dispatcher will retry): {e}")
+    
+    return results
 
 def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
-    """Get job status from database"""
-    return get_job_db(job_id)
+    """Get job status from database, with the latest progress published in Redis"""
+    job = get_job_db(job_id)
+    if job is None:
+        return None
+    
+    # Doublon en cours: progression du job d'origine
+    deduplicated_from = (job.get('metadata') or {}).get('deduplicated_from')
+    job['deduplicated_from'] = deduplicated_from
+    progress_job_id = job_id
+    if deduplicated_from and job['status'] == JobStatus.QUEUED.value:
+        progress_job_id = deduplicated_from
+    
+    # Les workers écrivent PostgreSQL à cadence réduite: Redis a la progression la plus récente
+    cached = get_cached_progress(progress_job_id)
+    if cached:
+        job.update({k: v for k, v in cached.items() if k in ('status', 'progress', 'error_message', 'output_url')})
+    
+    return job
 
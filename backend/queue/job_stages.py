@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Job Stages
+Découpage des jobs longs en étapes routées par classe de ressources
+
+Chaque étape déclare ses besoins (cores, mémoire, GPU) et tourne sur la
+queue de sa classe (io, cpu, heavy, blender): l'extraction ffmpeg ou
+l'upload n'attendent plus derrière COLMAP. Les étapes sont chaînées par
+dépendances RQ et partagent le workspace du job (stockage partagé entre
+workers requis: PHOTOGRAMMETRY_STAGED, désactivé par défaut). Une étape
+en échec définitif annule les étapes suivantes.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from rq import Retry
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from job_models import JobPriority
+from rq_config import redis_conn, get_resource_queue, enqueue_job, index_job
+
+# Fonction d'étape (chemin importable par les workers)
+PHOTOGRAMMETRY_STAGE_FUNC = 'workers.photogrammetry_stages.run_photogrammetry_stage'
+
+@dataclass(frozen=True)
+class StageSpec:
+    """Étape de job et ressources nécessaires par exécution"""
+    name: str
+    resource_class: str
+    cores: int
+    memory_gb: float
+    timeout: int
+    pipeline_stages: Tuple[str, ...] = ()
+    gpu: bool = False
+    retries: int = 2
+
+PHOTOGRAMMETRY_STAGES: List[StageSpec] = [
+    StageSpec('extract', 'io', cores=2, memory_gb=2, timeout=900,
+              pipeline_stages=('frame_extraction',)),
+    StageSpec('preprocess', 'cpu', cores=4, memory_gb=4, timeout=900,
+              pipeline_stages=('preprocessing',)),
+    StageSpec('sfm', 'heavy', cores=8, memory_gb=16, timeout=3600,
+              pipeline_stages=('colmap_sfm',), gpu=True),
+    StageSpec('dense', 'heavy', cores=8, memory_gb=24, timeout=3600,
+              pipeline_stages=('colmap_dense',), gpu=True),
+    StageSpec('mesh', 'cpu', cores=8, memory_gb=16, timeout=1800,
+              pipeline_stages=('mesh_generation', 'mesh_lod')),
+    # Publication: GLB/Draco/USDZ/miniature en parallèle (artifact_publisher)
+    StageSpec('finalize', 'cpu', cores=4, memory_gb=4, timeout=1200),
+]
+
+# Optimisation Blender (bpy) mono-étape
+MESH_OPTIMIZATION_STAGE = StageSpec('mesh_optimization', 'blender', cores=4, memory_gb=8, timeout=1800)
+
+ALL_STAGES: List[StageSpec] = PHOTOGRAMMETRY_STAGES + [MESH_OPTIMIZATION_STAGE]
+
+def get_photogrammetry_stage(name: str) -> StageSpec:
+    """Spec d'une étape photogrammétrie par nom"""
+    for spec in PHOTOGRAMMETRY_STAGES:
+        if spec.name == name:
+            return spec
+    raise ValueError(f"Unknown photogrammetry stage: {name}")
+
+def stage_job_id(job_id: str, stage: str) -> str:
+    """ID RQ d'une étape (le job_id PostgreSQL reste celui du job parent)"""
+    return f"{job_id}-{stage}"
+
+def resource_requirements() -> Dict[str, Dict[str, float]]:
+    """
+    Besoins max par classe de ressources (dimensionnement des pools)
+    
+    Returns:
+        Dict classe -> {cores, memory_gb, gpu}
+    """
+    requirements: Dict[str, Dict[str, float]] = {}
+    for spec in ALL_STAGES:
+        current = requirements.setdefault(spec.resource_class, {'cores': 0, 'memory_gb': 0, 'gpu': False})
+        current['cores'] = max(current['cores'], spec.cores)
+        current['memory_gb'] = max(current['memory_gb'], spec.memory_gb)
+        current['gpu'] = current['gpu'] or spec.gpu
+    return requirements
+
+def enqueue_photogrammetry_stages(
+    job_id: str,
+    video_path: str,
+    user_id: str,
+    quality: Optional[str] = None,
+    priority: JobPriority = JobPriority.DEFAULT,
+    meta: Optional[Dict] = None
+) -> List[Job]:
+    """
+    Enqueue la chaîne d'étapes d'un job photogrammétrie
+    
+    Args:
+        job_id: Job ID (processing_jobs)
+        video_path: Chemin vidéo
+        user_id: User ID
+        quality: Tier de résolution
+        priority: HIGH passe en tête des queues de classe
+        meta: Meta RQ ajoutée à la première étape (fair-share)
+    
+    Returns:
+        Jobs RQ des étapes, dans l'ordre
+    """
+    jobs: List[Job] = []
+    previous: Optional[Job] = None
+    
+    for spec in PHOTOGRAMMETRY_STAGES:
+        previous = enqueue_job(
+            get_resource_queue(spec.resource_class),
+            PHOTOGRAMMETRY_STAGE_FUNC,
+            job_id,
+            spec.name,
+            video_path,
+            user_id,
+            quality,
+            job_id=stage_job_id(job_id, spec.name),
+            depends_on=previous,
+            at_front=priority == JobPriority.HIGH,
+            retry=Retry(max=spec.retries, interval=[60, 300]),
+            timeout=spec.timeout,
+            meta={
+                'parent_job_id': job_id,
+                'stage': spec.name,
+                **(meta if previous is None and meta else {})
+            }
+        )
+        jobs.append(previous)
+    
+    first = PHOTOGRAMMETRY_STAGES[0]
+    index_job(
+        job_id,
+        queue=first.resource_class,
+        state='queued',
+        stage=first.name,
+        rq_job_id=jobs[0].id
+    )
+    return jobs
+
+def cancel_remaining_stages(job_id: str, failed_stage: str) -> int:
+    """
+    Annule les étapes suivant une étape en échec définitif
+    
+    Sans cela, RQ les laisse indéfiniment dans la DeferredJobRegistry.
+    
+    Returns:
+        Nombre d'étapes annulées
+    """
+    names = [spec.name for spec in PHOTOGRAMMETRY_STAGES]
+    cancelled = 0
+    for name in names[names.index(failed_stage) + 1:]:
+        try:
+            Job.fetch(stage_job_id(job_id, name), connection=redis_conn).cancel()
+            cancelled += 1
+        except NoSuchJobError:
+            continue
+    return cancelled
@@ -4,64 +4,89 @@ Job Tracker
 Tracking des jobs dans PostgreSQL database
 """
 
-import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from job_models import ProcessingJob, JobStatus, JobType, JobPriority
+from db_pool import db_cursor, get_connection_params
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
-# Database connection
+# Database connection (unused by the tracker, which borrows from db_pool;
+# kept as the patch target of the job tracker tests)
 def get_db_connection():
-    """Get PostgreSQL connection"""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=int(os.getenv('DB_PORT', 5432)),
-        database=os.getenv('DB_NAME', 'arcode_db'),
-        user=os.getenv('DB_USER', 'arcode_user'),
-        password=os.getenv('DB_PASSWORD')
-    )
+    """Get a dedicated (unpooled) PostgreSQL connection, closed by the caller"""
+    return psycopg2.connect(**get_connection_params())
 
 def create_job(job: ProcessingJob) -> bool:
     """Create job in database"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO processing_jobs (
-                id, user_id, asset_id, job_type, status, progress,
-                input_url, output_url, metadata, created_at, updated_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """, (
-            job.job_id,
-            job.user_id,
-            job.asset_id,
-            job.job_type.value,
-            job.status.value,
-            job.progress,
-            job.input_url,
-            job.output_url,
-            json.dumps(job.metadata),
-            job.created_at,
-            job.updated_at
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO processing_jobs (
+                    id, user_id, asset_id, job_type, status, progress,
+                    input_url, output_url, metadata, created_at, updated_at
+                ) VALUES (
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                )
+            """, (
+                job.job_id,
+                job.user_id,
+                job.asset_id,
+                job.job_type.value,
+                job.status.value,
+                job.progress,
+                job.input_url,
+                job.output_url,
+                json.dumps(job.metadata),
+                job.created_at,
+                job.updated_at
+            ))
+        
         return True
     
     except Exception as e:
         logger.error(f"Error creating job: {e}")
         return False
 
+def create_jobs(jobs: List[ProcessingJob]) -> bool:
+    """Create several jobs in one multi-row INSERT (single transaction: all or nothing)"""
+    if not jobs:
+        return True
+    
+    try:
+        with db_cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO processing_jobs (
+                    id, user_id, asset_id, job_type, status, progress,
+                    input_url, output_url, metadata, created_at, updated_at
+                ) VALUES %s
+            """, [
+                (
+                    job.job_id,
+                    job.user_id,
+                    job.asset_id,
+                    job.job_type.value,
+                    job.status.value,
+                    job.progress,
+                    job.input_url,
+                    job.output_url,
+                    json.dumps(job.metadata),
+                    job.created_at,
+                    job.updated_at
+                )
+                for job in jobs
+            ], page_size=len(jobs))
+        
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error creating {len(jobs)} jobs: {e}")
+        return False
+
 def update_job_status(
     job_id: str,
     status: JobStatus,
@@ -71,9 +96,6 @@ def update_job_status(
 ) -> bool:
     """Update job status in database"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         updates = ["status = %s", "updated_at = %s"]
         values = [status.value, datetime.utcnow()]
         
@@ -100,30 +122,41 @@ def update_job_status(
         values.append(job_id)
         
         query = f"UPDATE processing_jobs SET {', '.join(updates)} WHERE id = %s"
-        cursor.execute(query, values)
+        with db_cursor() as cursor:
+            cursor.execute(query, values)
         
-        conn.commit()
-        cursor.close()
-        conn.close()
         return True
     
     except Exception as e:
         logger.error(f"Error updating job status: {e}")
         return False
 
+def update_job_metadata(job_id: str, metadata: Dict[str, Any]) -> bool:
+    """Merge keys into job metadata (JSONB)"""
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                UPDATE processing_jobs
+                SET metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb,
+                    updated_at = %s
+                WHERE id = %s
+            """, (json.dumps(metadata), datetime.utcnow(), job_id))
+        
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error updating job metadata: {e}")
+        return False
+
 def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     """Get job from database"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT * FROM processing_jobs WHERE id = %s
-        """, (job_id,))
+        with db_cursor(dict_cursor=True) as cursor:
+            cursor.execute("""
+                SELECT * FROM processing_jobs WHERE id = %s
+            """, (job_id,))
         
-        job = cursor.fetchone()
-        cursor.close()
-        conn.close()
+            job = cursor.fetchone()
         
         if job:
             return dict(job)
@@ -133,22 +166,37 @@ def get_job(job_id: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Error getting job: {e}")
         return None
 
+def get_jobs(job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get several jobs in one query (job_id -> row, unknown jobs omitted)"""
+    if not job_ids:
+        return {}
+    
+    try:
+        with db_cursor(dict_cursor=True) as cursor:
+            cursor.execute("""
+                SELECT * FROM processing_jobs WHERE id = ANY(%s::uuid[])
+            """, (list(job_ids),))
+        
+            jobs = cursor.fetchall()
+        
+        return {str(job['id']): dict(job) for job in jobs}
+    
+    except Exception as e:
+        logger.error(f"Error getting {len(job_ids)} jobs: {e}")
+        return {}
+
 def get_user_jobs(user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
     """Get user's jobs"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT * FROM processing_jobs
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, (user_id, limit))
-        
-        jobs = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with db_cursor(dict_cursor=True) as cursor:
+            cursor.execute("""
+                SELECT * FROM processing_jobs
+                WHERE user_id = %s
+                ORDER BY created_at DESC
+                LIMIT %s
+            """, (user_id, limit))
+        
+            jobs = cursor.fetchall()
         
         return [dict(job) for job in jobs]
     
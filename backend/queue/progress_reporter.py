@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Progress Reporter
+Coalesce les mises à jour de progression des workers
+
+Les workers peuvent reporter à chaque ligne de log: l'état est gardé en
+mémoire, publié dans Redis (clé + pub/sub pour le streaming) au plus toutes les
+REDIS_FLUSH_INTERVAL secondes et écrit dans PostgreSQL (store durable) au
+plus toutes les DB_FLUSH_INTERVAL secondes. Un changement de status et les
+états terminaux sont écrits immédiatement.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from job_models import JobStatus
+from job_tracker import update_job_status
+from rq_config import redis_conn
+from fair_scheduler import release_job
+from job_dedup import propagate_to_followers
+
+logger = logging.getLogger(__name__)
+
+REDIS_FLUSH_INTERVAL = float(os.getenv('PROGRESS_REDIS_INTERVAL', 1))
+DB_FLUSH_INTERVAL = float(os.getenv('PROGRESS_DB_INTERVAL', 10))
+
+# État Redis conservé après la fin du job
+PROGRESS_TTL = int(os.getenv('PROGRESS_TTL', 24 * 3600))
+PROGRESS_KEY = "job_progress:{job_id}"
+PROGRESS_CHANNEL = "job_events:{job_id}"
+
+TERMINAL_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+class ProgressReporter:
+    """Progression d'un job, écrite à cadence limitée"""
+
+    def __init__(
+        self,
+        job_id: str,
+        redis_interval: float = REDIS_FLUSH_INTERVAL,
+        db_interval: float = DB_FLUSH_INTERVAL
+    ):
+        self.job_id = job_id
+        self.redis_interval = redis_interval
+        self.db_interval = db_interval
+
+        self._lock = threading.RLock()
+        self._state: Dict[str, Any] = {}
+        self._redis_dirty = False
+        self._db_dirty = False
+        self._last_redis_flush = 0.0
+        self._last_db_flush = 0.0
+        self._timer: Optional[threading.Timer] = None
+
+    def report(
+        self,
+        status: JobStatus,
+        progress: Optional[int] = None,
+        error_message: Optional[str] = None,
+        output_url: Optional[str] = None
+    ) -> bool:
+        """
+        Enregistre un état (mêmes arguments que update_job_status)
+
+        Returns:
+            False si une écriture PostgreSQL immédiate a échoué
+        """
+        with self._lock:
+            status_changed = self._state.get('status') != status.value
+
+            self._state['status'] = status.value
+            if progress is not None:
+                self._state['progress'] = progress
+            if error_message:
+                self._state['error_message'] = error_message
+            if output_url:
+                self._state['output_url'] = output_url
+            self._state['updated_at'] = datetime.utcnow().isoformat()
+
+            self._redis_dirty = True
+            self._db_dirty = True
+
+            if status_changed or status in TERMINAL_STATUSES:
+                return self.flush(force=True)
+
+            return self.flush()
+
+    def flush(self, force: bool = False) -> bool:
+        """
+        Écrit l'état en attente dont l'intervalle est écoulé
+
+        Args:
+            force: Écrit Redis et PostgreSQL sans attendre
+
+        Returns:
+            False si l'écriture PostgreSQL a échoué
+        """
+        with self._lock:
+            now = time.monotonic()
+            success = True
+
+            if self._redis_dirty and (force or now - self._last_redis_flush >= self.redis_interval):
+                self._write_redis()
+                self._last_redis_flush = now
+                self._redis_dirty = False
+
+            if self._db_dirty and (force or now - self._last_db_flush >= self.db_interval):
+                success = update_job_status(
+                    self.job_id,
+                    JobStatus(self._state['status']),
+                    progress=self._state.get('progress'),
+                    error_message=self._state.get('error_message'),
+                    output_url=self._state.get('output_url')
+                )
+                self._last_db_flush = now
+                # Échec: état gardé, réessayé au prochain intervalle (timer)
+                self._db_dirty = not success
+
+            self._schedule_flush(now)
+            return success
+
+    def close(self):
+        """Écrit l'état en attente (fin du job)"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self.flush(force=True)
+
+    def _schedule_flush(self, now: float):
+        """Timer pour la dernière mise à jour si plus aucun report n'arrive"""
+        if self._timer or not (self._redis_dirty or self._db_dirty):
+            return
+
+        deadlines = []
+        if self._redis_dirty:
+            deadlines.append(self._last_redis_flush + self.redis_interval)
+        if self._db_dirty:
+            deadlines.append(self._last_db_flush + self.db_interval)
+
+        self._timer = threading.Timer(max(0.0, min(deadlines) - now), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self.flush()
+
+    def _write_redis(self):
+        """État courant dans Redis + publication (best effort, PostgreSQL reste la référence)"""
+        try:
+            payload = json.dumps({'job_id': self.job_id, **self._state})
+            pipe = redis_conn.pipeline()
+            pipe.set(PROGRESS_KEY.format(job_id=self.job_id), payload, ex=PROGRESS_TTL)
+            pipe.publish(PROGRESS_CHANNEL.format(job_id=self.job_id), payload)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error writing progress to Redis for job {self.job_id}: {e}")
+
+# Reporters du processus (un work-horse RQ traite un job à la fois)
+_reporters: Dict[str, ProgressReporter] = {}
+_reporters_lock = threading.Lock()
+
+def get_progress_reporter(job_id: str) -> ProgressReporter:
+    """Reporter partagé pour un job"""
+    with _reporters_lock:
+        reporter = _reporters.get(job_id)
+        if reporter is None:
+            reporter = _reporters[job_id] = ProgressReporter(job_id)
+        return reporter
+
+def _is_final_attempt() -> bool:
+    """Faux si RQ va relancer le job courant (Retry avec des essais restants)"""
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+    except Exception:
+        return True
+    return job is None or not job.retries_left
+
+def report_job_status(
+    job_id: str,
+    status: JobStatus,
+    progress: Optional[int] = None,
+    error_message: Optional[str] = None,
+    output_url: Optional[str] = None
+) -> bool:
+    """Remplaçant coalescé de update_job_status pour les workers"""
+    reporter = get_progress_reporter(job_id)
+    result = reporter.report(status, progress, error_message, output_url)
+
+    if status in TERMINAL_STATUSES:
+        reporter.close()
+        with _reporters_lock:
+            _reporters.pop(job_id, None)
+
+        # Un échec relancé par RQ garde son slot (limite par utilisateur)
+        # et ses doublons, qui attendent le résultat du retry
+        if status != JobStatus.FAILED or _is_final_attempt():
+            # Slot fair-share libéré (rempli par le prochain dispatch)
+            release_job(job_id)
+            propagate_to_followers(job_id, status, error_message, output_url)
+
+    return result
+
+def get_cached_progress(job_id: str) -> Optional[Dict[str, Any]]:
+    """Dernier état publié dans Redis (None si absent ou Redis indisponible)"""
+    try:
+        data = redis_conn.get(PROGRESS_KEY.format(job_id=job_id))
+        return json.loads(data) if data else None
+    except Exception as e:
+        logger.warning(f"Error reading progress from Redis for job {job_id}: {e}")
+        return None
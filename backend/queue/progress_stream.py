@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Progress Stream
+Diffusion de la progression des jobs via Redis pub/sub (SSE + long-poll)
+
+Une seule connexion pub/sub par processus API (psubscribe job_events:*),
+répartie en mémoire entre les clients abonnés: un client connecté ne coûte
+ni lecture PostgreSQL ni connexion Redis supplémentaire.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Iterator, Set
+
+from progress_reporter import PROGRESS_CHANNEL, TERMINAL_STATUSES, get_cached_progress
+from rq_config import redis_conn
+
+logger = logging.getLogger(__name__)
+
+# Durée max d'une connexion SSE (le client se reconnecte via retry)
+SSE_MAX_DURATION = int(os.getenv('PROGRESS_SSE_MAX_DURATION', 300))
+SSE_HEARTBEAT_INTERVAL = int(os.getenv('PROGRESS_SSE_HEARTBEAT', 15))
+SSE_RETRY_MS = 3000
+
+LONG_POLL_TIMEOUT = int(os.getenv('PROGRESS_LONG_POLL_TIMEOUT', 25))
+
+# Propriétaire du job (contrôle d'accès sans lecture PostgreSQL à chaque poll)
+OWNER_KEY = "job_owner:{job_id}"
+OWNER_TTL = 7 * 24 * 3600
+
+TERMINAL_VALUES = {status.value for status in TERMINAL_STATUSES}
+
+class Subscription:
+    """Messages reçus pour un job, consommés par un client"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._messages = deque(maxlen=100)
+        self._condition = threading.Condition()
+
+    def put(self, state: Dict[str, Any]):
+        with self._condition:
+            self._messages.append(state)
+            self._condition.notify_all()
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Prochain état (None si timeout)"""
+        with self._condition:
+            if not self._messages:
+                self._condition.wait(timeout)
+            return self._messages.popleft() if self._messages else None
+
+class ProgressBroker:
+    """Écoute job_events:* et distribue aux abonnements locaux"""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, job_id: str) -> Subscription:
+        subscription = Subscription(job_id)
+        with self._lock:
+            self._subscriptions.setdefault(job_id, set()).add(subscription)
+            self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.job_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.job_id]
+
+    def _ensure_listener(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._listen, name='progress-broker', daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        """Boucle pub/sub (reconnexion automatique)"""
+        pattern = PROGRESS_CHANNEL.format(job_id='*')
+
+        while True:
+            pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(pattern)
+                for message in pubsub.listen():
+                    self._dispatch(message)
+            except Exception as e:
+                logger.warning(f"Progress pub/sub connection lost: {e}")
+            finally:
+                pubsub.close()
+            time.sleep(1)
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if message.get('type') != 'pmessage':
+            return
+        try:
+            state = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(state.get('job_id'), ()))
+        for subscription in subscriptions:
+            subscription.put(state)
+
+_broker = ProgressBroker()
+
+def get_job_owner(job_id: str) -> Optional[str]:
+    """user_id du job (Redis, sinon PostgreSQL puis mis en cache)"""
+    key = OWNER_KEY.format(job_id=job_id)
+    try:
+        owner = redis_conn.get(key)
+        if owner:
+            return owner.decode() if isinstance(owner, bytes) else owner
+    except Exception as e:
+        logger.warning(f"Error reading job owner from Redis: {e}")
+
+    from job_tracker import get_job
+    job = get_job(job_id)
+    if not job:
+        return None
+
+    owner = str(job['user_id'])
+    try:
+        redis_conn.set(key, owner, ex=OWNER_TTL)
+    except Exception:
+        pass
+    return owner
+
+def current_state(job_id: str) -> Optional[Dict[str, Any]]:
+    """Dernier état connu (Redis, sinon ligne PostgreSQL)"""
+    state = get_cached_progress(job_id)
+    if state:
+        return state
+
+    from job_tracker import get_job
+    job = get_job(job_id)
+    if not job:
+        return None
+    return {
+        'job_id': job_id,
+        'status': job.get('status'),
+        'progress': job.get('progress'),
+        'error_message': job.get('error_message'),
+        'output_url': job.get('output_url'),
+        'updated_at': job['updated_at'].isoformat() if job.get('updated_at') else None
+    }
+
+def _sse_event(state: Dict[str, Any]) -> str:
+    return f"event: progress\ndata: {json.dumps(state, default=str)}\n\n"
+
+def stream_job_progress(job_id: str, max_duration: int = SSE_MAX_DURATION) -> Iterator[str]:
+    """
+    Flux Server-Sent Events pour un job
+
+    Envoie l'état courant puis chaque mise à jour publiée par les workers,
+    jusqu'à un état terminal ou max_duration (le client se reconnecte).
+    """
+    # Abonnement avant la lecture de l'état: aucune mise à jour perdue entre les deux
+    subscription = _broker.subscribe(job_id)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        state = current_state(job_id)
+        if state:
+            yield _sse_event(state)
+            if state.get('status') in TERMINAL_VALUES:
+                return
+
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            state = subscription.get(timeout=SSE_HEARTBEAT_INTERVAL)
+            if state is None:
+                yield ": keepalive\n\n"
+                continue
+
+            yield _sse_event(state)
+            if state.get('status') in TERMINAL_VALUES:
+                return
+    finally:
+        _broker.unsubscribe(subscription)
+
+def wait_for_progress(
+    job_id: str,
+    since: Optional[str] = None,
+    timeout: float = LONG_POLL_TIMEOUT
+) -> Optional[Dict[str, Any]]:
+    """
+    Long-poll: attend un état plus récent que `since`
+
+    Args:
+        job_id: Job ID
+        since: updated_at du dernier état reçu par le client
+        timeout: Attente max en secondes
+
+    Returns:
+        Nouvel état, ou l'état courant si rien n'a changé avant le timeout
+    """
+    subscription = _broker.subscribe(job_id)
+    try:
+        state = current_state(job_id)
+        if not state or state.get('updated_at') != since or state.get('status') in TERMINAL_VALUES:
+            return state
+
+        update = subscription.get(timeout=timeout)
+        return update or state
+    finally:
+        _broker.unsubscribe(subscription)
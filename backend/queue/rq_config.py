@@ -5,10 +5,12 @@ Job queue system avec Redis backend
 """
 
 import os
-from rq import Queue, Retry
+from datetime import datetime
+from rq import Queue, Retry, Worker
 from rq.job import Job
+from rq.exceptions import NoSuchJobError
 from redis import Redis
-from typing import Optional
+from typing import Optional, Dict, Any, Iterable
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,19 +38,131 @@ QUEUES = {
     'low': low_priority_queue
 }
 
+# Queues par classe de ressources (étapes de pipeline, voir job_stages)
+RESOURCE_CLASSES = ('io', 'cpu', 'heavy', 'blender')
+RESOURCE_QUEUES = {name: Queue(name, connection=redis_conn) for name in RESOURCE_CLASSES}
+
+ALL_QUEUES = {**QUEUES, **RESOURCE_QUEUES}
+
+# Index job_id -> queue / worker / state (mis à jour à l'enqueue et à chaque transition)
+JOB_INDEX_KEY = "job_index:{job_id}"
+JOB_INDEX_TTL = int(os.getenv('JOB_INDEX_TTL', 7 * 24 * 3600))
+
 def get_queue(priority: str = 'default') -> Queue:
     """Get queue by priority"""
     return QUEUES.get(priority, default_queue)
 
+def get_resource_queue(resource_class: str) -> Queue:
+    """Get queue by resource class (io, cpu, heavy, blender)"""
+    if resource_class not in RESOURCE_QUEUES:
+        raise ValueError(f"Unknown resource class: {resource_class}")
+    return RESOURCE_QUEUES[resource_class]
+
+def index_job(job_id: str, pipeline=None, **fields):
+    """
+    Met à jour l'entrée d'index d'un job
+    
+    Args:
+        job_id: Job ID
+        pipeline: Pipeline Redis existant (sinon écriture directe)
+        **fields: queue, state, worker...
+    """
+    key = JOB_INDEX_KEY.format(job_id=job_id)
+    mapping = {k: str(v) for k, v in fields.items() if v is not None}
+    mapping['updated_at'] = datetime.utcnow().isoformat()
+    
+    conn = pipeline if pipeline is not None else redis_conn.pipeline()
+    conn.hset(key, mapping=mapping)
+    conn.expire(key, JOB_INDEX_TTL)
+    if pipeline is None:
+        conn.execute()
+
+def enqueue_job(queue: Queue, func, *args, **kwargs) -> Job:
+    """Enqueue un job et l'enregistre dans l'index"""
+    job = queue.enqueue(func, *args, **kwargs)
+    try:
+        index_job(job.id, queue=queue.name, state=job.get_status(refresh=False).value)
+    except Exception as e:
+        logger.warning(f"Error indexing job {job.id}: {e}")
+    return job
+
 def get_job(job_id: str) -> Optional[Job]:
-    """Get job by ID from any queue"""
-    for queue in QUEUES.values():
-        try:
-            job = Job.fetch(job_id, connection=redis_conn)
-            return job
-        except Exception:
+    """Get job by ID (la clé du job ne dépend pas de la queue)"""
+    try:
+        return Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return None
+
+def get_jobs(job_ids: Iterable[str]) -> Dict[str, Optional[Job]]:
+    """Fetch plusieurs jobs en un seul round trip (pipeline)"""
+    job_ids = list(job_ids)
+    return dict(zip(job_ids, Job.fetch_many(job_ids, connection=redis_conn)))
+
+def get_job_locations(job_ids: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """Entrées d'index (queue, state, worker) pour plusieurs jobs"""
+    job_ids = list(job_ids)
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(JOB_INDEX_KEY.format(job_id=job_id))
+        results = pipe.execute()
+    
+    return {
+        job_id: {k.decode(): v.decode() for k, v in entry.items()}
+        for job_id, entry in zip(job_ids, results)
+        if entry
+    }
+
+def get_queue_depths() -> Dict[str, int]:
+    """Nombre de jobs en attente par queue"""
+    queues = list(ALL_QUEUES.values())
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for queue in queues:
+            pipe.llen(queue.key)
+        depths = pipe.execute()
+    return {queue.name: depth for queue, depth in zip(queues, depths)}
+
+def get_jobs_status(job_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Statut RQ de plusieurs jobs pour dashboards (3 round trips au total)
+    
+    Args:
+        job_ids: Job IDs
+        
+    Returns:
+        Dict job_id -> {queue, state, stage, worker, position, queue_depth}
+        (position: rang dans la queue si en attente)
+    """
+    job_ids = list(job_ids)
+    locations = get_job_locations(job_ids)
+    depths = get_queue_depths()
+    
+    # rq_job_id: job RQ de l'étape en cours quand le job est découpé en étapes
+    queued = [
+        (job_id, location['queue'], location.get('rq_job_id') or job_id)
+        for job_id, location in locations.items()
+        if location.get('state') == 'queued' and location.get('queue') in ALL_QUEUES
+    ]
+    
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for _, queue_name, rq_job_id in queued:
+            pipe.lpos(ALL_QUEUES[queue_name].key, rq_job_id)
+        positions = dict(zip((job_id for job_id, _, _ in queued), pipe.execute()))
+    
+    statuses = {}
+    for job_id in job_ids:
+        location = locations.get(job_id)
+        if not location:
+            statuses[job_id] = None
             continue
-    return None
+        statuses[job_id] = {
+            'queue': location.get('queue'),
+            'state': location.get('state'),
+            'stage': location.get('stage'),
+            'worker': location.get('worker'),
+            'position': positions.get(job_id),
+            'queue_depth': depths.get(location.get('queue'))
+        }
+    return statuses
 
 def cancel_job(job_id: str) -> bool:
     """Cancel a job"""
@@ -56,12 +170,45 @@ def cancel_job(job_id: str) -> bool:
         job = get_job(job_id)
         if job:
             job.cancel()
+            index_job(job_id, state='canceled', worker='')
+            
+            from fair_scheduler import release_job
+            release_job(job.meta.get('parent_job_id', job_id))
             return True
         return False
     except Exception as e:
         logger.error(f"Error cancelling job {job_id}: {e}")
         return False
 
+class IndexedWorker(Worker):
+    """Worker RQ qui tient l'index des jobs à jour (started / finished / failed)"""
+    
+    def prepare_job_execution(self, job: Job, *args, **kwargs):
+        super().prepare_job_execution(job, *args, **kwargs)
+        self._index(job, state='started', worker=self.name)
+        
+        # Temps d'attente fair-share, une seule fois par job (pas aux retries)
+        if 'fairshare' in job.meta:
+            from fair_scheduler import record_queue_wait
+            record_queue_wait(job.meta)
+            del job.meta['fairshare']
+            job.save_meta()
+    
+    def handle_job_success(self, job: Job, queue: Queue, started_job_registry):
+        super().handle_job_success(job, queue, started_job_registry)
+        self._index(job, state='finished', worker='')
+    
+    def handle_job_failure(self, job: Job, queue: Queue, started_job_registry=None, exc_string=''):
+        super().handle_job_failure(job, queue, started_job_registry=started_job_registry, exc_string=exc_string)
+        # Retry RQ: le job est remis en queue (ou planifié) au lieu d'échouer
+        self._index(job, state=job.get_status(refresh=True).value, worker='')
+    
+    def _index(self, job: Job, **fields):
+        try:
+            index_job(job.id, queue=job.origin, **fields)
+        except Exception as e:
+            logger.warning(f"Error indexing job {job.id}: {e}")
+
 
 
 
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Webhook Dispatcher
+Livraison asynchrone des webhooks (asyncio + httpx), hors du chemin des jobs
+
+trigger_webhook ne fait qu'un LPUSH Redis. Ce processus résout les abonnés,
+livre avec une limite de concurrence globale et par hôte, planifie les
+retries dans un sorted set (score = échéance) et insère les enregistrements
+webhook_deliveries par lots.
+
+File fiable: chaque événement est déplacé (BLMOVE) dans la liste de
+traitement du dispatcher et n'en est retiré qu'une fois ses livraisons
+enregistrées en base (ou planifiées en retry / mises en lot). Au démarrage,
+les événements restés en traitement (crash, redémarrage) sont remis en
+file. Au plus WEBHOOK_MAX_INFLIGHT_EVENTS événements sont en cours et
+WEBHOOK_MAX_UNACKED_EVENTS en attente d'enregistrement: au-delà, la file
+n'est plus consommée.
+
+Webhooks en mode lot (batch_interval_seconds): les événements sont mis en
+tampon dans Redis et livrés en un seul POST gzip (tableau signé) toutes les
+batch_interval_seconds ou dès batch_max_events événements.
+
+Usage: python webhook_dispatcher.py
+"""
+
+import os
+import gzip
+import json
+import time
+import uuid
+import signal
+import socket
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from redis import asyncio as aioredis
+from psycopg2.extras import execute_values
+
+from db_pool import db_cursor
+from webhooks import (
+    EVENTS_KEY, DeliveryStatus, WebhookEvent,
+    find_webhooks, get_webhook, generate_webhook_signature
+)
+
+logger = logging.getLogger(__name__)
+
+# Retries planifiés: membre = livraison JSON, score = timestamp d'échéance
+RETRY_KEY = "webhooks:retry"
+
+# Événements en cours de traitement, par dispatcher (identifiant stable: un
+# dispatcher redémarré reprend sa propre liste)
+PROCESSING_KEY = "webhooks:processing:{dispatcher_id}"
+WEBHOOK_DISPATCHER_ID = os.getenv('WEBHOOK_DISPATCHER_ID', socket.gethostname())
+
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', 100))
+WEBHOOK_PER_HOST_CONCURRENCY = int(os.getenv('WEBHOOK_PER_HOST_CONCURRENCY', 4))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 10))
+WEBHOOK_MAX_RETRIES = int(os.getenv('WEBHOOK_MAX_RETRIES', 3))
+WEBHOOK_RETRY_BASE = float(os.getenv('WEBHOOK_RETRY_BASE', 10))  # 20s, 40s, 80s
+WEBHOOK_MAX_INFLIGHT_EVENTS = int(os.getenv('WEBHOOK_MAX_INFLIGHT_EVENTS', WEBHOOK_CONCURRENCY))
+# Événements traités en attente d'enregistrement (base indisponible: lecture suspendue)
+WEBHOOK_MAX_UNACKED_EVENTS = int(os.getenv('WEBHOOK_MAX_UNACKED_EVENTS', 10 * WEBHOOK_CONCURRENCY))
+
+# Lots: événements en attente par webhook + échéances de flush (score)
+BATCH_EVENTS_KEY = "webhooks:batch:{webhook_id}"
+BATCHES_KEY = "webhooks:batches"
+BATCH_EVENT = 'batch'
+WEBHOOK_BATCH_MAX_EVENTS = int(os.getenv('WEBHOOK_BATCH_MAX_EVENTS', 1000))
+DEFAULT_BATCH_MAX_EVENTS = 100
+
+# Enregistrements webhook_deliveries: un INSERT par lot
+RECORD_BATCH_SIZE = 200
+RECORD_FLUSH_INTERVAL = 2.0
+
+def retry_delay(retry_count: int) -> float:
+    """Backoff exponentiel avant la tentative retry_count (1, 2, ...)"""
+    return WEBHOOK_RETRY_BASE * (2 ** retry_count)
+
+def batch_max_events(webhook: Dict[str, Any]) -> int:
+    """Taille max d'un lot pour un webhook"""
+    return min(webhook.get('batch_max_events') or DEFAULT_BATCH_MAX_EVENTS, WEBHOOK_BATCH_MAX_EVENTS)
+
+def build_request(event: Dict[str, Any], secret: str) -> tuple:
+    """
+    Corps, en-têtes et payload JSON d'une livraison
+
+    Un lot est un tableau d'événements compressé en gzip; la signature HMAC
+    couvre le JSON non compressé du lot entier.
+
+    Returns:
+        (body bytes, headers, payload JSON)
+    """
+    if event['event'] == BATCH_EVENT:
+        full_payload = {
+            'event': BATCH_EVENT,
+            'timestamp': event['timestamp'],
+            'count': len(event['events']),
+            'events': event['events']
+        }
+    else:
+        full_payload = {
+            'event': event['event'],
+            'timestamp': event['timestamp'],
+            'data': event['data']
+        }
+
+    payload_json = json.dumps(full_payload)
+    headers = {
+        'Content-Type': 'application/json',
+        'X-ARCode-Signature': generate_webhook_signature(payload_json, secret),
+        'X-ARCode-Event': event['event']
+    }
+    body = payload_json.encode('utf-8')
+
+    if event['event'] == BATCH_EVENT:
+        body = gzip.compress(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['X-ARCode-Batch-Size'] = str(len(event['events']))
+
+    return body, headers, payload_json
+
+def record_deliveries(records: List[tuple]):
+    """Insère un lot d'enregistrements webhook_deliveries"""
+    with db_cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO webhook_deliveries (
+                id, webhook_id, event_type, payload, status,
+                status_code, response_body, retry_count, created_at, delivered_at
+            ) VALUES %s
+        """, records, page_size=len(records))
+
+class WebhookDispatcher:
+    """Consomme la file d'événements et les retries, livre en parallèle"""
+
+    def __init__(self):
+        self.redis = aioredis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            password=os.getenv('REDIS_PASSWORD'),
+            db=0
+        )
+        self.client: Optional['httpx.AsyncClient'] = None
+        self.semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.records: List[tuple] = []
+        # Événements à retirer de la liste de traitement au prochain enregistrement
+        self.acks: List[bytes] = []
+        self.processing_key = PROCESSING_KEY.format(dispatcher_id=WEBHOOK_DISPATCHER_ID)
+        self.event_slots = asyncio.Semaphore(WEBHOOK_MAX_INFLIGHT_EVENTS)
+        self.tasks: set = set()
+        self.stopping = asyncio.Event()
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(WEBHOOK_PER_HOST_CONCURRENCY)
+        return self.host_semaphores[host]
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx is required for the webhook dispatcher")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        limits = httpx.Limits(max_connections=WEBHOOK_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, limits=limits) as client:
+            self.client = client
+            background = [
+                asyncio.create_task(self._retry_loop()),
+                asyncio.create_task(self._batch_loop()),
+                asyncio.create_task(self._flush_loop())
+            ]
+            try:
+                await self._event_loop()
+            finally:
+                # Livraisons en cours terminées avant l'arrêt
+                if self.tasks:
+                    await asyncio.gather(*self.tasks, return_exceptions=True)
+                for task in background:
+                    task.cancel()
+                await self._flush_records()
+                await self.redis.close()
+
+        logger.info("Webhook dispatcher stopped")
+
+    async def _recover_processing(self) -> int:
+        """Remet en file les événements non acquittés d'une exécution précédente"""
+        recovered = 0
+        # LEFT → RIGHT: le plus ancien revient en tête de file (consommée à droite)
+        while await self.redis.lmove(self.processing_key, EVENTS_KEY, src='LEFT', dest='RIGHT'):
+            recovered += 1
+        if recovered:
+            logger.warning(f"Requeued {recovered} unacknowledged webhook events")
+        return recovered
+
+    async def _event_loop(self):
+        """Nouveaux événements (BLMOVE vers la liste de traitement, ordre FIFO)"""
+        await self._recover_processing()
+        logger.info("Webhook dispatcher started")
+        while not self.stopping.is_set():
+            # Contre-pression: pas de lecture tant que tous les slots sont pris
+            # ou que les enregistrements en base ne suivent pas
+            if len(self.acks) >= WEBHOOK_MAX_UNACKED_EVENTS:
+                await asyncio.sleep(0.5)
+                continue
+            await self.event_slots.acquire()
+            try:
+                raw = await self.redis.blmove(EVENTS_KEY, self.processing_key, 1, src='RIGHT', dest='LEFT')
+            except Exception as e:
+                self.event_slots.release()
+                logger.error(f"Error reading webhook events: {e}")
+                await asyncio.sleep(1)
+                continue
+            if raw:
+                self._spawn(self._handle_event(raw))
+            else:
+                self.event_slots.release()
+
+    async def _handle_event(self, raw: bytes):
+        """Résout les abonnés puis livre à chacun (acquitté avec les enregistrements)"""
+        try:
+            event = json.loads(raw)
+            try:
+                webhooks = await asyncio.to_thread(
+                    find_webhooks,
+                    WebhookEvent(event['event']),
+                    event.get('webhook_id'),
+                    event.get('ar_code_id'),
+                    event.get('user_id')
+                )
+            except Exception as e:
+                logger.error(f"Error resolving webhooks for {event['event']}: {e}")
+                # Remis en fin de file (base indisponible...), sans boucle serrée
+                await asyncio.sleep(1)
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.lrem(self.processing_key, 1, raw)
+                    pipe.lpush(EVENTS_KEY, raw)
+                    await pipe.execute()
+                return
+
+            for webhook in webhooks:
+                if webhook.get('batch_interval_seconds'):
+                    await self._buffer(webhook, event)
+                else:
+                    await self._deliver(webhook, event, retry_count=0)
+
+            # Enregistrements des livraisons déjà dans self.records: acquitté au même flush
+            self.acks.append(raw)
+        finally:
+            self.event_slots.release()
+
+    async def _buffer(self, webhook: Dict[str, Any], event: Dict[str, Any]):
+        """Ajoute l'événement au lot du webhook (flush à échéance ou lot plein)"""
+        webhook_id = str(webhook['id'])
+        item = json.dumps({key: event[key] for key in ('event', 'timestamp', 'data')})
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(BATCH_EVENTS_KEY.format(webhook_id=webhook_id), item)
+            # NX: l'échéance est fixée par le premier événement du lot
+            pipe.zadd(BATCHES_KEY, {webhook_id: time.time() + webhook['batch_interval_seconds']}, nx=True)
+            size, _ = await pipe.execute()
+
+        if size >= batch_max_events(webhook):
+            await self.redis.zadd(BATCHES_KEY, {webhook_id: 0})  # Flush immédiat
+
+    async def _batch_loop(self):
+        """Lots arrivés à échéance (ZREM: un seul dispatcher flush chaque lot)"""
+        while True:
+            try:
+                due = await self.redis.zrangebyscore(BATCHES_KEY, 0, time.time(), start=0, num=100)
+                for member in due:
+                    if await self.redis.zrem(BATCHES_KEY, member):
+                        self._spawn(self._flush_batch(member.decode()))
+            except Exception as e:
+                logger.error(f"Error polling webhook batches: {e}")
+            await asyncio.sleep(0.5)
+
+    async def _flush_batch(self, webhook_id: str):
+        key = BATCH_EVENTS_KEY.format(webhook_id=webhook_id)
+        webhook = await asyncio.to_thread(get_webhook, webhook_id)
+        if not webhook or not webhook.get('is_active'):
+            await self.redis.delete(key)
+            return
+
+        max_events = batch_max_events(webhook)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, max_events - 1)
+            pipe.ltrim(key, max_events, -1)
+            pipe.llen(key)
+            items, _, remaining = await pipe.execute()
+
+        if remaining:
+            # Reste du lot: tout de suite s'il est plein, sinon à la prochaine échéance
+            delay = 0 if remaining >= max_events else (webhook.get('batch_interval_seconds') or 0)
+            await self.redis.zadd(BATCHES_KEY, {webhook_id: time.time() + delay}, nx=True)
+
+        if items:
+            batch = {
+                'event': BATCH_EVENT,
+                'timestamp': datetime.utcnow().isoformat(),
+                'events': [json.loads(item) for item in items]
+            }
+            await self._deliver(webhook, batch, retry_count=0)
+
+    async def _retry_loop(self):
+        """Retries arrivés à échéance (ZREM: un seul dispatcher prend chaque retry)"""
+        while True:
+            try:
+                due = await self.redis.zrangebyscore(RETRY_KEY, 0, time.time(), start=0, num=100)
+                for member in due:
+                    if await self.redis.zrem(RETRY_KEY, member):
+                        retry = json.loads(member)
+                        self._spawn(self._retry(retry))
+            except Exception as e:
+                logger.error(f"Error polling webhook retries: {e}")
+            await asyncio.sleep(1)
+
+    async def _retry(self, retry: Dict[str, Any]):
+        # Webhook relu: un webhook désactivé entre-temps n'est plus livré
+        webhook = await asyncio.to_thread(get_webhook, retry['webhook_id'])
+        if webhook and webhook.get('is_active'):
+            await self._deliver(webhook, retry['event'], retry['retry_count'])
+
+    async def _deliver(self, webhook: Dict[str, Any], event: Dict[str, Any], retry_count: int):
+        """Une tentative de livraison, événement ou lot (retry planifié en cas d'échec)"""
+        body, headers, payload_json = build_request(event, webhook['secret'])
+
+        status_code = None
+        try:
+            async with self.semaphore, self._host_semaphore(webhook['url']):
+                response = await self.client.post(webhook['url'], content=body, headers=headers)
+            status_code = response.status_code
+            response_body = response.text[:1000] if response.text else None
+            success = status_code == 200
+        except httpx.HTTPError as e:
+            logger.warning(f"Webhook delivery error ({webhook['url']}): {e}")
+            response_body = str(e)[:1000]
+            success = False
+
+        now = datetime.utcnow()
+        self.records.append((
+            str(uuid.uuid4()),
+            str(webhook['id']),
+            event['event'],
+            payload_json,
+            (DeliveryStatus.SUCCESS if success else DeliveryStatus.FAILED).value,
+            status_code,
+            response_body,
+            retry_count,
+            now,
+            now if success else None
+        ))
+        if len(self.records) >= RECORD_BATCH_SIZE:
+            await self._flush_records()
+
+        if not success and retry_count < WEBHOOK_MAX_RETRIES:
+            retry = json.dumps({
+                'webhook_id': str(webhook['id']),
+                'event': event,
+                'retry_count': retry_count + 1,
+                'id': str(uuid.uuid4())  # Membre unique dans le sorted set
+            })
+            await self.redis.zadd(RETRY_KEY, {retry: time.time() + retry_delay(retry_count + 1)})
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(RECORD_FLUSH_INTERVAL)
+            await self._flush_records()
+
+    async def _flush_records(self):
+        if not self.records and not self.acks:
+            return
+        records, self.records = self.records, []
+        acks, self.acks = self.acks, []
+        try:
+            if records:
+                await asyncio.to_thread(record_deliveries, records)
+        except Exception as e:
+            logger.error(f"Error recording {len(records)} webhook deliveries: {e}")
+            # Réessayé au prochain flush; les événements restent en traitement
+            self.records = records + self.records
+            self.acks = acks + self.acks
+            return
+
+        if acks:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for raw in acks:
+                        pipe.lrem(self.processing_key, 1, raw)
+                    await pipe.execute()
+            except Exception as e:
+                # Non acquittés: relivrés au prochain démarrage (au moins une fois)
+                logger.error(f"Error acknowledging {len(acks)} webhook events: {e}")
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(WebhookDispatcher().run())
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,34 @@
 #!/usr/bin/env python3
 """
 Webhooks System
-Signature validation, retry logic, delivery tracking
+Signature validation, subscriptions, event queue (delivery: webhook_dispatcher)
 """
 
 import os
 import hmac
 import hashlib
-import requests
 import json
+import time
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 from enum import Enum
-from job_tracker import get_db_connection
-from psycopg2.extras import RealDictCursor
+from db_pool import db_cursor
+from rq_config import redis_conn
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Événements en attente de livraison (LPUSH ici, BRPOP par le dispatcher)
+EVENTS_KEY = "webhooks:events"
+
+# Index des abonnements: mémoire + Redis, invalidé par incrément de version
+INDEX_VERSION_KEY = "webhooks:index_version"
+INDEX_KEY = "webhooks:index:{version}:{event}"
+WEBHOOK_INDEX_TTL = int(os.getenv('WEBHOOK_INDEX_TTL', 300))
+INDEX_VERSION_CHECK_INTERVAL = float(os.getenv('WEBHOOK_INDEX_VERSION_CHECK', 2))
+
 class WebhookEvent(str, Enum):
     AR_CODE_CREATED = "ar_code.created"
     AR_CODE_SCANNED = "ar_code.scanned"
@@ -32,7 +42,7 @@ class DeliveryStatus(str, Enum):
     FAILED = "failed"
 
 def generate_webhook_signature(payload: str, secret: str) -> str:
-    """Generate HMAC signature for webhook payload"""
+    """Generate HMAC signature for webhook payload (batch: whole uncompressed JSON array payload)"""
     return hmac.new(
         secret.encode('utf-8'),
         payload.encode('utf-8'),
@@ -48,37 +58,37 @@ def register_webhook(
     user_id: str,
     url: str,
     events: List[str],
-    ar_code_id: Optional[str] = None
+    ar_code_id: Optional[str] = None,
+    batch_interval_seconds: Optional[int] = None,
+    batch_max_events: Optional[int] = None
 ) -> str:
-    """Register a new webhook"""
+    """Register a new webhook (batch_interval_seconds: livraison par lots gzip, opt-in)"""
     webhook_id = str(uuid.uuid4())
     secret = os.urandom(32).hex()
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO webhooks (
-                id, user_id, ar_code_id, url, events, secret, is_active, created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """, (
-            webhook_id,
-            user_id,
-            ar_code_id,
-            url,
-            events,
-            secret,
-            True,
-            datetime.utcnow()
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO webhooks (
+                    id, user_id, ar_code_id, url, events, secret, is_active,
+                    batch_interval_seconds, batch_max_events, created_at
+                ) VALUES (
+                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                )
+            """, (
+                webhook_id,
+                user_id,
+                ar_code_id,
+                url,
+                events,
+                secret,
+                True,
+                batch_interval_seconds,
+                batch_max_events,
+                datetime.utcnow()
+            ))
         
+        invalidate_subscription_index()
         return webhook_id
     
     except Exception as e:
@@ -92,168 +102,196 @@ def trigger_webhook(
     ar_code_id: Optional[str] = None,
     user_id: Optional[str] = None
 ):
-    """Trigger webhook for event"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Find webhooks for this event
-        query = """
-            SELECT * FROM webhooks
-            WHERE is_active = TRUE
-            AND %s = ANY(events)
-        """
-        params = [event_type.value]
-        
-        if webhook_id:
-            query += " AND id = %s"
-            params.append(webhook_id)
-        elif ar_code_id:
-            query += " AND (ar_code_id = %s OR ar_code_id IS NULL)"
-            params.append(ar_code_id)
-        elif user_id:
-            query += " AND user_id = %s"
-            params.append(user_id)
-        
-        cursor.execute(query, params)
-        webhooks = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        # Deliver to each webhook
-        for webhook in webhooks:
-            deliver_webhook(webhook, event_type, payload)
+    """
+    Trigger webhook for event
+    
+    Met l'événement en file Redis: résolution des abonnés et livraison par
+    webhook_dispatcher, jamais dans le thread appelant.
+    """
+    if event_type is None:
+        return
     
+    # Aucun abonné (cas courant pour les scans): rien à mettre en file
+    try:
+        if not find_webhooks(event_type, webhook_id, ar_code_id, user_id):
+            return
     except Exception as e:
-        logger.error(f"Error triggering webhook: {e}")
-
-def deliver_webhook(
-    webhook: Dict[str, Any],
-    event_type: WebhookEvent,
-    payload: Dict[str, Any]
-):
-    """Deliver webhook with retry logic"""
-    webhook_id = webhook['id']
-    url = webhook['url']
-    secret = webhook['secret']
+        logger.warning(f"Webhook index unavailable, deferring lookup to dispatcher: {e}")
     
-    # Prepare payload
-    full_payload = {
+    event = {
         'event': event_type.value,
         'timestamp': datetime.utcnow().isoformat(),
-        'data': payload
+        'data': payload,
+        'webhook_id': webhook_id,
+        'ar_code_id': ar_code_id,
+        'user_id': user_id
     }
     
-    payload_json = json.dumps(full_payload)
-    signature = generate_webhook_signature(payload_json, secret)
+    try:
+        redis_conn.lpush(EVENTS_KEY, json.dumps(event, default=str))
+    except Exception as e:
+        logger.error(f"Error triggering webhook: {e}")
+
+def update_webhook(
+    webhook_id: str,
+    url: Optional[str] = None,
+    events: Optional[List[str]] = None,
+    is_active: Optional[bool] = None,
+    batch_interval_seconds: Optional[int] = None,
+    batch_max_events: Optional[int] = None
+) -> bool:
+    """Update a webhook (batch_interval_seconds=0: désactive le mode lot)"""
+    updates = []
+    values: List[Any] = []
+    fields = (
+        ('url', url),
+        ('events', events),
+        ('is_active', is_active),
+        ('batch_interval_seconds', batch_interval_seconds),
+        ('batch_max_events', batch_max_events)
+    )
+    for column, value in fields:
+        if value is not None:
+            updates.append(f"{column} = %s")
+            values.append(value)
     
-    # Headers
-    headers = {
-        'Content-Type': 'application/json',
-        'X-ARCode-Signature': signature,
-        'X-ARCode-Event': event_type.value
-    }
+    if not updates:
+        return False
     
-    # Create delivery record
-    delivery_id = str(uuid.uuid4())
-    max_retries = 3
-    retry_count = 0
+    try:
+        with db_cursor() as cursor:
+            cursor.execute(
+                f"UPDATE webhooks SET {', '.join(updates)} WHERE id = %s",
+                values + [webhook_id]
+            )
+            updated = cursor.rowcount > 0
+        
+        invalidate_subscription_index()
+        return updated
     
-    while retry_count <= max_retries:
+    except Exception as e:
+        logger.error(f"Error updating webhook: {e}")
+        raise
+
+def load_subscribed_webhooks(event_type: str) -> List[Dict[str, Any]]:
+    """Active webhooks subscribed to an event (GIN idx_webhooks_events)"""
+    with db_cursor(dict_cursor=True) as cursor:
+        cursor.execute("""
+            SELECT * FROM webhooks
+            WHERE is_active = TRUE
+            AND events @> ARRAY[%s]::text[]
+        """, (event_type,))
+        rows = cursor.fetchall()
+    
+    # Types JSON (UUID, datetime -> str): identiques au chargement depuis Redis
+    return json.loads(json.dumps([dict(row) for row in rows], default=str))
+
+class SubscriptionIndex:
+    """Webhooks actifs par événement, indexés par id / user_id / ar_code_id"""
+    
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}  # event -> (version, loaded_at, index)
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+    
+    def _current_version(self) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked > INDEX_VERSION_CHECK_INTERVAL:
+            try:
+                self._version = int(redis_conn.get(INDEX_VERSION_KEY) or 0)
+            except Exception as e:
+                logger.warning(f"Error reading webhook index version: {e}")
+                self._version = self._version or 0
+            self._version_checked = now
+        return self._version
+    
+    def _load(self, event_type: str, version: int) -> List[Dict[str, Any]]:
+        """Liste Redis partagée entre processus, sinon PostgreSQL"""
+        key = INDEX_KEY.format(version=version, event=event_type)
         try:
-            # Send webhook
-            response = requests.post(
-                url,
-                json=full_payload,
-                headers=headers,
-                timeout=10
-            )
-            
-            # Record delivery
-            record_delivery(
-                delivery_id,
-                webhook_id,
-                event_type.value,
-                full_payload,
-                DeliveryStatus.SUCCESS if response.status_code == 200 else DeliveryStatus.FAILED,
-                response.status_code,
-                response.text[:1000] if response.text else None,
-                retry_count
-            )
-            
-            if response.status_code == 200:
-                return
-            
-            # Retry on failure
-            retry_count += 1
-            if retry_count <= max_retries:
-                # Exponential backoff
-                wait_time = 2 ** retry_count
-                import time
-                time.sleep(wait_time)
+            cached = redis_conn.get(key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Error reading webhook index from Redis: {e}")
         
-        except requests.RequestException as e:
-            logger.error(f"Webhook delivery error: {e}")
+        webhooks = load_subscribed_webhooks(event_type)
+        try:
+            redis_conn.set(key, json.dumps(webhooks), ex=WEBHOOK_INDEX_TTL)
+        except Exception:
+            pass
+        return webhooks
+    
+    def _event_index(self, event_type: str) -> Dict[str, Any]:
+        with self._lock:
+            version = self._current_version()
+            entry = self._entries.get(event_type)
+            if entry and entry[0] == version and time.monotonic() - entry[1] < WEBHOOK_INDEX_TTL:
+                return entry[2]
             
-            # Record failed delivery
-            record_delivery(
-                delivery_id,
-                webhook_id,
-                event_type.value,
-                full_payload,
-                DeliveryStatus.FAILED,
-                None,
-                str(e),
-                retry_count
-            )
+            index: Dict[str, Any] = {'by_id': {}, 'by_user': {}, 'by_ar_code': {}, 'global': []}
+            for webhook in self._load(event_type, version):
+                index['by_id'][webhook['id']] = webhook
+                index['by_user'].setdefault(webhook['user_id'], []).append(webhook)
+                if webhook.get('ar_code_id'):
+                    index['by_ar_code'].setdefault(webhook['ar_code_id'], []).append(webhook)
+                else:
+                    index['global'].append(webhook)
             
-            retry_count += 1
-            if retry_count <= max_retries:
-                wait_time = 2 ** retry_count
-                import time
-                time.sleep(wait_time)
+            self._entries[event_type] = (version, time.monotonic(), index)
+            return index
+    
+    def lookup(
+        self,
+        event_type: WebhookEvent,
+        webhook_id: Optional[str] = None,
+        ar_code_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Mêmes filtres que trigger_webhook (webhook_id > ar_code_id > user_id)"""
+        index = self._event_index(event_type.value)
+        
+        if webhook_id:
+            webhook = index['by_id'].get(str(webhook_id))
+            return [webhook] if webhook else []
+        if ar_code_id:
+            return index['by_ar_code'].get(str(ar_code_id), []) + index['global']
+        if user_id:
+            return list(index['by_user'].get(str(user_id), []))
+        return list(index['by_id'].values())
 
-def record_delivery(
-    delivery_id: str,
-    webhook_id: str,
-    event_type: str,
-    payload: Dict[str, Any],
-    status: DeliveryStatus,
-    status_code: Optional[int],
-    response_body: Optional[str],
-    retry_count: int
-):
-    """Record webhook delivery in database"""
+_subscription_index = SubscriptionIndex()
+
+def invalidate_subscription_index():
+    """Invalide l'index dans tous les processus (nouvelle version Redis)"""
+    _subscription_index.reset()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO webhook_deliveries (
-                id, webhook_id, event_type, payload, status,
-                status_code, response_body, retry_count, created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """, (
-            delivery_id,
-            webhook_id,
-            event_type,
-            json.dumps(payload),
-            status.value,
-            status_code,
-            response_body,
-            retry_count,
-            datetime.utcnow()
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-    
+        redis_conn.incr(INDEX_VERSION_KEY)
     except Exception as e:
-        logger.error(f"Error recording delivery: {e}")
+        logger.warning(f"Error invalidating webhook index: {e}")
+
+def find_webhooks(
+    event_type: WebhookEvent,
+    webhook_id: Optional[str] = None,
+    ar_code_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Active webhooks subscribed to an event (subscription index, memory hit when warm)"""
+    return _subscription_index.lookup(event_type, webhook_id, ar_code_id, user_id)
+
+def get_webhook(webhook_id: str) -> Optional[Dict[str, Any]]:
+    """Get webhook by ID"""
+    with db_cursor(dict_cursor=True) as cursor:
+        cursor.execute("SELECT * FROM webhooks WHERE id = %s", (webhook_id,))
+        webhook = cursor.fetchone()
+    
+    return dict(webhook) if webhook else None
 
 
 
@@ -2,49 +2,255 @@
 """
 Worker Manager
 Start RQ workers pour différents types de jobs
+
+Mode pool: un superviseur forke N workers au démarrage, les remplace quand
+ils meurent ou après max_jobs jobs (fuites mémoire Open3D / bpy), et draine
+proprement sur SIGTERM (jobs en cours terminés avant l'arrêt).
 """
 
 import os
 import sys
+import time
+import signal
+import logging
 from pathlib import Path
 import subprocess
+from multiprocessing import Process
+from typing import Dict, List, Optional, Union
+
+from rq_config import QUEUES, RESOURCE_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# Délai de drain avant arrêt forcé des jobs en cours
+DRAIN_TIMEOUT = int(os.getenv('WORKER_DRAIN_TIMEOUT', 3600))
+
+def get_host_resources() -> dict:
+    """Cores et mémoire (GB) disponibles sur la machine"""
+    try:
+        memory_gb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        memory_gb = 0
+    return {'cores': os.cpu_count() or 1, 'memory_gb': memory_gb}
 
-def start_worker(queue_name: str, worker_name: str, num_workers: int = 1):
+def recommended_pool_size(
+    resource_class: str,
+    cores: Optional[int] = None,
+    memory_gb: Optional[float] = None
+) -> int:
     """
-    Start RQ worker
+    Nombre de workers pour une classe de ressources
+    
+    Basé sur les besoins max déclarés par les étapes de la classe
+    (job_stages): min(cores / cores par job, mémoire / mémoire par job).
     
     Args:
-        queue_name: Queue name (high, default, low)
-        worker_name: Worker name
-        num_workers: Number of concurrent workers
+        resource_class: io, cpu, heavy, blender
+        cores: Cores alloués à la classe (défaut: machine)
+        memory_gb: Mémoire allouée à la classe (défaut: machine)
+        
+    Returns:
+        Nombre de workers (>= 1)
+    """
+    from job_stages import resource_requirements
+    
+    host = get_host_resources()
+    cores = cores or host['cores']
+    memory_gb = memory_gb or host['memory_gb']
+    
+    needs = resource_requirements()[resource_class]
+    by_cores = cores // needs['cores']
+    by_memory = int(memory_gb // needs['memory_gb']) if memory_gb else by_cores
+    
+    size = min(by_cores, by_memory)
+    if needs['gpu']:
+        # Un job GPU à la fois par GPU visible
+        gpus = len([d for d in os.getenv('CUDA_VISIBLE_DEVICES', '0').split(',') if d.strip()])
+        size = min(size, gpus)
+    return max(1, size)
+
+def get_worker_queue(queue_name: str):
+    """Queue par priorité ou par classe de ressources"""
+    from rq_config import get_queue, get_resource_queue
+    
+    if queue_name in RESOURCE_CLASSES:
+        return get_resource_queue(queue_name)
+    return get_queue(queue_name)
+
+def _apply_memory_limit(memory_limit_mb: Optional[int]):
+    """
+    Limite d'espace d'adressage du worker (héritée par le work-horse)
+    
+    Un job qui dépasse reçoit MemoryError au lieu de déclencher l'OOM killer
+    de la machine. À éviter sur les workers GPU (CUDA réserve beaucoup
+    d'espace virtuel).
     """
-    from rq import Worker, Queue, Connection
-    from rq_config import redis_conn, get_queue
+    if not memory_limit_mb:
+        return
+    import resource
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _run_worker(
+    queue_names: List[str],
+    worker_name: str,
+    max_jobs: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None
+):
+    """Process worker: un IndexedWorker sur les queues données"""
+    from rq_config import redis_conn, IndexedWorker
     
-    queue = get_queue(queue_name)
+    # Signaux envoyés uniquement par le superviseur (Ctrl-C / systemd KillMode=mixed)
+    os.setpgrp()
     
-    worker = Worker(
-        [queue],
+    _apply_memory_limit(memory_limit_mb)
+    
+    worker = IndexedWorker(
+        [get_worker_queue(name) for name in queue_names],
         connection=redis_conn,
         name=worker_name
     )
     
-    worker.work(with_scheduler=True)
+    worker.work(with_scheduler=True, max_jobs=max_jobs)
+
+class WorkerPool:
+    """Pool de workers RQ supervisé (prespawn, recyclage, drain)"""
+    
+    def __init__(
+        self,
+        queue_names: List[str],
+        name: str,
+        num_workers: int,
+        max_jobs: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None,
+        drain_timeout: int = DRAIN_TIMEOUT
+    ):
+        self.queue_names = queue_names
+        self.name = name
+        self.num_workers = num_workers
+        self.max_jobs = max_jobs
+        self.memory_limit_mb = memory_limit_mb
+        self.drain_timeout = drain_timeout
+        
+        self.processes: Dict[int, Process] = {}
+        self.draining = False
+        self._drain_started: Optional[float] = None
+        self._generation = 0
+    
+    def spawn(self, slot: int):
+        """Démarre le worker d'un slot (nom unique par génération)"""
+        self._generation += 1
+        worker_name = f"{self.name}-{slot}-{self._generation}"
+        process = Process(
+            target=_run_worker,
+            args=(self.queue_names, worker_name, self.max_jobs, self.memory_limit_mb),
+            name=worker_name
+        )
+        process.start()
+        self.processes[slot] = process
+        logger.info(f"Started worker {worker_name} (pid {process.pid})")
+    
+    def request_drain(self, signum=None, frame=None):
+        """SIGTERM/SIGINT: warm shutdown (jobs en cours terminés); 2e signal: arrêt immédiat"""
+        if self.draining:
+            logger.warning("Second stop signal, cold shutdown")
+            self._signal_workers(signal.SIGINT)
+            return
+        
+        logger.info(f"Draining {len(self.processes)} workers...")
+        self.draining = True
+        self._drain_started = time.monotonic()
+        self._signal_workers(signal.SIGINT)
+    
+    def _signal_workers(self, sig: int):
+        for process in self.processes.values():
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, sig)
+                except ProcessLookupError:
+                    pass
+    
+    def run(self):
+        """Boucle de supervision (bloquante)"""
+        for slot in range(self.num_workers):
+            self.spawn(slot)
+        
+        signal.signal(signal.SIGTERM, self.request_drain)
+        signal.signal(signal.SIGINT, self.request_drain)
+        
+        while self.processes:
+            for slot, process in list(self.processes.items()):
+                process.join(timeout=0)
+                if process.is_alive():
+                    continue
+                
+                del self.processes[slot]
+                if not self.draining:
+                    # max_jobs atteint ou crash: remplacement
+                    logger.info(f"Worker {process.name} exited ({process.exitcode}), respawning")
+                    self.spawn(slot)
+            
+            if self.draining and time.monotonic() - self._drain_started > self.drain_timeout:
+                logger.warning("Drain timeout reached, stopping running jobs")
+                self._signal_workers(signal.SIGINT)
+                self._drain_started = time.monotonic()
+            
+            time.sleep(1)
+        
+        logger.info("All workers stopped")
+
+def start_worker(
+    queue_name: Union[str, List[str]],
+    worker_name: str,
+    num_workers: int = 1,
+    max_jobs: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None
+):
+    """
+    Start RQ worker (ou un pool si num_workers > 1)
+    
+    Args:
+        queue_name: Queue name (high, default, low) ou classe (io, cpu, heavy, blender),
+            ou liste de queues (ordre = priorité)
+        worker_name: Worker name
+        num_workers: Number of concurrent workers
+        max_jobs: Recycle le worker après N jobs
+        memory_limit_mb: Limite mémoire par worker (RLIMIT_AS)
+    """
+    queue_names = [queue_name] if isinstance(queue_name, str) else list(queue_name)
+    
+    if num_workers > 1 or max_jobs:
+        WorkerPool(queue_names, worker_name, num_workers, max_jobs, memory_limit_mb).run()
+    else:
+        _run_worker(queue_names, worker_name, memory_limit_mb=memory_limit_mb)
 
 if __name__ == '__main__':
     import argparse
     
     parser = argparse.ArgumentParser(description='Start RQ worker')
-    parser.add_argument('queue', choices=['high', 'default', 'low'], help='Queue name')
+    parser.add_argument('queues', nargs='+', choices=list(QUEUES) + list(RESOURCE_CLASSES),
+                        help='Queue names ou classes de ressources (ordre = priorité)')
     parser.add_argument('--name', default=None, help='Worker name')
-    parser.add_argument('--workers', type=int, default=1, help='Number of workers')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of workers (défaut: dimensionné par classe de ressources)')
+    parser.add_argument('--max-jobs', type=int, default=None, help='Recycle chaque worker après N jobs')
+    parser.add_argument('--memory-limit-mb', type=int, default=None,
+                        help='Limite mémoire par worker (pas sur les workers GPU)')
     
     args = parser.parse_args()
     
-    worker_name = args.name or f"worker-{args.queue}"
+    logging.basicConfig(level=logging.INFO)
+    
+    worker_name = args.name or f"worker-{'-'.join(args.queues)}"
+    
+    if args.workers is None:
+        # Dimensionné sur la classe la plus exigeante du set
+        sizes = [recommended_pool_size(q) for q in args.queues if q in RESOURCE_CLASSES]
+        args.workers = min(sizes) if sizes else 1
+        print(f"Pool size for {', '.join(args.queues)}: {args.workers}")
     
-    print(f"Starting {worker_name} on {args.queue} queue...")
-    start_worker(args.queue, worker_name, args.workers)
+    print(f"Starting {worker_name} on {', '.join(args.queues)} queue(s)...")
+    start_worker(args.queues, worker_name, args.workers, args.max_jobs, args.memory_limit_mb)
 
 
 
@@ -11,8 +11,9 @@ from typing import Dict, Any, Optional
 import logging
 import base64
 import requests
-from job_tracker import update_job_status
-from job_models import JobStatus
+from progress_reporter import report_job_status
+from job_models import JobStatus, JobType
+from job_metrics import JobMetrics
 from rq import get_current_job
 
 logger = logging.getLogger(__name__)
@@ -43,16 +44,17 @@ def process_ai_vision_job(
         Result dict with analysis text
     """
     current_job = get_current_job()
+    metrics = JobMetrics(job_id, JobType.AI_VISION.value)
     
     try:
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=0)
         
         # Load image
         with open(image_path, 'rb') as f:
             image_data = f.read()
             image_base64 = base64.b64encode(image_data).decode('utf-8')
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=30)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=30)
         
         # Call Ollama API
         response = requests.post(
@@ -70,18 +72,20 @@ def process_ai_vision_job(
         result = response.json()
         
         analysis_text = result.get('response', '')
+        metrics.lap('inference')
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=80)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=80)
         
-        # Cache result (optionnel)
-        # ...
+        # Résultat persisté (réutilisé par les soumissions dédoublonnées)
+        from job_tracker import get_job, update_job_metadata
+        update_job_metadata(job_id, {'analysis': analysis_text})
         
         # Get job info for notification
-        from job_tracker import get_job
         job_info = get_job(job_id)
         asset_id = job_info.get('asset_id') if job_info else None
         
-        update_job_status(job_id, JobStatus.COMPLETED, progress=100)
+        metrics.finish(JobStatus.COMPLETED)
+        report_job_status(job_id, JobStatus.COMPLETED, progress=100)
         
         # Send email notification
         try:
@@ -104,7 +108,8 @@ def process_ai_vision_job(
     
     except Exception as e:
         logger.error(f"Error processing AI vision job {job_id}: {e}")
-        update_job_status(
+        metrics.finish(JobStatus.FAILED)
+        report_job_status(
             job_id,
             JobStatus.FAILED,
             progress=0,
@@ -133,9 +138,10 @@ def process_ai_generation_job(
         Result dict with image URL
     """
     current_job = get_current_job()
+    metrics = JobMetrics(job_id, JobType.AI_GENERATION.value)
     
     try:
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=0)
         
         if config is None:
             config = {}
@@ -170,7 +176,7 @@ def process_ai_generation_job(
         else:
             raise ValueError(f"Unsupported generation type: {generation_type}")
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=20)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=20)
         
         # Call Stable Diffusion API
         response = requests.post(
@@ -181,8 +187,9 @@ def process_ai_generation_job(
         
         response.raise_for_status()
         result = response.json()
+        metrics.lap('inference')
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=80)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=80)
         
         # Get generated image
         if 'images' in result and len(result['images']) > 0:
@@ -198,13 +205,16 @@ def process_ai_generation_job(
                 key,
                 'image/png'
             )
+            metrics.add_uploaded(len(image_data))
+            metrics.lap('upload')
             
             # Get job info for notification
             from job_tracker import get_job
             job_info = get_job(job_id)
             asset_id = job_info.get('asset_id') if job_info else None
             
-            update_job_status(
+            metrics.finish(JobStatus.COMPLETED)
+            report_job_status(
                 job_id,
                 JobStatus.COMPLETED,
                 progress=100,
@@ -236,7 +246,8 @@ def process_ai_generation_job(
     
     except Exception as e:
         logger.error(f"Error processing AI generation job {job_id}: {e}")
-        update_job_status(
+        metrics.finish(JobStatus.FAILED)
+        report_job_status(
             job_id,
             JobStatus.FAILED,
             progress=0,
@@ -7,124 +7,94 @@ Worker pour traitement photogrammetry avec COLMAP
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
-from job_tracker import update_job_status, get_job
-from job_models import JobStatus
+from job_tracker import get_job, update_job_metadata
+from progress_reporter import report_job_status
+from job_models import JobStatus, JobType
+from job_metrics import JobMetrics
 from rq import get_current_job
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from photogrammetry.pipeline import PhotogrammetryPipeline
+from photogrammetry.scratch_space import (
+    workspace_path,
+    allocate_workspace,
+    release_workspace,
+    check_quota
+)
+from photogrammetry.video_source import open_video, is_r2_source
 
 logger = logging.getLogger(__name__)
 
-def process_photogrammetry_job(job_id: str, video_path: str, user_id: str) -> Dict[str, Any]:
+def process_photogrammetry_job(
+    job_id: str,
+    video_path: str,
+    user_id: str,
+    quality: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Process photogrammetry job avec COLMAP
     
     Args:
         job_id: Job ID
-        video_path: Path to video file
+        video_path: Path to video file (ou r2://<key>)
         user_id: User ID
+        quality: Tier de résolution (draft, standard, high)
         
     Returns:
         Result dict with output URLs
     """
     current_job = get_current_job()
     
+    # Workspace
+    workspace = workspace_path('photogrammetry', job_id)
+    metrics = JobMetrics(job_id, JobType.PHOTOGRAMMETRY.value, workspace)
+    
     try:
         # Update status to processing
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        
+        allocate_workspace('photogrammetry', job_id)
         
-        # Workspace
-        workspace = Path(f"/tmp/photogrammetry/processing/{job_id}")
-        workspace.mkdir(parents=True, exist_ok=True)
+        # Vidéo locale, ou téléchargée depuis R2 dans le workspace
+        video = open_video(video_path, workspace)
+        if is_r2_source(video_path):
+            metrics.lap('input_download')
         
         # Initialize pipeline
-        pipeline = PhotogrammetryPipeline(str(workspace))
+        pipeline = PhotogrammetryPipeline(str(workspace), verify_hash=video.hash_check)
         
         # Update progress
         def progress_callback(stage: str, progress: int, message: str):
             """Callback pour updates progression"""
-            update_job_status(job_id, JobStatus.PROCESSING, progress=progress)
+            check_quota('photogrammetry', job_id, metrics.lap(stage).scratch_bytes)
+            report_job_status(job_id, JobStatus.PROCESSING, progress=progress)
             if current_job:
                 current_job.meta['stage'] = stage
                 current_job.meta['message'] = message
                 current_job.save_meta()
         
         # Run pipeline
-        update_job_status(job_id, JobStatus.PROCESSING, progress=10)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=10)
         results = pipeline.run_full_pipeline(
-            video_path,
+            video.source,
             extract_fps=30,
-            progress_callback=progress_callback
+            quality=quality,
+            progress_callback=progress_callback,
+            content_hash=video.content_hash
         )
         
         if results.get('success'):
-            # Upload results to R2
-            from api.r2_client import upload_file
-            
-            output_urls = {}
-            
-            # Upload GLB model
-            if results.get('glb_path'):
-                with open(results['glb_path'], 'rb') as f:
-                    glb_data = f.read()
-                    key = f"models/{user_id}/{job_id}/model.glb"
-                    output_urls['glb_url'] = upload_file(
-                        glb_data,
-                        key,
-                        'model/gltf-binary'
-                    )
-            
-            # Upload USDZ model
-            if results.get('usdz_path'):
-                with open(results['usdz_path'], 'rb') as f:
-                    usdz_data = f.read()
-                    key = f"models/{user_id}/{job_id}/model.usdz"
-                    output_urls['usdz_url'] = upload_file(
-                        usdz_data,
-                        key,
-                        'model/vnd.usdz+zip'
-                    )
-            
-            # Get job info for notification
-            job_info = get_job(job_id)
-            asset_id = job_info.get('asset_id') if job_info else None
-            
-            # Update job as completed
-            update_job_status(
-                job_id,
-                JobStatus.COMPLETED,
-                progress=100,
-                output_url=output_urls.get('glb_url')
-            )
-            
-            # Send email notification
-            try:
-                from queue.job_notifications import notify_job_completion
-                notify_job_completion(
-                    job_id=job_id,
-                    user_id=user_id,
-                    job_type='photogrammetry',
-                    asset_id=asset_id,
-                    asset_url=output_urls.get('glb_url'),
-                    asset_name=f"Modèle 3D {job_id[:8]}"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to send completion notification: {e}")
-            
-            return {
-                'success': True,
-                'output_urls': output_urls,
-                'job_id': job_id
-            }
+            return finalize_photogrammetry_job(job_id, user_id, results, metrics)
         else:
             # Job failed
             error_msg = results.get('error', 'Processing failed')
-            update_job_status(
+            metrics.finish(JobStatus.FAILED)
+            release_workspace('photogrammetry', job_id, succeeded=False)
+            report_job_status(
                 job_id,
                 JobStatus.FAILED,
                 progress=0,
@@ -137,7 +107,14 @@ def process_photogrammetry_job(job_id: str, video_path: str, user_id: str) -> Di
     
     except Exception as e:
         logger.error(f"Error processing photogrammetry job {job_id}: {e}")
-        update_job_status(
+        metrics.finish(JobStatus.FAILED)
+        release_workspace(
+            'photogrammetry',
+            job_id,
+            succeeded=False,
+            will_retry=bool(current_job and current_job.retries_left)
+        )
+        report_job_status(
             job_id,
             JobStatus.FAILED,
             progress=0,
@@ -145,3 +122,72 @@ def process_photogrammetry_job(job_id: str, video_path: str, user_id: str) -> Di
         )
         raise
 
+def finalize_photogrammetry_job(
+    job_id: str,
+    user_id: str,
+    results: Dict[str, Any],
+    metrics: Optional[JobMetrics] = None
+) -> Dict[str, Any]:
+    """
+    Publication des résultats, job COMPLETED et notification
+    
+    GLB (par LOD, Draco), USDZ et miniature sont produits et uploadés en
+    parallèle (artifact_publisher); le manifest liste URLs, tailles et hashes.
+    
+    Args:
+        job_id: Job ID
+        user_id: User ID
+        results: Résultats du pipeline
+        metrics: Mesures de ressources du job (clôturées ici)
+        
+    Returns:
+        Result dict with output URLs
+    """
+    from photogrammetry.artifact_publisher import publish_artifacts
+    
+    manifest = publish_artifacts(job_id, user_id, results, str(Path(results['workspace']) / 'export'))
+    output_urls = {f"{name}_url": artifact['url'] for name, artifact in manifest['artifacts'].items()}
+    output_urls['manifest_url'] = manifest['manifest_url']
+    
+    if metrics:
+        metrics.add_uploaded(sum(artifact['size'] for artifact in manifest['artifacts'].values()))
+        metrics.lap('publish')
+    
+    # Get job info for notification
+    job_info = get_job(job_id)
+    asset_id = job_info.get('asset_id') if job_info else None
+    
+    update_job_metadata(job_id, {'output_urls': output_urls, 'artifacts': manifest})
+    
+    if metrics:
+        metrics.finish(JobStatus.COMPLETED)
+    release_workspace('photogrammetry', job_id, succeeded=True)
+    
+    # Update job as completed
+    report_job_status(
+        job_id,
+        JobStatus.COMPLETED,
+        progress=100,
+        output_url=output_urls.get('glb_url')
+    )
+    
+    # Send email notification
+    try:
+        from queue.job_notifications import notify_job_completion
+        notify_job_completion(
+            job_id=job_id,
+            user_id=user_id,
+            job_type='photogrammetry',
+            asset_id=asset_id,
+            asset_url=output_urls.get('glb_url'),
+            asset_name=f"Modèle 3D {job_id[:8]}"
+        )
+    except Exception as e:
+        logger.warning(f"Failed to send completion notification: {e}")
+    
+    return {
+        'success': True,
+        'output_urls': output_urls,
+        'artifacts': manifest['artifacts'],
+        'job_id': job_id
+    }
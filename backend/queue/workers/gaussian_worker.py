@@ -10,10 +10,35 @@ from pathlib import Path
 from typing import Dict, Any
 import logging
 import subprocess
-from job_tracker import update_job_status
-from job_models import JobStatus
+from datetime import datetime
+from job_tracker import update_job_metadata
+from progress_reporter import report_job_status
+from job_models import JobStatus, JobType
+from job_metrics import JobMetrics
 from rq import get_current_job
 
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from gaussian.training_metrics import (
+    TrainingMetricsReader,
+    EarlyStoppingConfig,
+    monitor_training
+)
+from gaussian.checkpoints import (
+    find_resume_checkpoint,
+    load_training_state,
+    save_training_state
+)
+from photogrammetry.frame_extractor import extract_frames_cached
+from photogrammetry.video_source import open_video, is_r2_source
+from photogrammetry.scratch_space import (
+    workspace_path,
+    allocate_workspace,
+    release_workspace,
+    check_quota
+)
+
 logger = logging.getLogger(__name__)
 
 def process_gaussian_splatting_job(
@@ -27,7 +52,7 @@ def process_gaussian_splatting_job(
     
     Args:
         job_id: Job ID
-        video_path: Path to video file
+        video_path: Path to video file (ou r2://<key>)
         user_id: User ID
         config: Training configuration
         
@@ -36,87 +61,147 @@ def process_gaussian_splatting_job(
     """
     current_job = get_current_job()
     
+    # Workspace
+    workspace = workspace_path('gaussian', job_id)
+    metrics = JobMetrics(job_id, JobType.GAUSSIAN_SPLATTING.value, workspace)
+    
     try:
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=0)
         
-        # Workspace
-        workspace = Path(f"/tmp/gaussian/processing/{job_id}")
-        workspace.mkdir(parents=True, exist_ok=True)
+        allocate_workspace('gaussian', job_id)
         
         # Extract frames (progress 10-30%)
-        frames_dir = workspace / "frames"
-        frames_dir.mkdir(exist_ok=True)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=10)
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=10)
+        # Vidéo locale, ou téléchargée depuis R2 dans le workspace
+        video = open_video(video_path, workspace)
+        if is_r2_source(video_path):
+            metrics.lap('input_download')
         
-        # Extract frames avec ffmpeg
-        subprocess.run([
-            'ffmpeg', '-i', video_path,
-            '-vf', 'fps=30',
-            str(frames_dir / 'frame_%06d.jpg')
-        ], check=True)
+        # Cache partagé avec le worker COLMAP: réutilisé sur retry ou double soumission
+        extraction = extract_frames_cached(
+            video.source,
+            fps=30,
+            content_hash=video.content_hash,
+            verify_hash=video.hash_check
+        )
+        frames_dir = Path(extraction['frames_dir'])
+        frames_reused = extraction['cache_hit']
+        if frames_reused:
+            logger.info(f"Job {job_id}: reusing extracted frames {extraction['cache_key']}")
         
-        frame_count = len(list(frames_dir.glob('*.jpg')))
+        frame_count = extraction['frame_count']
         if frame_count < 100:
             raise ValueError(f"Insufficient frames: {frame_count} < 100")
         
-        update_job_status(job_id, JobStatus.PROCESSING, progress=30)
+        check_quota('gaussian', job_id, metrics.lap('frame_extraction').scratch_bytes)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=30)
         
         # Training avec Nerfstudio (progress 30-90%)
         output_dir = workspace / "output"
         output_dir.mkdir(exist_ok=True)
         
-        # Run training (simplifié - ajuster selon setup Nerfstudio)
-        training_cmd = [
-            'ns-train', 'gaussian-splatting',
-            '--data', str(frames_dir),
-            '--output-dir', str(output_dir),
-            '--max-num-iterations', str(config.get('max_iterations', 30000)),
-            '--save-interval', '5000'
-        ]
+        max_iterations = config.get('max_iterations', 30000)
+        training_state = load_training_state(str(output_dir))
+        resume = None if training_state else find_resume_checkpoint(str(output_dir))
         
-        # Monitor training progress
-        process = subprocess.Popen(
-            training_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Monitor output pour progress updates
-        progress = 30
-        for line in process.stdout:
+        if frames_reused or training_state or resume:
+            resume_state = {
+                'frames_reused': frames_reused,
+                'training_completed': bool(training_state),
+                'resumed_from_step': resume['step'] if resume else None,
+                'checkpoint': resume['checkpoint'] if resume else None,
+                'retries_left': current_job.retries_left if current_job else None,
+                'resumed_at': datetime.utcnow().isoformat()
+            }
+            update_job_metadata(job_id, {'resume': resume_state})
             if current_job:
-                current_job.meta['training_log'] = line
+                current_job.meta['resume'] = resume_state
                 current_job.save_meta()
-            
-            # Parse progress depuis logs (ajuster selon format Nerfstudio)
-            if 'iteration' in line.lower():
-                progress = min(90, 30 + (int(line.split()[1]) / config.get('max_iterations', 30000)) * 60)
-                update_job_status(job_id, JobStatus.PROCESSING, progress=int(progress))
         
-        process.wait()
+        if training_state:
+            logger.info(f"Job {job_id}: training already completed, skipping to export")
+        else:
+            # Run training (simplifié - ajuster selon setup Nerfstudio)
+            training_cmd = [
+                'ns-train', 'gaussian-splatting',
+                '--data', str(frames_dir),
+                '--output-dir', str(output_dir),
+                '--max-num-iterations', str(max_iterations),
+                '--save-interval', '5000',
+                '--vis', 'tensorboard'
+            ]
+            
+            if resume:
+                logger.info(f"Job {job_id}: resuming training from step {resume['step']}")
+                training_cmd += [
+                    '--load-dir', resume['load_dir'],
+                    '--load-step', str(resume['step'])
+                ]
+            
+            # Monitor training progress (stderr fusionné pour éviter un pipe bloqué)
+            process = subprocess.Popen(
+                training_cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True
+            )
+            
+            def on_training_update(reader: TrainingMetricsReader, line: str):
+                """Publie métriques + progression (30-90%)"""
+                if current_job:
+                    current_job.meta['training_log'] = line
+                    current_job.meta['training_metrics'] = reader.series.to_meta()
+                    current_job.save_meta()
+                
+                if reader.progress is not None:
+                    progress = 30 + int(reader.progress * 60)
+                    report_job_status(job_id, JobStatus.PROCESSING, progress=progress)
+            
+            training = monitor_training(
+                process,
+                TrainingMetricsReader(str(output_dir), max_iterations),
+                early_stopping=EarlyStoppingConfig.from_config(config.get('early_stopping')),
+                on_update=on_training_update
+            )
+            
+            if training['early_stopped']:
+                logger.info(f"Job {job_id}: early stopping at step {training['stop_step']}")
+                if current_job:
+                    current_job.meta['early_stopped_at'] = training['stop_step']
+                    current_job.save_meta()
+            elif training['return_code'] != 0:
+                raise subprocess.CalledProcessError(training['return_code'], training_cmd)
+            
+            final_checkpoint = find_resume_checkpoint(str(output_dir))
+            training_state = {
+                'completed': True,
+                'early_stopped': training['early_stopped'],
+                'final_step': final_checkpoint['step'] if final_checkpoint else None,
+                'config': final_checkpoint['config'] if final_checkpoint else None
+            }
+            save_training_state(str(output_dir), training_state)
         
-        if process.returncode != 0:
-            raise subprocess.CalledProcessError(process.returncode, training_cmd)
+        check_quota('gaussian', job_id, metrics.lap('training').scratch_bytes)
         
         # Export PLY file (progress 90-95%)
-        update_job_status(job_id, JobStatus.PROCESSING, progress=90)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=90)
         
         ply_output = output_dir / "splat.ply"
         
-        # Export command (ajuster selon Nerfstudio)
+        # Export command (config du run qui a produit le dernier checkpoint)
         export_cmd = [
             'ns-export', 'gaussian-splatting',
-            '--load-config', str(output_dir / "config.yml"),
+            '--load-config', training_state.get('config') or str(output_dir / "config.yml"),
             '--output-dir', str(output_dir),
             '--format', 'ply'
         ]
         
         subprocess.run(export_cmd, check=True)
+        metrics.lap('export')
         
         # Upload to R2 (progress 95-100%)
-        update_job_status(job_id, JobStatus.PROCESSING, progress=95)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=95)
         
         from api.r2_client import upload_file
         
@@ -129,13 +214,17 @@ def process_gaussian_splatting_job(
                     key,
                     'application/octet-stream'
                 )
+            metrics.add_uploaded(len(ply_data))
+            metrics.lap('upload')
             
             # Get job info for notification
             from job_tracker import get_job
             job_info = get_job(job_id)
             asset_id = job_info.get('asset_id') if job_info else None
             
-            update_job_status(
+            metrics.finish(JobStatus.COMPLETED)
+            release_workspace('gaussian', job_id, succeeded=True)
+            report_job_status(
                 job_id,
                 JobStatus.COMPLETED,
                 progress=100,
@@ -166,7 +255,14 @@ def process_gaussian_splatting_job(
     
     except Exception as e:
         logger.error(f"Error processing Gaussian Splatting job {job_id}: {e}")
-        update_job_status(
+        metrics.finish(JobStatus.FAILED)
+        release_workspace(
+            'gaussian',
+            job_id,
+            succeeded=False,
+            will_retry=bool(current_job and current_job.retries_left)
+        )
+        report_job_status(
             job_id,
             JobStatus.FAILED,
             progress=0,
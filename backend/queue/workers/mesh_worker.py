@@ -10,10 +10,22 @@ from pathlib import Path
 from typing import Dict, Any
 import logging
 import subprocess
-from job_tracker import update_job_status
-from job_models import JobStatus
+from job_tracker import update_job_metadata
+from progress_reporter import report_job_status
+from job_models import JobStatus, JobType
+from job_metrics import JobMetrics
 from rq import get_current_job
 
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from photogrammetry.scratch_space import (
+    workspace_path,
+    allocate_workspace,
+    release_workspace,
+    check_quota
+)
+
 logger = logging.getLogger(__name__)
 
 def process_mesh_optimization_job(
@@ -35,12 +47,13 @@ def process_mesh_optimization_job(
         Result dict with optimized mesh URLs
     """
     current_job = get_current_job()
+    workspace = workspace_path('mesh', job_id)
+    metrics = JobMetrics(job_id, JobType.MESH_OPTIMIZATION.value, workspace)
     
     try:
-        update_job_status(job_id, JobStatus.PROCESSING, progress=0)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=0)
         
-        workspace = Path(f"/tmp/mesh/processing/{job_id}")
-        workspace.mkdir(parents=True, exist_ok=True)
+        allocate_workspace('mesh', job_id)
         
         output_urls = {}
         
@@ -49,7 +62,7 @@ def process_mesh_optimization_job(
             progress_start = (i / len(lod_levels)) * 90
             progress_end = ((i + 1) / len(lod_levels)) * 90
             
-            update_job_status(
+            report_job_status(
                 job_id,
                 JobStatus.PROCESSING,
                 progress=int(progress_start)
@@ -81,17 +94,23 @@ def process_mesh_optimization_job(
                 key = f"models/{user_id}/{job_id}/model_{lod_level}.glb"
                 url = upload_file(mesh_data, key, 'model/gltf-binary')
                 output_urls[f'{lod_level}_url'] = url
+            metrics.add_uploaded(len(mesh_data))
+            check_quota('mesh', job_id, metrics.lap(f'lod_{lod_level}').scratch_bytes)
             
-            update_job_status(
+            report_job_status(
                 job_id,
                 JobStatus.PROCESSING,
                 progress=int(progress_end)
             )
         
         # Upload final optimized mesh
-        update_job_status(job_id, JobStatus.PROCESSING, progress=95)
+        report_job_status(job_id, JobStatus.PROCESSING, progress=95)
         
-        update_job_status(
+        update_job_metadata(job_id, {'output_urls': output_urls})
+        
+        metrics.finish(JobStatus.COMPLETED)
+        release_workspace('mesh', job_id, succeeded=True)
+        report_job_status(
             job_id,
             JobStatus.COMPLETED,
             progress=100,
@@ -106,7 +125,14 @@ def process_mesh_optimization_job(
     
     except Exception as e:
         logger.error(f"Error processing mesh optimization job {job_id}: {e}")
-        update_job_status(
+        metrics.finish(JobStatus.FAILED)
+        release_workspace(
+            'mesh',
+            job_id,
+            succeeded=False,
+            will_retry=bool(current_job and current_job.retries_left)
+        )
+        report_job_status(
             job_id,
             JobStatus.FAILED,
             progress=0,
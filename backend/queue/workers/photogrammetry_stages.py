@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Photogrammetry Stage Worker
+Exécute une étape du pipeline photogrammétrie (voir job_stages)
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, Any, Optional
+import logging
+from progress_reporter import report_job_status
+from job_models import JobStatus, JobType
+from job_metrics import JobMetrics
+from job_stages import PHOTOGRAMMETRY_STAGES, get_photogrammetry_stage, stage_job_id, cancel_remaining_stages
+from rq_config import index_job
+from rq import get_current_job
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from photogrammetry.pipeline import PhotogrammetryPipeline, STAGES
+from photogrammetry.scratch_space import (
+    workspace_path,
+    allocate_workspace,
+    release_workspace,
+    check_quota
+)
+from photogrammetry.video_source import open_video, is_r2_source
+from workers.colmap_worker import finalize_photogrammetry_job
+
+logger = logging.getLogger(__name__)
+
+# Progression en fin d'étape du pipeline
+STAGE_PROGRESS = {name: progress for name, _, progress in STAGES}
+
+def run_photogrammetry_stage(
+    job_id: str,
+    stage: str,
+    video_path: str,
+    user_id: str,
+    quality: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Exécute une étape d'un job photogrammétrie
+    
+    Les étapes déjà réussies (état du workspace) sont sautées: un retry
+    RQ reprend là où l'étape a échoué.
+    
+    Args:
+        job_id: Job ID (processing_jobs)
+        stage: Nom de l'étape (job_stages.PHOTOGRAMMETRY_STAGES)
+        video_path: Path to video file (ou r2://<key>)
+        user_id: User ID
+        quality: Tier de résolution (draft, standard, high)
+    
+    Returns:
+        Résultat de l'étape
+    """
+    spec = get_photogrammetry_stage(stage)
+    current_job = get_current_job()
+    workspace = workspace_path('photogrammetry', job_id)
+    metrics = JobMetrics(job_id, JobType.PHOTOGRAMMETRY.value, workspace)
+    
+    try:
+        index_job(
+            job_id,
+            queue=spec.resource_class,
+            state='started',
+            stage=spec.name,
+            rq_job_id=stage_job_id(job_id, spec.name),
+            worker=current_job.worker_name if current_job else None
+        )
+        
+        # Réservé par la première étape, réactivé par les suivantes
+        allocate_workspace('photogrammetry', job_id)
+        pipeline = PhotogrammetryPipeline(str(workspace))
+        
+        if pipeline.state_path.exists():
+            results = pipeline.load_state()
+        else:
+            report_job_status(job_id, JobStatus.PROCESSING, progress=0)
+            results = pipeline.start(video_path, extract_fps=30, quality=quality)
+        
+        # Seule l'extraction lit la vidéo: téléchargée depuis R2 par cette étape
+        if 'frame_extraction' in spec.pipeline_stages and not results['stages'].get('frame_extraction'):
+            video = open_video(video_path, workspace)
+            if is_r2_source(video_path):
+                metrics.lap('input_download')
+            results['video_path'] = video.source
+            results['video_sha256'] = video.content_hash
+            pipeline.verify_hash = video.hash_check
+        
+        for pipeline_stage in spec.pipeline_stages:
+            if results['stages'].get(pipeline_stage):
+                logger.info(f"Job {job_id}: {pipeline_stage} already done, skipping")
+                continue
+            
+            _, message = pipeline.run_stage(pipeline_stage, results)
+            check_quota('photogrammetry', job_id, metrics.lap(pipeline_stage).scratch_bytes)
+            report_job_status(job_id, JobStatus.PROCESSING, progress=STAGE_PROGRESS[pipeline_stage])
+            if current_job:
+                current_job.meta['stage'] = pipeline_stage
+                current_job.meta['message'] = message
+                current_job.save_meta()
+        
+        if spec.name == 'finalize':
+            results['success'] = True
+            index_job(job_id, state='finished', worker='')
+            return finalize_photogrammetry_job(job_id, user_id, results, metrics)
+        
+        # Totaux du job publiés par l'étape finalize
+        metrics.finish(JobStatus.PROCESSING, final=False)
+        
+        # Étape suivante: débloquée par la dépendance RQ
+        next_spec = PHOTOGRAMMETRY_STAGES[PHOTOGRAMMETRY_STAGES.index(spec) + 1]
+        index_job(
+            job_id,
+            queue=next_spec.resource_class,
+            state='queued',
+            stage=next_spec.name,
+            rq_job_id=stage_job_id(job_id, next_spec.name),
+            worker=''
+        )
+        
+        return {
+            'success': True,
+            'job_id': job_id,
+            'stage': spec.name
+        }
+    
+    except Exception as e:
+        logger.error(f"Error in photogrammetry stage {stage} for job {job_id}: {e}")
+        metrics.finish(JobStatus.FAILED)
+        will_retry = bool(current_job and current_job.retries_left)
+        release_workspace('photogrammetry', job_id, succeeded=False, will_retry=will_retry)
+        if not will_retry:
+            try:
+                cancel_remaining_stages(job_id, spec.name)
+            except Exception as cancel_error:
+                logger.error(f"Error cancelling stages after {stage} for job {job_id}: {cancel_error}")
+        report_job_status(
+            job_id,
+            JobStatus.FAILED,
+            progress=0,
+            error_message=f"{stage}: {e}"
+        )
+        raise
@@ -23,6 +23,7 @@ ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/quicktime', 'video/x-msvideo']
 ALLOWED_3D_TYPES = ['model/gltf-binary', 'model/gltf+json', 'application/octet-stream']  # GLB, USDZ
 CLAMAV_ENABLED = os.getenv('CLAMAV_ENABLED', 'true').lower() == 'true'
 CLAMAV_SOCKET = os.getenv('CLAMAV_SOCKET', '/var/run/clamav/clamd.ctl')
+HASH_CHUNK_SIZE = 1024 * 1024
 
 def scan_file_with_clamav(file_path: str) -> Tuple[bool, Optional[str]]:
     """
@@ -151,7 +152,7 @@ def calculate_file_hash(file_path: str) -> str:
     sha256 = hashlib.sha256()
     
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
             sha256.update(chunk)
     
     return sha256.hexdigest()
@@ -159,7 +160,8 @@ def calculate_file_hash(file_path: str) -> str:
 def validate_upload(
     file_path: str,
     file_type: str = None,
-    scan_virus: bool = True
+    scan_virus: bool = True,
+    ingested: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Complete upload validation
@@ -168,6 +170,8 @@ def validate_upload(
         file_path: Path to uploaded file
         file_type: Expected type category
         scan_virus: Whether to scan for viruses
+        ingested: Result of upload_ingest.ingest_stream for this file; its
+            size, hash and sniffed type are reused instead of re-reading the file
         
     Returns:
         Validation result dict
@@ -186,14 +190,29 @@ def validate_upload(
         return result
     
     # Validate file size
-    size_valid, file_size = validate_file_size(file_path)
+    if ingested:
+        file_size = ingested['file_size']
+        size_valid = file_size <= MAX_FILE_SIZE
+    else:
+        size_valid, file_size = validate_file_size(file_path)
     result['file_size'] = file_size
     
     if not size_valid:
         result['errors'].append(f'File size exceeds limit ({MAX_FILE_SIZE / 1024 / 1024}MB)')
     
-    # Validate file type
-    type_valid, mime_type = validate_file_type(file_path, file_type)
+    # Validate file type (sniffed from the first bytes during ingestion)
+    if ingested:
+        mime_type = ingested['mime_type']
+        if file_type == 'image':
+            type_valid = mime_type in ALLOWED_IMAGE_TYPES
+        elif file_type == 'video':
+            type_valid = mime_type in ALLOWED_VIDEO_TYPES
+        elif file_type == '3d':
+            type_valid = Path(file_path).suffix.lower() in ['.glb', '.usdz', '.ply']
+        else:
+            type_valid = True
+    else:
+        type_valid, mime_type = validate_file_type(file_path, file_type)
     result['mime_type'] = mime_type
     
     if not type_valid:
@@ -211,10 +230,13 @@ def validate_upload(
             result['errors'].append(f'Virus detected: {virus_name}')
     
     # Calculate hash
-    try:
-        result['file_hash'] = calculate_file_hash(file_path)
-    except Exception as e:
-        logger.error(f"Hash calculation error: {e}")
+    if ingested:
+        result['file_hash'] = ingested['file_hash']
+    else:
+        try:
+            result['file_hash'] = calculate_file_hash(file_path)
+        except Exception as e:
+            logger.error(f"Hash calculation error: {e}")
     
     # Final validation
     result['valid'] = len(result['errors']) == 0
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Upload Ingest
+Streaming ingestion of uploads: one pass over the request body
+
+The stream is written to disk in large chunks while SHA-256 and size are
+computed incrementally. The container type is sniffed from the first bytes,
+and the upload is aborted as soon as it exceeds the size limit or does not
+match the expected type. Callers pass the returned hash/size/type to later
+stages (validate_upload, dedup, frame cache) instead of re-reading the file.
+
+Resumable uploads write each chunk in place at its offset (ingest_chunk),
+so parallel chunks need no assembly copy; hash_file computes the content
+hash once all chunks are on disk.
+"""
+
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, BinaryIO, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(250 * 1024 * 1024)))  # 250MB
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', str(1024 * 1024)))  # 1MB
+
+# Bytes needed for sniffing (ISO BMFF ftyp box, RIFF header)
+SNIFF_BYTES = 64
+
+# Expected category -> accepted MIME types
+CONTAINER_TYPES = {
+    'video': {'video/mp4', 'video/quicktime', 'video/x-msvideo'},
+    'image': {'image/jpeg', 'image/png', 'image/webp', 'image/gif'},
+    '3d': {'model/gltf-binary', 'model/vnd.usdz+zip', 'application/x-ply'}
+}
+
+# QuickTime atoms that can start a .mov without ftyp
+QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+class UploadRejected(Exception):
+    """Upload aborted (too large, unsupported type, empty)"""
+    
+    def __init__(self, message: str, reason: str, status_code: int = 400):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """
+    Detect container MIME type from the first bytes of a file
+    
+    Args:
+        head: First bytes (SNIFF_BYTES is enough)
+    
+    Returns:
+        MIME type, None if unknown
+    """
+    if len(head) >= 12 and head[4:8] == b'ftyp':
+        brand = head[8:12]
+        return 'video/quicktime' if brand == b'qt  ' else 'video/mp4'
+    if len(head) >= 8 and head[4:8] in QUICKTIME_ATOMS:
+        return 'video/quicktime'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'glTF':
+        return 'model/gltf-binary'
+    if head[:4] == b'PK\x03\x04':
+        return 'model/vnd.usdz+zip'
+    if head[:4] == b'ply\n' or head[:5] == b'ply\r\n':
+        return 'application/x-ply'
+    return None
+
+def _chunks(stream: BinaryIO, chunk_size: int) -> Iterable[bytes]:
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def ingest_stream(
+    stream: BinaryIO,
+    dest_path: str,
+    max_size: int = MAX_FILE_SIZE,
+    expected_type: Optional[str] = None,
+    chunk_size: int = INGEST_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Write an upload stream to disk, hashing and sizing it on the fly
+    
+    The file is written to <dest_path>.part and renamed on success; nothing
+    is left on disk when the upload is rejected.
+    
+    Args:
+        stream: Readable binary stream (request body, multipart part)
+        dest_path: Final file path
+        max_size: Size limit in bytes (abort as soon as exceeded)
+        expected_type: Expected category ('video', 'image', '3d', None for any)
+        chunk_size: Read/write chunk size
+    
+    Returns:
+        Dict with file_path, file_size, file_hash (SHA-256 hex), mime_type
+    
+    Raises:
+        UploadRejected: too large (413), unsupported type (415) or empty (400)
+    """
+    dest = Path(dest_path)
+    part = dest.with_name(dest.name + '.part')
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b''
+    mime_type = None
+    
+    try:
+        with open(part, 'wb') as f:
+            for chunk in _chunks(stream, chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadRejected(
+                        f'File size exceeds limit ({max_size / 1024 / 1024:.0f}MB)',
+                        'too_large',
+                        413
+                    )
+                
+                # Type checked on the first bytes, before writing the rest
+                if mime_type is None and len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES:
+                        mime_type = _check_type(head, expected_type)
+                
+                sha256.update(chunk)
+                f.write(chunk)
+        
+        if size == 0:
+            raise UploadRejected('Empty file', 'empty', 400)
+        if mime_type is None:
+            mime_type = _check_type(head, expected_type)
+        
+        os.replace(part, dest)
+    
+    except BaseException:
+        try:
+            part.unlink()
+        except OSError:
+            pass
+        raise
+    
+    return {
+        'file_path': str(dest),
+        'file_size': size,
+        'file_hash': sha256.hexdigest(),
+        'mime_type': mime_type
+    }
+
+def ingest_chunk(
+    stream: BinaryIO,
+    dest_path: str,
+    offset: int,
+    length: int,
+    chunk_size: int = INGEST_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Write one chunk of a resumable upload at its offset in the destination file
+    
+    Chunks are written with pwrite on their own file descriptor, so several
+    chunks of the same upload can be received in parallel. Re-sending a
+    chunk overwrites the same bytes.
+    
+    Args:
+        stream: Readable binary stream (chunk request body)
+        dest_path: Upload file (created by the upload session)
+        offset: Byte offset of the chunk in the file
+        length: Exact expected chunk length
+        chunk_size: Read/write chunk size
+    
+    Returns:
+        Dict with size, sha256 (hex digest of the chunk), head (first SNIFF_BYTES)
+    
+    Raises:
+        UploadRejected: chunk longer (413) or shorter (400) than expected
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b''
+    
+    fd = os.open(dest_path, os.O_WRONLY)
+    try:
+        for chunk in _chunks(stream, chunk_size):
+            if size + len(chunk) > length:
+                raise UploadRejected(f'Chunk exceeds expected length ({length} bytes)', 'too_large', 413)
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            
+            sha256.update(chunk)
+            view = memoryview(chunk)
+            while view:
+                written = os.pwrite(fd, view, offset + size)
+                view = view[written:]
+                size += written
+    finally:
+        os.close(fd)
+    
+    if size != length:
+        raise UploadRejected(f'Incomplete chunk ({size}/{length} bytes)', 'incomplete_chunk', 400)
+    
+    return {
+        'size': size,
+        'sha256': sha256.hexdigest(),
+        'head': head
+    }
+
+def hash_file(path: str, chunk_size: int = INGEST_CHUNK_SIZE) -> str:
+    """SHA-256 hex digest of a file, read sequentially in large chunks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in _chunks(f, chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def _check_type(head: bytes, expected_type: Optional[str]) -> str:
+    mime_type = sniff_container(head)
+    if expected_type and mime_type not in CONTAINER_TYPES[expected_type]:
+        raise UploadRejected(f'File type not allowed: {mime_type or "unknown"}', 'unsupported_type', 415)
+    return mime_type or 'application/octet-stream'
@@ -7,13 +7,16 @@ Fixtures and setup for backend tests
 import pytest
 import os
 import sys
+import sysconfig
+import importlib.util
 from unittest.mock import Mock, patch
 from flask import Flask
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
 # Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
 
 @pytest.fixture
 def app():
@@ -45,6 +48,20 @@ def mock_redis():
     mock_redis.set.return_value = True
     return mock_redis
 
+@pytest.fixture
+def stdlib_queue(monkeypatch):
+    """Stdlib queue module (shadowed by backend/queue on the test path)"""
+    spec = importlib.util.spec_from_file_location('queue', os.path.join(sysconfig.get_paths()['stdlib'], 'queue.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setitem(sys.modules, 'queue', module)
+    return module
+
+@pytest.fixture
+def queue_imports(stdlib_queue, monkeypatch):
+    """Flat imports of queue/ modules, as workers run them (redis/rq need the stdlib queue)"""
+    monkeypatch.syspath_prepend(os.path.join(BACKEND_DIR, 'queue'))
+
 @pytest.fixture
 def mock_network_service():
     """Mock network service"""
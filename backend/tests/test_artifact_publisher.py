@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Artifact Publisher Tests
+"""
+
+import concurrent.futures.thread
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def thread_pool_queue(stdlib_queue, monkeypatch):
+    """ThreadPoolExecutor needs the stdlib queue, shadowed by backend/queue on the test path"""
+    monkeypatch.setattr(concurrent.futures.thread, 'queue', stdlib_queue)
+
+def test_run_task_graph_passes_dependency_results():
+    """Test tasks receive their dependencies' results in declared order"""
+    from photogrammetry.artifact_publisher import Task, run_task_graph
+
+    results, errors = run_task_graph([
+        Task('sum', lambda a, b: a + b, deps=('a', 'b')),
+        Task('a', lambda: 2),
+        Task('b', lambda: 3),
+        Task('double', lambda total: total * 2, deps=('sum',)),
+    ], max_workers=2)
+
+    assert errors == {}
+    assert results == {'a': 2, 'b': 3, 'sum': 5, 'double': 10}
+
+def test_run_task_graph_skips_dependents_of_failed_task():
+    """Test a failure skips its transitive dependents but not independent tasks"""
+    from photogrammetry.artifact_publisher import Task, run_task_graph
+
+    def fail():
+        raise RuntimeError('export failed')
+
+    results, errors = run_task_graph([
+        Task('glb', fail),
+        Task('draco', lambda glb: glb, deps=('glb',)),
+        Task('upload', lambda draco: draco, deps=('draco',)),
+        Task('thumbnail', lambda: 'thumb.png'),
+    ], max_workers=2)
+
+    assert results == {'thumbnail': 'thumb.png'}
+    assert errors == {
+        'glb': 'export failed',
+        'draco': 'skipped (glb failed)',
+        'upload': 'skipped (draco failed)',
+    }
@@ -69,3 +69,24 @@ def test_run_migrations_integration(mock_db):
 
 
 
+
+def test_split_statements():
+    """Test statement splitting ignores semicolons in comments, strings and DO blocks"""
+    from database.migrate import split_statements
+    
+    sql = """-- Header; with a semicolon
+CREATE TABLE t (note TEXT DEFAULT 'a;b');
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1) THEN
+        ALTER TABLE t ADD COLUMN x INT;
+    END IF;
+END
+$$;
+-- Trailing note
+"""
+    statements = split_statements(sql)
+    
+    assert len(statements) == 2
+    assert statements[0].endswith("DEFAULT 'a;b')")
+    assert statements[1].startswith('DO $$') and statements[1].endswith('$$')
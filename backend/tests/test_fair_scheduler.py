@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Fair-Share Scheduler Tests
+"""
+
+import os
+import sys
+import types
+import importlib
+from collections import defaultdict
+
+import pytest
+
+class FakeLock:
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+class FakePipeline:
+    """In-memory pipeline: commands run on execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __len__(self):
+        return len(self.commands)
+
+    def execute_script(self, source, keys, args):
+        self.commands.append(('execute_script', (source, keys, args), {}))
+        return self
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+class FakeScript:
+    """register_script() result, run by the Python equivalent in FakeRedis.scripts"""
+
+    def __init__(self, redis, source):
+        self.redis = redis
+        self.source = source
+
+    def __call__(self, keys, args, client=None):
+        return (client or self.redis).execute_script(self.source, keys, args)
+
+class FakeRedis:
+    """In-memory subset of redis-py used by fair_scheduler"""
+
+    def __init__(self):
+        self.lists = defaultdict(list)
+        self.hashes = defaultdict(dict)
+        self.sets = defaultdict(set)
+        self.zsets = defaultdict(dict)
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, source):
+        return FakeScript(self, source)
+
+    def execute_script(self, source, keys, args):
+        return self.scripts[source](keys, args)
+
+    def activate(self, keys, args):
+        active_key, ring_key = keys
+        if self.sadd(active_key, args[0]):
+            self.rpush(ring_key, args[0])
+        return 0
+
+    def deactivate(self, keys, args):
+        pending_key, ring_key, active_key, deficit_key = keys
+        if self.llen(pending_key):
+            return 0
+        self.lrem(ring_key, 0, args[0])
+        self.srem(active_key, args[0])
+        self.hdel(deficit_key, args[0])
+        return 1
+
+    def lock(self, name, **kwargs):
+        return FakeLock()
+
+    def rpush(self, key, *values):
+        self.lists[key].extend(self._encode(v) for v in values)
+        return len(self.lists[key])
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists[key].insert(0, self._encode(value))
+        return len(self.lists[key])
+
+    def lpop(self, key):
+        return self.lists[key].pop(0) if self.lists[key] else None
+
+    def lindex(self, key, index):
+        items = self.lists[key]
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def lrange(self, key, start, end):
+        items = self.lists[key]
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        return len(self.lists[key])
+
+    def lrem(self, key, count, value):
+        value = self._encode(value)
+        items = self.lists[key]
+        removed = 0
+        while value in items and (count == 0 or removed < count):
+            items.remove(value)
+            removed += 1
+        return removed
+
+    def hset(self, key, field, value):
+        self.hashes[key][field] = self._encode(value)
+        return 1
+
+    def hget(self, key, field):
+        return self.hashes[key].get(field)
+
+    def hdel(self, key, field):
+        return 1 if self.hashes[key].pop(field, None) is not None else 0
+
+    def sadd(self, key, member):
+        if member in self.sets[key]:
+            return 0
+        self.sets[key].add(member)
+        return 1
+
+    def srem(self, key, member):
+        self.sets[key].discard(member)
+
+    def zadd(self, key, mapping):
+        self.zsets[key].update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets[key].pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        for member, score in list(self.zsets[key].items()):
+            if low <= score <= high:
+                del self.zsets[key][member]
+
+    def zcard(self, key):
+        return len(self.zsets[key])
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """fair_scheduler imported against an in-memory Redis"""
+    rq_config = types.ModuleType('rq_config')
+    rq_config.redis_conn = FakeRedis()
+    rq_config.ALL_QUEUES = {}
+    rq_config.index_job = lambda *args, **kwargs: None
+    monkeypatch.setitem(sys.modules, 'rq_config', rq_config)
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'queue'))
+    monkeypatch.delitem(sys.modules, 'fair_scheduler', raising=False)
+
+    module = importlib.import_module('fair_scheduler')
+    rq_config.redis_conn.scripts = {
+        module.ACTIVATE_SCRIPT: rq_config.redis_conn.activate,
+        module.DEACTIVATE_SCRIPT: rq_config.redis_conn.deactivate,
+    }
+    monkeypatch.setattr(module, 'FAIRSHARE_ENABLED', True)
+    dispatched = []
+    monkeypatch.setitem(module._handlers, 'test', lambda meta, label: dispatched.append(label))
+    yield module, dispatched
+    sys.modules.pop('fair_scheduler', None)
+
+def test_dispatch_drr_order_follows_tier_weights(scheduler, monkeypatch):
+    """Test a pro backlog submitted late is interleaved by weight, not FIFO"""
+    fair_scheduler, dispatched = scheduler
+    monkeypatch.setattr(fair_scheduler, 'TIER_POLICIES', {
+        'free': fair_scheduler.TierPolicy(weight=1, max_running_per_user=100, max_running_total=100),
+        'pro': fair_scheduler.TierPolicy(weight=3, max_running_per_user=100, max_running_total=100),
+    })
+
+    for user_id, tier in (('f', 'free'), ('p', 'pro')):
+        fair_scheduler.submit_many([
+            {'kind': 'test', 'job_id': f'{user_id}-{i}', 'user_id': user_id, 'queue': 'default',
+             'params': {'label': user_id}, 'tier': tier}
+            for i in range(6)
+        ])
+
+    assert fair_scheduler.dispatch(max_rounds=2) == 8
+    assert dispatched == ['f', 'p', 'p', 'p', 'f', 'p', 'p', 'p']
+
+def test_dispatch_waits_for_release_when_user_at_limit(scheduler):
+    """Test a free user gets one running job until release_job frees the slot"""
+    fair_scheduler, dispatched = scheduler
+
+    for job_id in ('job-1', 'job-2'):
+        fair_scheduler.submit('test', job_id, 'user-1', 'default', {'label': job_id}, tier='free')
+
+    assert fair_scheduler.dispatch() == 1
+    assert fair_scheduler.dispatch() == 0
+    assert dispatched == ['job-1']
+
+    fair_scheduler.release_job('job-1')
+
+    assert fair_scheduler.dispatch() == 1
+    assert dispatched == ['job-1', 'job-2']
+    assert fair_scheduler.redis_conn.llen(fair_scheduler.RING_KEY) == 0
+
+def test_submit_during_serve_is_not_lost(scheduler, monkeypatch):
+    """Test a job submitted while its user's queue is being emptied is still dispatched"""
+    fair_scheduler, dispatched = scheduler
+    deactivate = fair_scheduler._deactivate
+    pending = ['job-2']
+
+    def submit_then_deactivate(*args, **kwargs):
+        # Submit lands between the dispatcher's last LPOP and the ring removal
+        if pending:
+            pending.pop()
+            fair_scheduler.submit('test', 'job-2', 'user-1', 'default', {'label': 'job-2'}, tier='free')
+        return deactivate(*args, **kwargs)
+
+    monkeypatch.setattr(fair_scheduler, '_deactivate', submit_then_deactivate)
+    fair_scheduler.submit('test', 'job-1', 'user-1', 'default', {'label': 'job-1'}, tier='free')
+
+    assert fair_scheduler.dispatch() == 1
+    assert fair_scheduler.redis_conn.lrange(fair_scheduler.RING_KEY, 0, -1) == [b'user-1']
+
+    fair_scheduler.release_job('job-1')
+
+    assert fair_scheduler.dispatch() == 1
+    assert dispatched == ['job-1', 'job-2']
+    assert fair_scheduler.redis_conn.llen(fair_scheduler.RING_KEY) == 0
+
+    # Submit after the ring removal puts the user back in the ring
+    fair_scheduler.submit('test', 'job-3', 'user-1', 'default', {'label': 'job-3'}, tier='free')
+    fair_scheduler.release_job('job-2')
+
+    assert fair_scheduler.dispatch() == 1
+    assert dispatched == ['job-1', 'job-2', 'job-3']
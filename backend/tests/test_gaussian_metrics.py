@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Gaussian Training Metrics Tests
+"""
+
+import pytest
+
+def test_parse_nerfstudio_stdout(tmp_path):
+    """Test parsing step rows and metric lines"""
+    from gaussian.training_metrics import TrainingMetricsReader
+
+    reader = TrainingMetricsReader(str(tmp_path), max_iterations=30000)
+
+    assert reader.parse_line("Step (% Done)       Train Iter (time)") == []
+    assert reader.parse_line("1200 (4.00%)   45.123 ms   22 m, 3 s   1.2 M") == [{'step': 1200}]
+    assert reader.parse_line("[ITER 7000] Evaluating test: L1 0.03 PSNR 27.1") == [
+        {'step': 7000, 'psnr': 27.1}
+    ]
+    assert reader.progress == pytest.approx(7000 / 30000)
+
+def test_series_meta_is_downsampled(tmp_path):
+    """Test job meta keeps the latest point when downsampling"""
+    from gaussian.training_metrics import TrainingSeries
+
+    series = TrainingSeries()
+    for step in range(0, 1000, 10):
+        series.add(step, psnr=step / 100)
+
+    meta = series.to_meta(max_points=20)
+    assert len(meta['series']) <= 21
+    assert meta['series'][-1]['step'] == 990
+    assert meta['psnr'] == pytest.approx(9.9)
+
+def test_psnr_plateau_detection():
+    """Test early stopping triggers only after min_steps and patience"""
+    from gaussian.training_metrics import PSNRPlateauDetector, EarlyStoppingConfig
+
+    detector = PSNRPlateauDetector(EarlyStoppingConfig(min_steps=10000, patience_steps=3000))
+
+    stop_step = None
+    for step in range(0, 30000, 10):
+        psnr = min(28.0, 15.0 + step / 1000)
+        if detector.update(step, psnr):
+            stop_step = step
+            break
+
+    assert stop_step is not None
+    assert 13000 <= stop_step < 20000
+
+    disabled = PSNRPlateauDetector(EarlyStoppingConfig(enabled=False))
+    assert not any(disabled.update(step, 25.0) for step in range(0, 30000, 10))
+
+def test_resume_checkpoint_skips_truncated(tmp_path):
+    """Test resume picks the latest checkpoint that is complete"""
+    import zipfile
+    from gaussian.checkpoints import find_resume_checkpoint
+
+    run_dir = tmp_path / "output" / "frames" / "gaussian-splatting" / "2024-01-01_000000"
+    models_dir = run_dir / "nerfstudio_models"
+    models_dir.mkdir(parents=True)
+    (run_dir / "config.yml").write_text("method_name: gaussian-splatting\n")
+
+    with zipfile.ZipFile(models_dir / "step-000005000.ckpt", 'w') as ckpt:
+        ckpt.writestr("data.pkl", b"state")
+    (models_dir / "step-000010000.ckpt").write_bytes(b"PK\x03\x04truncated")
+
+    resume = find_resume_checkpoint(str(tmp_path / "output"))
+    assert resume['step'] == 5000
+    assert resume['load_dir'] == str(models_dir)
+    assert find_resume_checkpoint(str(tmp_path / "empty")) is None
+
+def test_monitor_training_stops_process_on_error(tmp_path):
+    """Test ns-train is stopped when monitoring raises (callback error, RQ timeout)"""
+    import sys
+    import subprocess
+    from gaussian.training_metrics import TrainingMetricsReader, monitor_training
+
+    script = "import time\nfor step in range(100000):\n    print(f'{step} (0.00%)', flush=True)\n    time.sleep(0.01)"
+    process = subprocess.Popen(
+        [sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+
+    def on_update(reader, line):
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError):
+        monitor_training(process, TrainingMetricsReader(str(tmp_path)), on_update=on_update, update_interval=0)
+
+    assert process.poll() is not None
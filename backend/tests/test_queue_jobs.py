@@ -66,9 +66,37 @@ def test_job_notification(mock_db):
         # Verify notification was called
         assert mock_send.called
 
+def test_progress_updates_are_coalesced(mock_redis, queue_imports):
+    """Test progress ticks are buffered and terminal states flush immediately"""
+    import progress_reporter
+    from job_models import JobStatus
+    
+    with patch.object(progress_reporter, 'update_job_status', return_value=True) as mock_update, \
+         patch.object(progress_reporter, 'redis_conn', mock_redis), \
+         patch.object(progress_reporter, 'release_job'), \
+         patch.object(progress_reporter, 'propagate_to_followers'):
+        reporter = progress_reporter.ProgressReporter("test-job-123", redis_interval=60, db_interval=60)
+        
+        for progress in range(0, 90):
+            reporter.report(JobStatus.PROCESSING, progress=progress)
+        
+        # Premier report (changement de status) uniquement
+        assert mock_update.call_count == 1
+        
+        reporter.report(JobStatus.COMPLETED, progress=100)
+        reporter.close()
+        
+        assert mock_update.call_count == 2
+        assert mock_update.call_args[0][1] == JobStatus.COMPLETED
+        assert mock_redis.pipeline.return_value.execute.call_count == 2
 
 
-
-
-
-
+def test_dedup_key_depends_on_content_and_config(queue_imports):
+    """Test identical submissions share a dedup key, config changes do not"""
+    from job_dedup import compute_dedup_key
+    
+    key = compute_dedup_key("photogrammetry", "abc123", {"quality": "high", "fps": 30})
+    
+    assert key == compute_dedup_key("photogrammetry", "abc123", {"fps": 30, "quality": "high"})
+    assert key != compute_dedup_key("photogrammetry", "abc123", {"quality": "draft", "fps": 30})
+    assert key != compute_dedup_key("mesh_optimization", "abc123", {"quality": "high", "fps": 30})
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Upload Ingest Tests
+"""
+
+import io
+import hashlib
+import pytest
+
+MP4_HEAD = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2'
+
+def test_ingest_stream_hashes_and_sniffs(tmp_path):
+    """Test a valid upload is written, hashed and typed in one pass"""
+    from security.upload_ingest import ingest_stream
+
+    data = MP4_HEAD + b'\x00' * 5000
+    dest = tmp_path / 'video.mp4'
+
+    result = ingest_stream(io.BytesIO(data), str(dest), expected_type='video', chunk_size=7)
+
+    assert result['file_size'] == len(data)
+    assert result['file_hash'] == hashlib.sha256(data).hexdigest()
+    assert result['mime_type'] == 'video/mp4'
+    assert dest.read_bytes() == data
+    assert not (tmp_path / 'video.mp4.part').exists()
+
+@pytest.mark.parametrize('data, max_size, reason, status_code', [
+    (MP4_HEAD + b'\x00' * 5000, 1024, 'too_large', 413),
+    (b'not a video' * 100, 10 * 1024, 'unsupported_type', 415),
+    (b'', 1024, 'empty', 400),
+])
+def test_ingest_stream_rejections_leave_nothing(tmp_path, data, max_size, reason, status_code):
+    """Test rejected uploads raise with their reason and leave no file behind"""
+    from security.upload_ingest import ingest_stream, UploadRejected
+
+    dest = tmp_path / 'video.mp4'
+
+    with pytest.raises(UploadRejected) as excinfo:
+        ingest_stream(io.BytesIO(data), str(dest), max_size=max_size, expected_type='video', chunk_size=256)
+
+    assert excinfo.value.reason == reason
+    assert excinfo.value.status_code == status_code
+    assert list(tmp_path.iterdir()) == []
+
+def test_ingest_chunk_writes_at_offset(tmp_path):
+    """Test a chunk is written in place at its offset"""
+    from security.upload_ingest import ingest_chunk
+
+    dest = tmp_path / 'upload.mp4'
+    with open(dest, 'wb') as f:
+        f.truncate(32)
+
+    chunk = ingest_chunk(io.BytesIO(b'abcdefgh'), str(dest), offset=16, length=8, chunk_size=3)
+
+    assert chunk['size'] == 8
+    assert chunk['sha256'] == hashlib.sha256(b'abcdefgh').hexdigest()
+    assert chunk['head'] == b'abcdefgh'
+    assert dest.read_bytes() == b'\x00' * 16 + b'abcdefgh' + b'\x00' * 8
+
+@pytest.mark.parametrize('data, reason, status_code', [
+    (b'abcdefghij', 'too_large', 413),
+    (b'abc', 'incomplete_chunk', 400),
+])
+def test_ingest_chunk_rejects_wrong_length(tmp_path, data, reason, status_code):
+    """Test a chunk longer or shorter than expected is rejected"""
+    from security.upload_ingest import ingest_chunk, UploadRejected
+
+    dest = tmp_path / 'upload.mp4'
+    with open(dest, 'wb') as f:
+        f.truncate(32)
+
+    with pytest.raises(UploadRejected) as excinfo:
+        ingest_chunk(io.BytesIO(data), str(dest), offset=0, length=8, chunk_size=4)
+
+    assert excinfo.value.reason == reason
+    assert excinfo.value.status_code == status_code
+    assert dest.stat().st_size == 32
+
+def test_ingest_chunk_missing_upload_file(tmp_path):
+    """Test a chunk for an aborted upload does not recreate its file"""
+    from security.upload_ingest import ingest_chunk
+
+    dest = tmp_path / 'upload.mp4'
+
+    with pytest.raises(FileNotFoundError):
+        ingest_chunk(io.BytesIO(b'abcdefgh'), str(dest), offset=0, length=8)
+
+    assert not dest.exists()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+USDZ Packager Tests
+"""
+
+import zipfile
+
+import pytest
+
+def test_usdz_writer_stores_aligned_entries(tmp_path):
+    """Test entries are stored uncompressed with data aligned on 64 bytes"""
+    from photogrammetry.usdz_packager import UsdzWriter
+
+    texture = tmp_path / 'texture.png'
+    texture.write_bytes(b'\x89PNG' + bytes(range(256)) * 40)
+    path = tmp_path / 'model.usdz'
+
+    with UsdzWriter(str(path)) as writer:
+        writer.add_bytes('model.usdc', b'PXR-USDC' + b'\x01' * 37)
+        writer.add_file('textures/texture.png', str(texture))
+        writer.add_bytes('textures/été.jpg', b'\xff\xd8' + b'\x02' * 3)
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert [info.filename for info in archive.infolist()] == ['model.usdc', 'textures/texture.png', 'textures/été.jpg']
+        assert archive.read('textures/texture.png') == texture.read_bytes()
+
+        with open(path, 'rb') as f:
+            for info in archive.infolist():
+                assert info.compress_type == zipfile.ZIP_STORED
+                f.seek(info.header_offset + 26)
+                name_length, extra_length = int.from_bytes(f.read(2), 'little'), int.from_bytes(f.read(2), 'little')
+                assert (info.header_offset + 30 + name_length + extra_length) % 64 == 0
+
+def test_usdz_writer_rejects_non_usd_first_entry(tmp_path):
+    """Test the first entry must be a USD layer and the partial archive is removed"""
+    from photogrammetry.usdz_packager import UsdzWriter
+
+    path = tmp_path / 'model.usdz'
+
+    with pytest.raises(ValueError):
+        with UsdzWriter(str(path)) as writer:
+            writer.add_bytes('texture.png', b'\x89PNG')
+
+    assert not path.exists()